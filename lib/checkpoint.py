@@ -0,0 +1,139 @@
+import json
+import os
+import pickle
+
+def read_manifest(filename: str):
+    '''Reads the checkpoint manifest of a previous (interrupted) run.
+
+        Parameters: filename
+
+        Returns: manifest (dictionary with run_settings, completed_days and positions, see write_manifest) or None if there is no manifest'''
+
+    if not os.path.exists(filename):
+        return None
+
+    with open(filename) as f_object:
+        return json.load(f_object)
+
+def write_manifest(filename: str, run_settings: dict, completed_days: dict, positions: dict):
+    '''Writes the checkpoint manifest. The manifest is written to a temporary file first and then replaces the old manifest, so an interruption while writing leaves the previous checkpoint intact.
+
+        Parameters:
+        - filename
+        - run_settings: settings of the run (resuming is only possible with the same settings)
+        - completed_days: completed days for every latitude (see mark_completed)
+        - positions: positions of the result sinks after all lines of the completed days were written (see results.result_sink.position)
+
+        Returns: -'''
+
+    manifest = {'run_settings': run_settings, 'completed_days': completed_days, 'positions': positions}
+
+    with open(filename + ".tmp", 'w') as f_object:
+        json.dump(manifest, f_object)
+    os.replace(filename + ".tmp", filename)
+
+def check_run_settings(manifest: dict, run_settings: dict):
+    '''Checks if a run can be resumed from the manifest (same settings as the interrupted run), exits otherwise.
+
+        Parameters: manifest, run_settings
+
+        Returns: -'''
+
+    if manifest['run_settings'] != run_settings:
+        print("Checkpoint was written with different settings, the run cannot be resumed: ", manifest['run_settings'])
+        exit()
+
+def mark_completed(completed_days: dict, lat, first_day: int, last_day: int):
+    '''Adds a range of days to the completed days of a latitude (ranges are stored as [first_day, last_day] with last_day excluded and merged with adjacent ranges).
+
+        Parameters: completed_days (dictionary lat (as string): list of ranges), lat, first_day, last_day
+
+        Returns: -'''
+
+    ranges = sorted(completed_days.get(str(lat), []) + [[first_day, last_day]])
+
+    merged_ranges = [ranges[0]]
+    for first, last in ranges[1:]:
+        if first <= merged_ranges[-1][1]:
+            merged_ranges[-1][1] = max(merged_ranges[-1][1], last)
+        else:
+            merged_ranges.append([first, last])
+
+    completed_days[str(lat)] = merged_ranges
+
+def remaining_work_units(work_units: list, completed_days: dict):
+    '''Removes completed days from the work units, units which are partly completed are split into the remaining ranges of days.
+
+        Parameters: work_units (list of (lat, first_day, last_day, PV_angle_NS) tuples), completed_days
+
+        Returns: remaining work units'''
+
+    remaining = []
+
+    for lat, first_day, last_day, PV_angle_NS in work_units:
+        day = first_day
+        for first_completed, last_completed in completed_days.get(str(lat), []):
+            if first_completed >= last_day or last_completed <= day:
+                continue
+            if first_completed > day:
+                remaining.append((lat, day, first_completed, PV_angle_NS))
+            day = max(day, last_completed)
+        if day < last_day:
+            remaining.append((lat, day, last_day, PV_angle_NS))
+
+    return remaining
+
+# Results of finished work units are only written to the results files in blocks (see --flush-size) and in lat/day order, so units which finished later than their successors (process pool) or since the last block wait in memory.
+# They are appended to a journal next to the manifest as soon as they are finished, so an interrupted run only loses the units which were still running. The journal only keeps the units which are not written to the results files yet (see write_journal).
+
+def append_journal(filename: str, work_unit, lines_15min, lines_percent_of_time_shaded):
+    '''Appends the results of a finished work unit to the journal (one pickled record per unit).
+
+        Parameters: filename, work_unit ((lat, first_day, last_day, PV_angle_NS) tuple), lines_15min, lines_percent_of_time_shaded
+
+        Returns: -'''
+
+    with open(filename, 'ab') as f_object:
+        pickle.dump((tuple(work_unit), lines_15min, lines_percent_of_time_shaded), f_object)
+
+def read_journal(filename: str, completed_days: dict):
+    '''Reads the results of the finished work units from the journal, units whose days are completed (written to the results files, see mark_completed) and a record which was interrupted while being written are skipped.
+
+        Parameters: filename, completed_days
+
+        Returns: finished_results (dictionary work_unit: (lines_15min, lines_percent_of_time_shaded))'''
+
+    finished_results = {}
+
+    if not os.path.exists(filename):
+        return finished_results
+
+    with open(filename, 'rb') as f_object:
+        while True:
+            try:
+                work_unit, lines_15min, lines_percent_of_time_shaded = pickle.load(f_object)
+            except (EOFError, pickle.UnpicklingError, ValueError):
+                break
+
+            # units which are (partly) written to the results files are dropped
+            if remaining_work_units([work_unit], completed_days) == [work_unit]:
+                finished_results[work_unit] = (lines_15min, lines_percent_of_time_shaded)
+
+    return finished_results
+
+def write_journal(filename: str, finished_results: dict):
+    '''Replaces the journal by the results of the given work units (written to a temporary file first, as the manifest), the journal is removed if there are none.
+
+        Parameters: filename, finished_results (see read_journal)
+
+        Returns: -'''
+
+    if len(finished_results) == 0:
+        if os.path.exists(filename):
+            os.remove(filename)
+        return
+
+    with open(filename + ".tmp", 'wb') as f_object:
+        for work_unit, (lines_15min, lines_percent_of_time_shaded) in finished_results.items():
+            pickle.dump((tuple(work_unit), lines_15min, lines_percent_of_time_shaded), f_object)
+    os.replace(filename + ".tmp", filename)
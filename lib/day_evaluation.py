@@ -0,0 +1,407 @@
+import solarposition
+import shade_grid
+import ephemeris_cache
+import shared_buffers
+import longitude_expansion
+import day_sampling
+import solstice_mirror
+import noon_symmetry
+
+import concurrent.futures
+import math
+import numpy as np
+
+timesteps_per_day = 24 * 4
+
+# A work unit is calculated day by day. Every daylight timestep of a day is evaluated by the first strategy which can provide its ground shade and shaded grid points: results calculated before are reused first (reference longitude, noon symmetry, solstice mirror), the last strategy always calculates the timestep (exact calculation, sky patches or response surface).
+# Strategies only read the unit context and keep everything which belongs to one day in the state returned by start_day, so days can be evaluated concurrently.
+
+class unit_context:
+    def __init__(self, geometry, lat, long, year, first_day, last_day, field_width, field_length, PV_angle_EW=0, PV_angle_NS=0, grid_spacing=1, shade_engine="shapely", tilt_resolution=None, incremental_grid=False, shared_buffer_handles=None, ephemeris_directory=None, grid_coordinates=None):
+        '''Inputs of a work unit which are shared by all of its days (read-only while the days are evaluated). The solar table is read from shared memory or the ephemeris cache if given, otherwise it is calculated.
+
+            Instance variables:
+            - geometry, lat, long, year, first_day, last_day, field_width, field_length, PV_angle_EW, PV_angle_NS, grid_spacing, shade_engine, tilt_resolution, incremental_grid, shared_buffer_handles, ephemeris_directory: see sweep.simulate_unit
+            - times: all timesteps of the unit
+            - solar_table: solar position for every timestep of the unit (see solarposition.calculate_solar_table)
+            - PV_angles_EW: tilt of the panels in the E/W plane for every timestep
+            - daylight_windows: daylight timesteps of every day of the unit (see solarposition.calculate_daylight_windows)
+            - grid_coordinates: coordinates of the percentage shaded grid (shared by the grids of all days)
+            '''
+
+        self.geometry, self.lat, self.long, self.year = geometry, lat, long, year
+        self.first_day, self.last_day = first_day, last_day
+        self.field_width, self.field_length = field_width, field_length
+        self.PV_angle_EW, self.PV_angle_NS = PV_angle_EW, PV_angle_NS
+        self.grid_spacing, self.shade_engine, self.tilt_resolution, self.incremental_grid = grid_spacing, shade_engine, tilt_resolution, incremental_grid
+        self.shared_buffer_handles, self.ephemeris_directory = shared_buffer_handles, ephemeris_directory
+
+        # solar position for every timestep of the unit (one vectorized pvlib call, or read from shared memory/the memory-mapped cache)
+        self.times = solarposition.generate_timesteps(year)[first_day * timesteps_per_day:last_day * timesteps_per_day]
+        if shared_buffer_handles != None:
+            buffers = shared_buffers.attach(shared_buffer_handles)
+            self.solar_table = {column: buffers[('solar_table', lat, column)][first_day * timesteps_per_day:last_day * timesteps_per_day] for column in ephemeris_cache.solar_table_columns}
+        elif ephemeris_directory != None:
+            self.solar_table = ephemeris_cache.load_solar_table(ephemeris_directory, lat, long, year, first_day * timesteps_per_day, last_day * timesteps_per_day)
+        else:
+            self.solar_table = solarposition.calculate_solar_table(lat, long, self.times)
+
+        # tilt of the panels in the E/W plane for every timestep (tracking and backtracking systems follow the sun)
+        self.PV_angles_EW = geometry.tilt_schedule(self.solar_table['angle_in_plane_EW'], PV_angle_EW)
+
+        # pruning: timesteps with the sun under the horizon skip all geometry calculations
+        self.daylight_windows = solarposition.calculate_daylight_windows(self.solar_table['apparent_elevation'], timesteps_per_day)
+
+        # grid coordinates are shared by the grids of all days (every day counts on its own grid)
+        if grid_coordinates == None and shared_buffer_handles != None:
+            grid_coordinates = tuple(buffers[name] for name in ('x_coords', 'y_coords', 'grid_x', 'grid_y'))
+        elif grid_coordinates == None:
+            template_grid = shade_grid.shade_grid(field_width, field_length, grid_spacing)
+            grid_coordinates = (template_grid.x_coords, template_grid.y_coords, template_grid.grid_x, template_grid.grid_y)
+        self.grid_coordinates = grid_coordinates
+
+    def day_context(self, day_of_year: int):
+        '''Context of a single day of the year with the same system and settings (e.g. a mirror day outside of the unit).
+            Parameters: day_of_year (0-based)
+            Returns: context'''
+
+        return unit_context(self.geometry, self.lat, self.long, self.year, day_of_year, day_of_year + 1, self.field_width, self.field_length, self.PV_angle_EW, self.PV_angle_NS, self.grid_spacing, self.shade_engine, self.tilt_resolution, self.incremental_grid, self.shared_buffer_handles, self.ephemeris_directory, self.grid_coordinates)
+
+    def new_grid(self):
+        '''Empty percentage shaded grid (sharing the grid coordinates of the unit).
+            Parameters: -
+            Returns: grid'''
+
+        return shade_grid.shade_grid(self.field_width, self.field_length, self.grid_spacing, self.grid_coordinates, self.incremental_grid)
+
+    def day_table(self, day_of_unit: int, columns=('azimuth_rad', 'elevation_rad', 'angle_in_plane_EW')):
+        '''Columns of the solar table for all timesteps of one day of the unit.
+            Parameters: day_of_unit, columns
+            Returns: solar table of the day'''
+
+        return {column: self.solar_table[column][day_of_unit * timesteps_per_day:(day_of_unit + 1) * timesteps_per_day] for column in columns}
+
+    def day_lines(self, day_of_unit: int):
+        '''Lines for all timesteps of one day of the unit, night timesteps are written in bulk (shaded area and self-shade area are both set to 100%).
+            Parameters: day_of_unit
+            Returns: lines of the day, month, day'''
+
+        day_index = day_of_unit * timesteps_per_day
+        date = self.times[day_index]
+        month, day = date.month, date.day
+
+        return [[self.lat, self.long, round(month), round(day), round(step // 4), round((step % 4) * 15), 100, 100, self.solar_table['proximate_azimuth'][day_index + step], self.solar_table['apparent_elevation'][day_index + step]] for step in range(timesteps_per_day)], month, day #angle_in_plane_NS, angle_in_plane_EW]
+
+    def valid_azimuth(self, day_of_unit: int):
+        '''Checks that the azimuth of all timesteps of one day of the unit lies between 0 and 2pi.
+            Parameters: day_of_unit
+            Returns: True/False'''
+
+        azimuth_rad = self.day_table(day_of_unit, ('azimuth_rad',))['azimuth_rad']
+
+        return not (np.any(azimuth_rad < 0) or np.any(azimuth_rad > 2*math.pi))
+
+class shade_strategy:
+    '''Base class of the strategies which provide ground shade and shaded grid points of daylight timesteps (see evaluate_steps).
+
+        Class variables:
+        - observes: if True, observe is called with the shaded grid points of every evaluated timestep (e.g. to reuse them later)
+        '''
+
+    observes = False
+
+    def start_day(self, context: unit_context, day_of_unit: int):
+        '''State of the strategy for one day of the unit (e.g. matched timesteps).
+            Returns: state (passed to all other methods for this day)'''
+
+        return None
+
+    def deferred_steps(self, state):
+        '''Timesteps of the day which reuse other timesteps of the same day, they are evaluated after all other timesteps.
+            Returns: steps (set)'''
+
+        return set()
+
+    def evaluate(self, context: unit_context, state, day_of_unit: int, step: int, grid: shade_grid.shade_grid):
+        '''Ground shade of one daylight timestep, its shaded grid points are added to the grid (as one timestep).
+            Returns: shaded area in % (None: the timestep is left to the next strategy)'''
+
+        return None
+
+    def observe(self, context: unit_context, state, day_of_unit: int, step: int, ground_shade: float, footprint):
+        '''Receives the ground shade and the shaded grid points (boolean array) of every evaluated timestep (only if observes is True).
+            Returns: -'''
+
+        pass
+
+    def report(self, context: unit_context):
+        '''Prints a summary for the unit after all days are evaluated.
+            Returns: -'''
+
+        pass
+
+class exact_shade(shade_strategy):
+    '''Calculates the ground shade and the shaded grid points of every timestep (from the shade memo if it is given, see shade_memo.py).'''
+
+    def __init__(self, memo=None):
+        self.memo = memo
+
+    def evaluate(self, context, state, day_of_unit, step, grid):
+        timestep = day_of_unit * timesteps_per_day + step
+        angle_in_plane_EW, angle_in_plane_NS = context.solar_table['angle_in_plane_EW'][timestep], context.solar_table['angle_in_plane_NS'][timestep]
+
+        if self.memo != None:
+            return self.memo.calculate_shade(context.geometry, angle_in_plane_EW, angle_in_plane_NS, context.PV_angles_EW[timestep], context.PV_angle_NS, context.field_width, context.field_length, grid, context.shade_engine, context.tilt_resolution)[0]
+
+        return context.geometry.calculate_ground_shade(angle_in_plane_EW, angle_in_plane_NS, context.PV_angles_EW[timestep], context.PV_angle_NS, context.field_width, context.field_length, grid, context.shade_engine, context.tilt_resolution)
+
+    def report(self, context):
+        if self.memo != None:
+            memo_info = self.memo.info()
+            print("Shade memo after lat=", context.lat, ", days ", context.first_day, "-", context.last_day, ": ", memo_info['hits'], " hits, ", memo_info['misses'], " misses (hit rate ", round(memo_info['hit_rate'], 3), "), ", memo_info['size'], " of ", memo_info['maxsize'], " entries used.")
+
+class interpolated_shade(shade_strategy):
+    '''Takes the ground shade of every timestep from an array (e.g. interpolated from the response surface, see response_surface.py), only the shaded grid points are calculated.'''
+
+    def __init__(self, ground_shade):
+        self.ground_shade = ground_shade
+
+    def evaluate(self, context, state, day_of_unit, step, grid):
+        timestep = day_of_unit * timesteps_per_day + step
+        context.geometry.update_shade_grid(context.solar_table['angle_in_plane_EW'][timestep], context.solar_table['angle_in_plane_NS'][timestep], context.PV_angles_EW[timestep], context.PV_angle_NS, context.field_width, context.field_length, grid, context.shade_engine, context.tilt_resolution)
+
+        return float(self.ground_shade[timestep])
+
+class sky_patch_shade(shade_strategy):
+    '''Takes the ground shade of every timestep from an array and the shaded grid points from the sky patch of the timestep (see sky_patches.py).'''
+
+    def __init__(self, ground_shade, patch_index, patch_footprints):
+        self.ground_shade, self.patch_index, self.patch_footprints = ground_shade, patch_index, patch_footprints
+
+    def evaluate(self, context, state, day_of_unit, step, grid):
+        timestep = day_of_unit * timesteps_per_day + step
+        grid.add_counts(self.patch_footprints[self.patch_index[timestep]], 1)
+
+        return float(self.ground_shade[timestep])
+
+class reference_recorder(shade_strategy):
+    '''Records ground shade and packed shaded grid points of every timestep (reference longitude of the longitude expansion and mirror days of the solstice mirror), evaluates no timesteps.'''
+
+    observes = True
+
+    def __init__(self, context: unit_context, recorded: dict):
+        self.recorded = recorded
+        recorded.update({'long': context.long, 'solar_table': context.solar_table, 'daylight': context.daylight_windows.ravel(), 'ground_shade': {}, 'footprints': {}})
+
+    def observe(self, context, state, day_of_unit, step, ground_shade, footprint):
+        timestep = day_of_unit * timesteps_per_day + step
+        self.recorded['ground_shade'][timestep] = ground_shade
+        self.recorded['footprints'][timestep] = np.packbits(footprint)
+
+class reference_shade(shade_strategy):
+    '''Reuses ground shade and shaded grid points recorded at the reference longitude for timesteps with (nearly) the same sun direction (see longitude_expansion.py).'''
+
+    def __init__(self, context: unit_context, reference: dict, drift_tolerance: float):
+        self.reference = reference
+        self.offset = longitude_expansion.time_offset(context.long, reference['long'])
+        self.reference_timesteps = longitude_expansion.match_reference_timesteps(context.solar_table, reference['solar_table'], reference['daylight'], self.offset, context.daylight_windows, drift_tolerance)[0]
+
+    def evaluate(self, context, state, day_of_unit, step, grid):
+        reference_timestep = self.reference_timesteps[day_of_unit * timesteps_per_day + step]
+        if reference_timestep < 0:
+            return None
+
+        grid.add_counts(np.unpackbits(self.reference['footprints'][reference_timestep], count=grid.counts.size).reshape(grid.counts.shape), 1)
+
+        return self.reference['ground_shade'][reference_timestep]
+
+    def report(self, context):
+        print("Longitude expansion at lat=", context.lat, ", long=", context.long, ", days ", context.first_day, "-", context.last_day, ": ", np.sum(self.reference_timesteps >= 0), " of ", np.sum(context.daylight_windows), " daylight timesteps reused from long=", self.reference['long'], " (time offset of ", self.offset, " timesteps).")
+
+class symmetry_shade(shade_strategy):
+    '''Reuses the mirrored ground shade and shaded grid points of the morning timestep with the mirrored sun direction for afternoon timesteps (see noon_symmetry.py, only for systems which are mirror symmetric in the field).'''
+
+    observes = True
+
+    def __init__(self, tolerance: float):
+        self.tolerance = tolerance
+        self.counts = []
+
+    def start_day(self, context, day_of_unit):
+        day_table = context.day_table(day_of_unit)
+        mirrored_steps = noon_symmetry.match_mirrored_timesteps(day_table['azimuth_rad'], day_table['elevation_rad'], day_table['angle_in_plane_EW'], context.daylight_windows[day_of_unit], self.tolerance)[0]
+        self.counts.append((np.sum(mirrored_steps >= 0), np.sum(context.daylight_windows[day_of_unit])))
+
+        # ground shade and shaded grid points of the mirrored morning timesteps (filled by observe)
+        return {'mirrored_steps': mirrored_steps, 'morning_steps': set(mirrored_steps[mirrored_steps >= 0].tolist()), 'ground_shade': {}, 'footprints': {}}
+
+    def deferred_steps(self, state):
+        return set(np.flatnonzero(state['mirrored_steps'] >= 0).tolist())
+
+    def evaluate(self, context, state, day_of_unit, step, grid):
+        morning_step = state['mirrored_steps'][step]
+        if morning_step < 0:
+            return None
+
+        # grid columns are symmetric about the middle of the field
+        grid.add_counts(state['footprints'][morning_step][:, ::-1], 1)
+
+        return state['ground_shade'][morning_step]
+
+    def observe(self, context, state, day_of_unit, step, ground_shade, footprint):
+        if step in state['morning_steps']:
+            state['ground_shade'][step], state['footprints'][step] = ground_shade, footprint
+
+    def report(self, context):
+        print("Noon symmetry at lat=", context.lat, ", days ", context.first_day, "-", context.last_day, ": ", sum(counts[0] for counts in self.counts), " of ", sum(counts[1] for counts in self.counts), " daylight timesteps mirrored from the morning.")
+
+class mirror_shade(shade_strategy):
+    '''Reuses ground shade and shaded grid points of the mirror day on the other side of the solstice for timesteps with (nearly) the same sun direction (see solstice_mirror.py). Mirror days are calculated once with the exact strategy and kept in the records (solstice_mirror.mirror_records).'''
+
+    def __init__(self, context: unit_context, tolerance: float, records: solstice_mirror.mirror_records, exact: exact_shade):
+        self.tolerance, self.records, self.exact = tolerance, records, exact
+        self.number_of_days_of_year = len(solarposition.generate_timesteps(context.year)) // timesteps_per_day
+        self.mirror = solstice_mirror.mirror_days(self.number_of_days_of_year)
+        self.counts = []
+
+    def record(self, context: unit_context, day_of_year: int):
+        '''Ground shade and shaded grid points of every daylight timestep of a mirror day (taken from the records or calculated, the mirror day may lie outside of the unit).
+            Returns: record (see reference_recorder)'''
+
+        def calculate():
+            day_context = context.day_context(day_of_year)
+            record = {}
+            evaluate_steps(day_context, 0, [self.exact, reference_recorder(day_context, record)], day_context.new_grid())
+            return record
+
+        return self.records.get((context.lat, context.long, context.PV_angle_NS, day_of_year), calculate)
+
+    def start_day(self, context, day_of_unit):
+        day_of_year = context.first_day + day_of_unit
+        record = self.record(context, self.mirror[day_of_year])
+        mirror_steps = longitude_expansion.match_reference_timesteps(context.day_table(day_of_unit, ('azimuth_rad', 'elevation_rad')), record['solar_table'], record['daylight'], solstice_mirror.time_offset(day_of_year, self.mirror[day_of_year], self.number_of_days_of_year), context.daylight_windows[day_of_unit], self.tolerance)[0]
+        self.counts.append((np.sum(mirror_steps >= 0), np.sum(context.daylight_windows[day_of_unit]), self.mirror[day_of_year] != day_of_year))
+
+        return {'record': record, 'mirror_steps': mirror_steps}
+
+    def evaluate(self, context, state, day_of_unit, step, grid):
+        mirror_step = state['mirror_steps'][step]
+        if mirror_step < 0:
+            return None
+
+        grid.add_counts(np.unpackbits(state['record']['footprints'][mirror_step], count=grid.counts.size).reshape(grid.counts.shape), 1)
+
+        return state['record']['ground_shade'][mirror_step]
+
+    def report(self, context):
+        mirrored_counts = [counts for counts in self.counts if counts[2]]
+        print("Solstice mirror at lat=", context.lat, ", days ", context.first_day, "-", context.last_day, ": ", sum(counts[0] for counts in mirrored_counts), " of ", sum(counts[1] for counts in mirrored_counts), " daylight timesteps of ", len(mirrored_counts), " mirrored days reused from their mirror days.")
+
+def evaluate_steps(context: unit_context, day_of_unit: int, strategies: list, grid: shade_grid.shade_grid):
+    '''Evaluates all daylight timesteps of one day of the unit with the first strategy which provides them (the last strategy has to provide every timestep), the shaded grid points are counted on the grid.
+
+        Parameters: context, day_of_unit, strategies (ordered list of shade_strategy), grid
+
+        Returns: ground_shade (dictionary: daylight step of the day: shaded area in %)'''
+
+    states = [strategy.start_day(context, day_of_unit) for strategy in strategies]
+
+    # timesteps which reuse other timesteps of the same day are evaluated last
+    deferred = set().union(*[strategy.deferred_steps(state) for strategy, state in zip(strategies, states)])
+    steps = sorted(np.flatnonzero(context.daylight_windows[day_of_unit]), key=lambda step: step in deferred)
+
+    # if a strategy observes the results, the shaded grid points of every timestep are counted on a separate grid first
+    observers = [(strategy, state) for strategy, state in zip(strategies, states) if strategy.observes]
+    step_grid = context.new_grid() if len(observers) > 0 else grid
+
+    ground_shade = {}
+    for step in steps:
+        for strategy, state in zip(strategies, states):
+            ground_shade[step] = strategy.evaluate(context, state, day_of_unit, step, step_grid)
+            if ground_shade[step] != None:
+                break
+
+        if len(observers) > 0:
+            footprint = step_grid.counts > 0
+            for strategy, state in observers:
+                strategy.observe(context, state, day_of_unit, step, ground_shade[step], footprint)
+
+            grid.add_counts(step_grid.counts, 1)
+            step_grid.reset()
+
+    return ground_shade
+
+def evaluate_day(context: unit_context, day_of_unit: int, strategies: list, percentage_intervals: int):
+    '''Calculates all timesteps of one day of the unit (days are independent, they only read the context and count on their own grid).
+
+        Parameters: context, day_of_unit, strategies (see evaluate_steps), percentage_intervals
+
+        Returns: lines of the day, daylight steps of the day, line of the percentage of time shaded (None if it cannot be calculated)'''
+
+    new_lines, month, day = context.day_lines(day_of_unit)
+
+    if not context.valid_azimuth(day_of_unit):
+        print("Invalid azimuth calculated at lat=", context.lat, ", year=", context.year, ", month=", month, "day=", day)
+        return [], [], None
+
+    # shade calculation only for timesteps with the sun over the horizon (apparent elevation >= 0°)
+    grid = context.new_grid()
+    ground_shade = evaluate_steps(context, day_of_unit, strategies, grid)
+
+    daylight_steps = sorted(ground_shade)
+    for step in daylight_steps:
+        new_lines[step][6] = ground_shade[step]
+
+    # percentage of time shaded can only be calculated if the sun was over the horizon on that day
+    if grid.timestep_count == 0:
+        print("No daylight at lat=", context.lat, ", year=", context.year, ", month=", month, "day=", day, ", percentage of time shaded is not calculated.")
+        return new_lines, daylight_steps, None
+
+    percentage_steps, percentage_counts_dict = grid.evaluate(percentage_intervals)
+
+    # adding line to percentage of time shaded results
+    new_line = [context.lat, context.long, round(month), round(day)]
+
+    for bin in percentage_counts_dict:
+        new_line.append(percentage_counts_dict[bin])
+
+    return new_lines, daylight_steps, new_line
+
+def evaluate_days(context: unit_context, days, strategies: list, percentage_intervals: int, threads: int = 1):
+    '''Calculates the given days of the unit one after another or in a thread pool (see evaluate_day).
+
+        Parameters: context, days (days of the unit), strategies, percentage_intervals, threads
+
+        Returns: dictionary (day of the unit: result of evaluate_day)'''
+
+    if threads > 1:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as executor:
+            return dict(zip(days, executor.map(lambda day_of_unit: evaluate_day(context, day_of_unit, strategies, percentage_intervals), days)))
+
+    return {day_of_unit: evaluate_day(context, day_of_unit, strategies, percentage_intervals) for day_of_unit in days}
+
+def interpolate_day(context: unit_context, day_of_unit: int, day_before: int, result, day_after: int, next_result, strategies: list, percentage_intervals: int):
+    '''Interpolates one day of the unit from the calculated days before and after it (see day_sampling.py), days next to days which could not be calculated are calculated.
+
+        Parameters: context, day_of_unit, day_before, result, day_after, next_result (calculated days and their results), strategies, percentage_intervals (see evaluate_day)
+
+        Returns: see evaluate_day'''
+
+    if result[2] == None or next_result[2] == None or not context.valid_azimuth(day_of_unit):
+        return evaluate_day(context, day_of_unit, strategies, percentage_intervals)
+
+    new_lines, month, day = context.day_lines(day_of_unit)
+    daylight_steps = list(np.flatnonzero(context.daylight_windows[day_of_unit]))
+    weight = (day_of_unit - day_before) / (day_after - day_before)
+
+    # timesteps around sunrise and sunset without daylight on one of the calculated days are calculated by the last strategy (their shaded grid points are not used)
+    missing_steps = day_sampling.interpolate_lines(new_lines, daylight_steps, result, next_result, weight)
+    if len(missing_steps) > 0:
+        scratch_grid = context.new_grid()
+        for step in missing_steps:
+            new_lines[step][6] = strategies[-1].evaluate(context, None, day_of_unit, step, scratch_grid)
+
+    if len(daylight_steps) == 0:
+        return new_lines, daylight_steps, None
+
+    return new_lines, daylight_steps, day_sampling.interpolate_percentages([context.lat, context.long, round(month), round(day)], result[2], next_result[2], weight)
@@ -0,0 +1,89 @@
+import numpy as np
+
+# The declination changes slowly, so the shade of consecutive days differs very little.
+# Only every k-th day of a work unit (and its last day) is calculated, days where the daily shade profile changes fast can be refined by calculating additional days in between. All other days are interpolated linearly from the calculated days before and after them.
+
+def sample_days(number_of_days: int, day_stride: int):
+    '''Days of a work unit which are calculated: every day_stride-th day and the last day (so every other day lies between two calculated days).
+
+        Parameters: number_of_days, day_stride
+
+        Returns: days (sorted list of days of the unit)'''
+
+    if day_stride < 1:
+        print("Day stride must be at least 1.")
+        exit()
+
+    return sorted(set(range(0, number_of_days, day_stride)) | {number_of_days - 1})
+
+def profile_change(result, other_result):
+    '''Largest change of the ground shade between two calculated days (for timesteps with daylight on both days).
+
+        Parameters: result, other_result (lines of the day, daylight steps of the day, line of the percentage of time shaded, see sweep.simulate_unit)
+
+        Returns: change (in %-points, inf if one of the days could not be calculated)'''
+
+    if len(result[0]) == 0 or len(other_result[0]) == 0 or result[2] == None or other_result[2] == None:
+        return np.inf
+
+    common_steps = sorted(set(result[1]) & set(other_result[1]))
+    if len(common_steps) == 0:
+        return 0.0
+
+    return max(abs(result[0][step][6] - other_result[0][step][6]) for step in common_steps)
+
+def refine_days(day_results: dict, day_tolerance: float):
+    '''Days in the middle of two neighbouring calculated days with a profile change larger than day_tolerance (adaptive sampling).
+
+        Parameters: day_results (calculated days: results), day_tolerance (in %-points)
+
+        Returns: additional days (list)'''
+
+    days = sorted(day_results)
+
+    return [(day + next_day) // 2 for day, next_day in zip(days[:-1], days[1:]) if next_day - day > 1 and profile_change(day_results[day], day_results[next_day]) > day_tolerance]
+
+def interpolate_lines(new_lines, daylight_steps, result, next_result, weight: float):
+    '''Sets the ground shade of a day by linear interpolation between the calculated days before and after it (only for timesteps with daylight on both days).
+
+        Parameters:
+        - new_lines: lines of the interpolated day (ground shade is set in place)
+        - daylight_steps: daylight steps of the interpolated day
+        - result, next_result: results of the calculated days before and after the day (see profile_change)
+        - weight: position of the day between the calculated days (0: day before, 1: day after)
+
+        Returns: steps which cannot be interpolated (no daylight on one of the calculated days)'''
+
+    common_steps = set(result[1]) & set(next_result[1])
+    missing_steps = []
+
+    for step in daylight_steps:
+        if step in common_steps:
+            new_lines[step][6] = (1 - weight) * result[0][step][6] + weight * next_result[0][step][6]
+        else:
+            missing_steps.append(step)
+
+    return missing_steps
+
+def interpolate_percentages(new_line, line, next_line, weight: float):
+    '''Percentage of time shaded of a day by linear interpolation of the shares of all categories of the calculated days before and after it.
+
+        Parameters: new_line (lat, long, month, day of the interpolated day), line, next_line (percentage of time shaded of the calculated days), weight (see interpolate_lines)
+
+        Returns: line of the percentage of time shaded'''
+
+    return new_line + [(1 - weight) * share + weight * next_share for share, next_share in zip(line[4:], next_line[4:])]
+
+def day_deviation(result, exact_result):
+    '''Deviation of an interpolated day from the exact calculation of the same day (for the validation of the sampling).
+
+        Parameters: result, exact_result (see profile_change)
+
+        Returns: largest deviation of the ground shade (in %-points), largest deviation of the shares of the percentage of time shaded'''
+
+    ground_shade_deviation = max([abs(result[0][step][6] - exact_result[0][step][6]) for step in exact_result[1]], default=0.0)
+
+    if result[2] == None or exact_result[2] == None:
+        return ground_shade_deviation, 0.0
+
+    return ground_shade_deviation, max([abs(share - exact_share) for share, exact_share in zip(result[2][4:], exact_result[2][4:])], default=0.0)
@@ -0,0 +1,90 @@
+import solarposition
+
+import json
+import os
+import numpy as np
+import pvlib
+
+# Solar tables (see solarposition.calculate_solar_table) only depend on the location, the year and the timestep, not on the PV system.
+# They are stored once per (lat, long, year, freq) as a .npy file (one column per entry of the solar table) and opened memory-mapped, so repeated runs and parallel workers share the pages instead of recalculating the solar position.
+# A metadata file next to every table records the pvlib version and the options of the calculation, tables with different metadata are recalculated.
+
+solar_table_columns = ('azimuth_rad', 'elevation_rad', 'angle_in_plane_EW', 'angle_in_plane_NS', 'proximate_azimuth', 'apparent_elevation')
+
+def cache_metadata(lat, long, year: int, freq: str = '15min'):
+    '''Metadata of a cached solar table: location, year, timestep, pvlib version and options of the solar position calculation.
+
+        Parameters: lat, long, year, freq
+
+        Returns: metadata (dictionary)'''
+
+    return {'lat': float(lat), 'long': float(long), 'year': int(year), 'freq': freq, 'pvlib_version': pvlib.__version__, 'options': solarposition.solar_position_options, 'columns': list(solar_table_columns)}
+
+def cache_filename(directory: str, lat, long, year: int, freq: str = '15min'):
+    '''File name of a cached solar table without extension (the table is stored as .npy, its metadata as .json).
+
+        Parameters: directory, lat, long, year, freq
+
+        Returns: filename'''
+
+    return os.path.join(directory, "solar_table_lat=" + str(lat) + "_long=" + str(long) + "_" + str(year) + "_" + freq)
+
+def write_solar_table(directory: str, lat, long, year: int, freq: str = '15min'):
+    '''Calculates the solar table for all timesteps of a year and stores it. Table and metadata are written to temporary files first (metadata last), so other processes never read an incomplete table.
+
+        Parameters: directory, lat, long, year, freq
+
+        Returns: -'''
+
+    filename = cache_filename(directory, lat, long, year, freq)
+    solar_table = solarposition.calculate_solar_table(lat, long, solarposition.generate_timesteps(year, freq))
+
+    os.makedirs(directory, exist_ok=True)
+    temporary_filename = filename + "." + str(os.getpid()) + ".tmp"
+
+    np.save(temporary_filename + ".npy", np.column_stack([solar_table[column] for column in solar_table_columns]))
+    os.replace(temporary_filename + ".npy", filename + ".npy")
+
+    with open(temporary_filename + ".json", 'w') as f_object:
+        json.dump(cache_metadata(lat, long, year, freq), f_object)
+    os.replace(temporary_filename + ".json", filename + ".json")
+
+def is_valid(directory: str, lat, long, year: int, freq: str = '15min'):
+    '''Checks if a cached solar table exists and was calculated with the current pvlib version and options.
+
+        Parameters: directory, lat, long, year, freq
+
+        Returns: True/False'''
+
+    filename = cache_filename(directory, lat, long, year, freq)
+
+    if not os.path.exists(filename + ".json") or not os.path.exists(filename + ".npy"):
+        return False
+
+    with open(filename + ".json") as f_object:
+        metadata = json.load(f_object)
+
+    return metadata == json.loads(json.dumps(cache_metadata(lat, long, year, freq)))
+
+def load_solar_table(directory: str, lat, long, year: int, first_timestep: int = None, last_timestep: int = None, freq: str = '15min'):
+    '''Solar table of a location and year from the cache (memory-mapped, read-only arrays), it is calculated and stored if it does not exist or is not valid (see is_valid).
+
+        Parameters: directory, lat, long, year, first_timestep, last_timestep (range of timesteps of the year, last_timestep excluded, None: whole year), freq
+
+        Returns: solar_table (see solarposition.calculate_solar_table)'''
+
+    if not is_valid(directory, lat, long, year, freq):
+        write_solar_table(directory, lat, long, year, freq)
+
+    # the number of timesteps is checked as well (e.g. for files which were cut off)
+    try:
+        table = np.load(cache_filename(directory, lat, long, year, freq) + ".npy", mmap_mode='r')
+    except ValueError:
+        table = None
+
+    if table is None or table.shape != (len(solarposition.generate_timesteps(year, freq)), len(solar_table_columns)):
+        print("Cached solar table for lat=", lat, ", long=", long, ", year=", year, " is damaged and is calculated again.")
+        write_solar_table(directory, lat, long, year, freq)
+        table = np.load(cache_filename(directory, lat, long, year, freq) + ".npy", mmap_mode='r')
+
+    return {column: table[first_timestep:last_timestep, index] for index, column in enumerate(solar_table_columns)}
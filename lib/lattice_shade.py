@@ -0,0 +1,205 @@
+import numpy as np
+
+# The shadows of all PV panels are the same parallelogram, translated on a regular lattice (distance_EW in x, distance_NS in y).
+# A horizontal line at height y cuts every shadow in an x-interval, so the shaded area is the integral of the length of the union of these intervals over y.
+# Between the y values where either a shadow corner is passed or two interval ends (or an interval end and the field border) cross, the union length is linear in y, so the midpoint rule is exact.
+
+def shadow_intervals(x_corners, y_corners, y, side=None, x_offset=0, y_offset=0):
+    '''Calculates the x-interval covered by a single shadow parallelogram for every given y value.
+
+        Parameters:
+        - x_corners: x coordinates of the four shadow corners (in order around the parallelogram)
+        - y_corners: y coordinates of the four shadow corners (in order around the parallelogram)
+        - y: array of y values
+        - side: None (closed shadow), "below" or "above" (limit of the intervals for lines approaching y from below/above, i.e. a line through the lowest/highest shadow corner does not hit the shadow)
+        - x_offset, y_offset: translation of the shadow (arrays broadcastable with y), added to the corners before the intervals are calculated
+
+        Returns:
+        - x_left, x_right: interval ends (nan where the horizontal line does not hit the shadow)
+    '''
+
+    y = np.asarray(y, dtype=float)
+    shape = np.broadcast_shapes(y.shape, np.shape(x_offset), np.shape(y_offset))
+    x_left = np.full(shape, np.inf)
+    x_right = np.full(shape, -np.inf)
+
+    # translated corners (same arithmetic as for the shadow polygons: corner + offset)
+    x_corners = [x_corner + x_offset for x_corner in x_corners]
+    y_corners = [y_corner + y_offset for y_corner in y_corners]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for k in range(4):
+            x_0, y_0 = x_corners[k], y_corners[k]
+            x_1, y_1 = x_corners[(k + 1) % 4], y_corners[(k + 1) % 4]
+
+            # horizontal edges are covered by the neighbouring edges
+            t = (y - y_0) / (y_1 - y_0)
+            on_edge = (y_0 != y_1) & (t >= 0) & (t <= 1)
+            x = x_0 + t * (x_1 - x_0)
+
+            x_left = np.where(on_edge, np.minimum(x_left, x), x_left)
+            x_right = np.where(on_edge, np.maximum(x_right, x), x_right)
+
+    outside = x_left > x_right
+    if side == "below":
+        outside |= y <= np.minimum.reduce(y_corners)
+    elif side == "above":
+        outside |= y >= np.maximum.reduce(y_corners)
+    x_left[outside] = np.nan
+    x_right[outside] = np.nan
+
+    return x_left, x_right
+
+def lattice_intervals(x_corners, y_corners, distance_EW, distance_NS, number_of_panels_EW, number_of_panels_NS, y, side=None):
+    '''Calculates the x-intervals covered by all shadows on the panel lattice for every given y value.
+
+        Parameters:
+        - x_corners, y_corners: corners of the shadow of the first panel (i = j = 0)
+        - distance_EW, distance_NS: lattice offsets between panels
+        - number_of_panels_EW, number_of_panels_NS: lattice size
+        - y: array of y values
+        - side: see shadow_intervals
+
+        Returns:
+        - x_left, x_right: interval ends with one column per shadow that can be hit at the given y (nan where a shadow is not hit)
+    '''
+
+    y = np.asarray(y, dtype=float)
+    y_corners = np.asarray(y_corners, dtype=float)
+
+    # only a few neighbouring panel rows can have a shadow at a given y (rows are shifted by distance_NS in y)
+    number_of_rows_hit = min(int((y_corners.max() - y_corners.min()) // distance_NS) + 3, number_of_panels_NS)
+    first_row = np.clip(np.floor((y - y_corners.max()) / distance_NS), 0, number_of_panels_NS - number_of_rows_hit).astype(int)
+    rows = first_row[:, np.newaxis] + np.arange(number_of_rows_hit)
+
+    # shadows within a row are shifted by distance_EW in x
+    offsets_EW = np.arange(number_of_panels_EW) * distance_EW
+
+    x_left, x_right = shadow_intervals(x_corners, y_corners, y[:, np.newaxis, np.newaxis], side, offsets_EW, (rows * distance_NS)[:, :, np.newaxis])
+
+    return x_left.reshape(len(y), -1), x_right.reshape(len(y), -1)
+
+def union_length(x_left, x_right, x_min, x_max):
+    '''Calculates the length of the union of intervals (one set of intervals per row), clipped to [x_min, x_max].
+
+        Parameters:
+        - x_left, x_right: interval ends (2D arrays, nan for empty intervals)
+        - x_min, x_max: clipping bounds
+
+        Returns:
+        - length: covered length for every row
+    '''
+
+    # clip to field, empty intervals get zero length
+    empty = np.isnan(x_left)
+    x_left = np.where(empty, x_min, np.clip(x_left, x_min, x_max))
+    x_right = np.where(empty, x_min, np.clip(x_right, x_min, x_max))
+
+    # sort intervals by left end, only the part right of all previous intervals adds to the union
+    order = np.argsort(x_left, axis=1)
+    x_left = np.take_along_axis(x_left, order, axis=1)
+    x_right = np.take_along_axis(x_right, order, axis=1)
+
+    covered_until = np.maximum.accumulate(x_right, axis=1)
+    covered_until = np.concatenate([np.full((x_left.shape[0], 1), x_min), covered_until[:, :-1]], axis=1)
+
+    return np.maximum(x_right - np.maximum(x_left, covered_until), 0).sum(axis=1)
+
+def merge_intervals(x_left, x_right):
+    '''Merges overlapping or touching intervals (one set of intervals per row), so overlapping shadows are only counted once.
+
+        Parameters:
+        - x_left, x_right: interval ends (2D arrays, nan for empty intervals)
+
+        Returns:
+        - rows: row of every merged interval
+        - x_start, x_end: ends of the merged intervals
+    '''
+
+    # sort intervals by left end, empty intervals last
+    valid = ~np.isnan(x_left)
+    order = np.argsort(np.where(valid, x_left, np.inf), axis=1)
+    valid = np.take_along_axis(valid, order, axis=1)
+    x_left = np.take_along_axis(x_left, order, axis=1)
+    covered_until = np.maximum.accumulate(np.where(valid, np.take_along_axis(x_right, order, axis=1), -np.inf), axis=1)
+
+    # a merged interval starts where an interval begins right of all previous ones and ends before the next start (or the last interval of the row)
+    previous_covered_until = np.concatenate([np.full((x_left.shape[0], 1), -np.inf), covered_until[:, :-1]], axis=1)
+    is_start = valid & (x_left > previous_covered_until)
+    is_end = valid & np.concatenate([is_start[:, 1:] | ~valid[:, 1:], np.ones((x_left.shape[0], 1), dtype=bool)], axis=1)
+
+    return np.nonzero(is_start)[0], x_left[is_start], covered_until[is_end]
+
+def _crossings(values_a, values_b, targets, y_a, y_b):
+    '''Finds the y values in (y_a, y_b) at which linear functions (given by their values at y_a and y_b) take one of the target values.'''
+
+    crossings = []
+
+    for value_a, value_b, target in zip(values_a, values_b, targets):
+        if value_a == value_b:
+            continue
+        t = (target - value_a) / (value_b - value_a)
+        crossings.append(y_a + t[(t > 0) & (t < 1)] * (y_b - y_a))
+
+    return crossings
+
+def union_area(x_corners, y_corners, distance_EW, distance_NS, number_of_panels_EW, number_of_panels_NS, x_min, x_max, y_min, y_max):
+    '''Calculates the exact area covered by the union of all shadows on the panel lattice within the rectangle [x_min, x_max] x [y_min, y_max] (buffered field).
+
+        Parameters:
+        - x_corners, y_corners: corners of the shadow of the first panel (i = j = 0), in order around the parallelogram
+        - distance_EW, distance_NS: lattice offsets between panels
+        - number_of_panels_EW, number_of_panels_NS: lattice size
+        - x_min, x_max, y_min, y_max: field bounds
+
+        Returns:
+        - area: shaded area within the field
+    '''
+
+    x_corners = np.asarray(x_corners, dtype=float)
+    y_corners = np.asarray(y_corners, dtype=float)
+
+    shadow_y_min, shadow_y_max = y_corners.min(), y_corners.max()
+    if shadow_y_min == shadow_y_max:
+        return 0.0
+
+    rows = np.arange(number_of_panels_NS)
+
+    # y values at which shadow corners are passed (interval ends change slope or appear/disappear)
+    knots = (np.unique(y_corners)[:, np.newaxis] + rows * distance_NS).ravel()
+    knots = np.unique(np.concatenate([knots[(knots > y_min) & (knots < y_max)], [y_min, y_max]]))
+
+    # interval end offsets within a row (for crossings between interval ends) and clipping targets
+    shifts_EW = np.arange(-(number_of_panels_EW - 1), number_of_panels_EW) * distance_EW
+    offsets_EW = np.arange(number_of_panels_EW) * distance_EW
+
+    breakpoints = [knots]
+
+    for y_a, y_b in zip(knots[:-1], knots[1:]):
+        # rows with a shadow in this slab
+        active = rows[(shadow_y_min + rows * distance_NS < y_b) & (shadow_y_max + rows * distance_NS > y_a)]
+        if len(active) == 0:
+            continue
+
+        # interval ends are linear within the slab, evaluate them at two inner points and extrapolate to the slab bounds
+        y_inner = np.array([y_a + (y_b - y_a) / 3, y_a + 2 * (y_b - y_a) / 3])
+        x_left, x_right = shadow_intervals(x_corners, y_corners, y_inner[:, np.newaxis], y_offset=active * distance_NS)
+        ends_inner = np.concatenate([x_left, x_right], axis=1)
+        ends_a = 2 * ends_inner[0] - ends_inner[1]
+        ends_b = 2 * ends_inner[1] - ends_inner[0]
+
+        # interval ends crossing the field border (x_min, x_max) for any panel in the row
+        for border in [x_min, x_max]:
+            breakpoints += _crossings(ends_a, ends_b, [border - offsets_EW] * len(ends_a), y_a, y_b)
+
+        # interval ends of two shadows crossing each other
+        pairs_p, pairs_q = np.triu_indices(len(ends_a), k=1)
+        breakpoints += _crossings(ends_a[pairs_p] - ends_a[pairs_q], ends_b[pairs_p] - ends_b[pairs_q], [shifts_EW] * len(pairs_p), y_a, y_b)
+
+    breakpoints = np.unique(np.concatenate(breakpoints))
+
+    # union length is linear between breakpoints, so the midpoint rule is exact
+    y_mid = (breakpoints[:-1] + breakpoints[1:]) / 2
+    x_left, x_right = lattice_intervals(x_corners, y_corners, distance_EW, distance_NS, number_of_panels_EW, number_of_panels_NS, y_mid)
+
+    return float(np.sum(union_length(x_left, x_right, x_min, x_max) * np.diff(breakpoints)))
@@ -0,0 +1,61 @@
+import numpy as np
+
+# At another longitude the sun follows (nearly) the same path, shifted in UTC by 4 minutes per degree of longitude (the sun reaches the same position earlier in the east).
+# Results of a reference longitude are reused for the timestep which is shifted by this offset (rounded to whole timesteps), if the sun direction of both timesteps differs by less than a tolerance (the difference comes from the rounding of the offset, the equation of time and the declination drift).
+
+def time_offset(long, reference_long, minutes_per_timestep: int = 15):
+    '''Number of timesteps by which the sun path at long is shifted relative to the reference longitude (rounded to whole timesteps).
+
+        Parameters: long, reference_long, minutes_per_timestep
+
+        Returns: offset (timestep t at long corresponds to timestep t + offset at the reference longitude)'''
+
+    return round((long - reference_long) * 4 / minutes_per_timestep)
+
+def offset_residual(long, reference_long, minutes_per_timestep: int = 15):
+    '''Part of the longitude difference which is not covered by the time offset (rounded to whole timesteps), the sun directions of shifted timesteps differ by up to this angle along the sun path.
+
+        Parameters: long, reference_long, minutes_per_timestep
+
+        Returns: residual (in degrees of longitude, at most half a timestep: 1.875° for 15 minutes)'''
+
+    return abs((long - reference_long) - time_offset(long, reference_long, minutes_per_timestep) * minutes_per_timestep / 4)
+
+def sun_direction_drift(azimuth_rad, elevation_rad, reference_azimuth_rad, reference_elevation_rad):
+    '''Angle between two sun directions (arrays).
+
+        Parameters: azimuth_rad, elevation_rad, reference_azimuth_rad, reference_elevation_rad
+
+        Returns: drift (in degrees)'''
+
+    cos_angle = np.cos(elevation_rad) * np.cos(reference_elevation_rad) * np.cos(azimuth_rad - reference_azimuth_rad) + np.sin(elevation_rad) * np.sin(reference_elevation_rad)
+
+    return np.degrees(np.arccos(np.clip(cos_angle, -1, 1)))
+
+def match_reference_timesteps(solar_table, reference_solar_table, reference_daylight, offset: int, daylight, tolerance: float):
+    '''Finds the timestep of the reference longitude which can be reused for every daylight timestep.
+
+        Parameters:
+        - solar_table: solar position at the longitude (see solarposition.calculate_solar_table)
+        - reference_solar_table: solar position at the reference longitude for the same timesteps
+        - reference_daylight: timesteps which were calculated at the reference longitude (mask)
+        - offset: time offset in timesteps (see time_offset)
+        - daylight: daylight timesteps at the longitude (mask)
+        - tolerance: maximum drift of the sun direction in degrees
+
+        Returns:
+        - reference_timesteps: reused timestep of the reference longitude for every timestep (-1: timestep has to be calculated)
+        - drift: drift of the sun direction in degrees for every daylight timestep (inf if there is no reference timestep within the unit)'''
+
+    daylight = np.asarray(daylight, dtype=bool).ravel()
+    reference_daylight = np.asarray(reference_daylight, dtype=bool).ravel()
+
+    # shifted timesteps outside of the unit cannot be reused
+    reference_timesteps = np.arange(len(daylight)) + offset
+    valid = daylight & (reference_timesteps >= 0) & (reference_timesteps < len(daylight))
+    valid[valid] = reference_daylight[reference_timesteps[valid]]
+
+    drift = np.full(len(daylight), np.inf)
+    drift[valid] = sun_direction_drift(solar_table['azimuth_rad'][valid], solar_table['elevation_rad'][valid], reference_solar_table['azimuth_rad'][reference_timesteps[valid]], reference_solar_table['elevation_rad'][reference_timesteps[valid]])
+
+    return np.where(valid & (drift <= tolerance), reference_timesteps, -1), drift
@@ -0,0 +1,40 @@
+import longitude_expansion
+
+import math
+import numpy as np
+
+# The sun direction at solar noon + t is the direction at solar noon - t mirrored at the N/S plane (up to the change of the declination during the day).
+# For systems which are mirror symmetric about the N/S axis through the middle of the field (see system_geometry.is_mirror_symmetric), the ground shade of an afternoon timestep equals the ground shade of the morning timestep with the mirrored sun direction and its shaded grid points are the mirrored shaded grid points.
+
+def match_mirrored_timesteps(azimuth_rad, elevation_rad, angle_in_plane_EW, daylight, tolerance: float):
+    '''Finds the morning timestep with the mirrored sun direction for every afternoon timestep of a day (sun in the west).
+
+        Parameters:
+        - azimuth_rad, elevation_rad, angle_in_plane_EW: sun position for every timestep of the day (arrays)
+        - daylight: daylight timesteps of the day (mask)
+        - tolerance: maximum difference (in degrees) between the mirrored sun direction and the sun direction of the morning timestep
+
+        Returns:
+        - mirrored_timesteps: morning timestep which is mirrored for every timestep (-1: timestep has to be calculated, e.g. morning timesteps)
+        - drift: difference of the sun directions in degrees for every timestep (inf if the timestep is not mirrored)'''
+
+    daylight = np.asarray(daylight, dtype=bool)
+    azimuth_rad, elevation_rad = np.asarray(azimuth_rad, dtype=float), np.asarray(elevation_rad, dtype=float)
+
+    afternoon = np.flatnonzero(daylight & (np.asarray(angle_in_plane_EW) > math.pi/2))
+    morning = np.flatnonzero(daylight & (np.asarray(angle_in_plane_EW) <= math.pi/2))
+
+    mirrored_timesteps = np.full(len(daylight), -1)
+    drift = np.full(len(daylight), np.inf)
+
+    if len(afternoon) == 0 or len(morning) == 0:
+        return mirrored_timesteps, drift
+
+    # differences between all mirrored afternoon directions (azimuth mirrored at the N/S plane) and all morning directions
+    drifts = longitude_expansion.sun_direction_drift(2*math.pi - azimuth_rad[afternoon, np.newaxis], elevation_rad[afternoon, np.newaxis], azimuth_rad[np.newaxis, morning], elevation_rad[np.newaxis, morning])
+    closest = np.argmin(drifts, axis=1)
+
+    drift[afternoon] = drifts[np.arange(len(afternoon)), closest]
+    mirrored_timesteps[afternoon] = np.where(drift[afternoon] <= tolerance, morning[closest], -1)
+
+    return mirrored_timesteps, drift
@@ -1,10 +1,481 @@
 import solarposition
 import shade_grid
+import lattice_shade
 
+import functools
+import hashlib
 import math
+import numpy as np
+import shapely
 from shapely.geometry import Polygon as shapely_Polygon
 from shapely.validation import make_valid
 
+# fixed geometry parameters of a PV system (the tilt of the panels is not part of the geometry, since it changes for tracking systems and is set per latitude for standard systems)
+geometry_parameters = ('system_type', 'PV_base_height', 'PV_width', 'PV_length', 'distance_EW', 'distance_NS', 'number_of_panels_EW', 'number_of_panels_NS')
+
+# tilt and field dependent geometry is cached (least recently used entries are removed), a fixed system only needs one entry per tilt (standard systems: one per latitude)
+@functools.lru_cache(maxsize=256)
+def cached_panel_geometry(geometry, PV_angle_EW: float, PV_angle_NS: float):
+    '''Tilt dependent panel geometry (see system_geometry.calculate_panel_geometry) for tilts in degrees, cached by geometry and tilts.'''
+
+    return geometry.calculate_panel_geometry((PV_angle_EW / 180)*math.pi, (PV_angle_NS / 180)*math.pi)
+
+@functools.lru_cache(maxsize=16)
+def field_polygon(field_width: float, field_length: float):
+    '''Polygon of the entire field including the 10m buffer, cached by field dimensions (shapely geometries are immutable and can be shared).'''
+
+    return make_valid(shapely_Polygon([(-10, -10), (-10 + (field_width + 20), -10), (-10 + (field_width + 20), -10 + (field_length + 20)), (-10, -10 + (field_length + 20))]))
+
+@functools.lru_cache(maxsize=16)
+def lattice_offsets(number_of_panels_EW: int, number_of_panels_NS: int, distance_EW: float, distance_NS: float):
+    '''Offsets of all panels on the lattice (one row per panel, i: N/S, j: E/W), cached by lattice (read-only arrays).'''
+
+    i, j = np.meshgrid(np.arange(number_of_panels_NS), np.arange(number_of_panels_EW), indexing='ij')
+    offsets_x = (j * distance_EW).reshape(-1, 1)
+    offsets_y = (i * distance_NS).reshape(-1, 1)
+    offsets_x.setflags(write=False)
+    offsets_y.setflags(write=False)
+
+    return offsets_x, offsets_y
+
+class system_geometry:
+    __slots__ = geometry_parameters
+
+    def __init__(self, system_type:str, PV_base_height:float, PV_width:float, PV_length:float, distance_EW:float, distance_NS:float, number_of_panels_EW:int, number_of_panels_NS:int):
+        ''' Immutable description of the geometry of a PV system (parameters as for system, without the panel tilts). All shading calculations take the current tilt as an argument, so one object can be shared between threads/processes and used as a cache key.
+            Objects cannot be changed after initialization, they are compared and hashed by their parameters and pickled as a tuple of parameters.
+        '''
+        for name, value in zip(geometry_parameters, (system_type, PV_base_height, PV_width, PV_length, distance_EW, distance_NS, number_of_panels_EW, number_of_panels_NS)):
+            object.__setattr__(self, name, value)
+
+        if self.distance_NS < self.PV_length or self.distance_EW < self.PV_width:
+            print("Distance between panels must be larger or equal to the dimension of the panel in that direction.")
+            exit()
+
+    def __setattr__(self, name, value):
+        raise AttributeError("system_geometry is immutable, create a new object to change " + name + ".")
+
+    def __delattr__(self, name):
+        raise AttributeError("system_geometry is immutable, " + name + " cannot be deleted.")
+
+    def parameters(self):
+        '''Returns the geometry parameters (in the order of geometry_parameters).
+
+            Parameters: -
+
+            Returns: parameters (tuple)'''
+
+        return tuple(getattr(self, name) for name in geometry_parameters)
+
+    def __eq__(self, other):
+        return isinstance(other, system_geometry) and self.parameters() == other.parameters()
+
+    def __hash__(self):
+        return hash(self.parameters())
+
+    def __reduce__(self):
+        return (system_geometry, self.parameters())
+
+    def __repr__(self):
+        return "system_geometry" + repr(self.parameters())
+
+    def stable_hash(self):
+        '''Returns a hash of the geometry parameters which is the same in every process and session (unlike hash(), which is salted for strings), e.g. for file names of cached results.
+
+            Parameters: -
+
+            Returns: hash (hexadecimal string)'''
+
+        return hashlib.sha256(repr(self.parameters()).encode()).hexdigest()[:16]
+
+    def tracking_tilt_schedule(self, angle_in_plane_EW):
+        '''Calculates the tilt of the PV panels (in the E/W plane) of a tracking system for all given angles of incoming sun beams in the E/W plane (e.g. all timesteps of a solar table), the panels face the sun.
+
+            Parameters: angle_in_plane_EW (array)
+
+            Returns: PV_angle_EW (tilt in the E/W plane in degrees for every timestep, array)'''
+
+        angle_in_plane_EW_degrees = (np.asarray(angle_in_plane_EW, dtype=float) / math.pi) * 180
+        return 90 - angle_in_plane_EW_degrees
+
+    def backtracking_tilt_schedule(self, angle_in_plane_EW):
+        '''Calculates the tilt of the PV panels (in the E/W plane) of a backtracking system for all given angles of incoming sun beams in the E/W plane (e.g. all timesteps of a solar table): the panels face the sun, unless this leads to self-shading, then they are turned away from the sun until no self-shading occurs.
+
+            Parameters: angle_in_plane_EW (array)
+
+            Returns: PV_angle_EW (tilt in the E/W plane in degrees for every timestep, array)'''
+
+        angle_in_plane_EW = np.asarray(angle_in_plane_EW, dtype=float)
+
+        # regular tracking tilt
+        angle_in_plane_EW_degrees = (angle_in_plane_EW / math.pi) * 180
+        PV_angle_EW = 90 - angle_in_plane_EW_degrees
+
+        # calculate shade width in self-shading to check if self-shading occurs
+        angle_in_plane_EW_mod = np.where(angle_in_plane_EW <= (math.pi/2), angle_in_plane_EW, math.pi - angle_in_plane_EW) # angle above ground - making sun direction (from west or east) irrelevant
+        shade_width = self.PV_width - np.sin(angle_in_plane_EW_mod) * self.distance_EW
+        self_shading = (shade_width > 0) & (angle_in_plane_EW > 0)
+
+        # adjust panel tilt in E/W plane so no self-shading occurs (alpha is the angle of the sun above the ground, panels are turned towards the east for the sun in the east and towards the west for the sun in the west)
+        sun_in_east = angle_in_plane_EW < (math.pi/2)
+        with np.errstate(invalid='ignore'):
+            alpha = np.where(sun_in_east, angle_in_plane_EW, math.pi - angle_in_plane_EW)
+            beta = math.pi - np.arcsin((self.distance_EW * np.sin(alpha)) / self.PV_width)
+            gamma = math.pi - alpha - beta
+            backtracking_angle = np.where(sun_in_east, np.degrees(gamma), -np.degrees(gamma))
+
+        return np.where(self_shading, backtracking_angle, PV_angle_EW)
+
+    def tilt_schedule(self, angle_in_plane_EW, PV_angle_EW: float = 0):
+        '''Calculates the tilt of the PV panels in the E/W plane for all given angles of incoming sun beams in the E/W plane: tracking and backtracking systems are repositioned for every timestep, all other systems keep their tilt.
+
+            Parameters: angle_in_plane_EW (array), PV_angle_EW (fixed tilt in the E/W plane in degrees of systems which are not tracking)
+
+            Returns: PV_angle_EW (tilt in the E/W plane in degrees for every timestep, array)'''
+
+        if self.system_type == "tracking":
+            return self.tracking_tilt_schedule(angle_in_plane_EW)
+
+        if self.system_type == "backtracking":
+            return self.backtracking_tilt_schedule(angle_in_plane_EW)
+
+        return np.full(np.shape(angle_in_plane_EW), float(PV_angle_EW))
+
+    def calculate_shadow_corners(self, angle_in_plane_EW, angle_in_plane_NS, PV_angle_EW_rad, PV_angle_NS_rad):
+        ''' Calculates the corners of the shade created by the first PV panel (all other shadows are translated by multiples of distance_EW and distance_NS).
+        
+            Parameters: 
+            - angle_in_plane_EW: angle between ground and an incoming sun beam, projected on the east/west plane
+            - angle_in_plane_NS: angle between ground and an incoming sun beam, projected on the north/south plane
+            - PV_angle_EW_rad: tilt angle of the PV panel in the east/west plane in radians
+            - PV_angle_NS_rad: tilt angle of the PV panel in the north/south plane in radians
+            
+            Returns:
+            - x_corners: x coordinates of the shadow corners (SW, SE, NE, NW)
+            - y_corners: y coordinates of the shadow corners (SW, SE, NE, NW)
+        '''
+
+        return self.project_shadow_corners(angle_in_plane_EW, angle_in_plane_NS, self.calculate_panel_geometry(PV_angle_EW_rad, PV_angle_NS_rad))
+
+    def calculate_panel_geometry(self, PV_angle_EW_rad, PV_angle_NS_rad):
+        ''' Calculates the tilt dependent part of the shadow corners (independent of the sun position): corner heights and position of the corners (from a bird's eye view).
+
+            Parameters:
+            - PV_angle_EW_rad: tilt angle of the PV panel in the east/west plane in radians
+            - PV_angle_NS_rad: tilt angle of the PV panel in the north/south plane in radians
+
+            Returns:
+            - PV_heights: heights of the panel corners (SW, SE, NE, NW)
+            - x_PV: x coordinates of the panel corners (SW, SE, NE, NW)
+            - y_PV: y coordinates of the panel corners (SW, SE, NE, NW)
+        '''
+
+        # edge height differences
+        height_diff_N = math.sin(PV_angle_NS_rad) * self.PV_length / 2
+        height_diff_S = - math.sin(PV_angle_NS_rad) * self.PV_length / 2
+        height_diff_E = - math.sin(PV_angle_EW_rad) * self.PV_width / 2
+        height_diff_W = math.sin(PV_angle_EW_rad) * self.PV_width / 2
+
+        # corner height differences
+        PV_height_NE = self.PV_base_height + height_diff_N + height_diff_E
+        PV_height_NW = self.PV_base_height + height_diff_N + height_diff_W
+        PV_height_SE = self.PV_base_height + height_diff_S + height_diff_E
+        PV_height_SW = self.PV_base_height + height_diff_S + height_diff_W
+
+        # x coordinates of the panel corners
+        if (self.system_type == "standard"):
+            x_PV_E = self.PV_width / 2 + abs(math.cos(PV_angle_EW_rad)) * (self.PV_width / 2)
+            x_PV_W = self.PV_width / 2 - abs(math.cos(PV_angle_EW_rad)) * (self.PV_width / 2)
+        else:
+            x_PV_E = abs(math.cos(PV_angle_EW_rad)) * (self.PV_width / 2)
+            x_PV_W = - abs(math.cos(PV_angle_EW_rad)) * (self.PV_width / 2)
+
+        # y coordinates of the panel corners
+        y_PV_N = abs(math.cos(PV_angle_NS_rad)) * self.PV_length
+
+        return (PV_height_SW, PV_height_SE, PV_height_NE, PV_height_NW), (x_PV_W, x_PV_E, x_PV_E, x_PV_W), (0, 0, y_PV_N, y_PV_N)
+
+    def project_shadow_corners(self, angle_in_plane_EW, angle_in_plane_NS, panel_geometry):
+        ''' Calculates the corners of the shade created by the first PV panel from the tilt dependent panel geometry (see calculate_panel_geometry), only this projection depends on the sun position.
+
+            Parameters:
+            - angle_in_plane_EW: angle between ground and an incoming sun beam, projected on the east/west plane
+            - angle_in_plane_NS: angle between ground and an incoming sun beam, projected on the north/south plane
+            - panel_geometry: PV_heights, x_PV, y_PV (see calculate_panel_geometry)
+
+            Returns:
+            - x_corners: x coordinates of the shadow corners (SW, SE, NE, NW)
+            - y_corners: y coordinates of the shadow corners (SW, SE, NE, NW)
+        '''
+
+        PV_heights, x_PV, y_PV = panel_geometry
+
+        # shadow position (corners are moved away from the sun depending on their height)
+        tan_EW = math.tan(angle_in_plane_EW)
+        tan_NS = math.tan(angle_in_plane_NS)
+
+        x_corners = [x_PV_corner - PV_height / tan_EW for x_PV_corner, PV_height in zip(x_PV, PV_heights)]
+        y_corners = [PV_height / tan_NS + y_PV_corner for y_PV_corner, PV_height in zip(y_PV, PV_heights)]
+
+        return x_corners, y_corners
+
+    def calculate_shade_polygon(self, x_corners, y_corners, field_width, field_length):
+        ''' Calculates the shaded part of the (buffered) field as a shapely geometry. All shadows are built at once as one coordinate array and merged with a single union.
+        
+            Parameters: 
+            - x_corners: x coordinates of the shadow corners of the first panel (SW, SE, NE, NW)
+            - y_corners: y coordinates of the shadow corners of the first panel (SW, SE, NE, NW)
+            - field_width: witdth of the field without buffer
+            - field_length: length of the field without buffer
+            
+            Returns:
+            - poly_field_complete: polygon of the entire field
+            - poly_shade: shaded part of the field
+        '''
+
+        # entire field, used to clip the shadows and to calculate the shaded area
+        poly_field_complete = field_polygon(field_width, field_length)
+
+        # lattice offsets of all panels (i: N/S, j: E/W)
+        offsets_x, offsets_y = lattice_offsets(self.number_of_panels_EW, self.number_of_panels_NS, self.distance_EW, self.distance_NS)
+
+        # coordinate array of all individual shadows (panels x corners x 2)
+        coordinates = np.stack([np.asarray(x_corners) + offsets_x, np.asarray(y_corners) + offsets_y], axis=-1)
+        poly_shadows = shapely.make_valid(shapely.polygons(coordinates))
+
+        # merging all shadows and clipping them to the field
+        poly_shade = make_valid(shapely.intersection(shapely.union_all(poly_shadows), poly_field_complete))
+
+        return poly_field_complete, poly_shade
+
+    def calculate_ground_shade(self, angle_in_plane_EW, angle_in_plane_NS, PV_angle_EW, PV_angle_NS, field_width, field_length, grid: shade_grid.shade_grid = None, engine: str = "shapely", tilt_resolution: float = None):
+        ''' Calculates the position and area of the shade created by PV panels on the field.
+        
+            Parameters: 
+            - angle_in_plane_EW: angle between ground and an incoming sun beam, projected on the east/west plane
+            - angle_in_plane_NS: angle between ground and an incoming sun beam, projected on the north/south plane
+            - PV_angle_EW: tilt of the PV panels in the E/W plane in degrees for this timestep (e.g. taken from tilt_schedule for tracking systems)
+            - PV_angle_NS: tilt of the PV panels in the N/S plane in degrees
+            - field_width: witdth of the field without buffer
+            - field_length: length of the field without buffer
+            - grid: grid for percentage shaded calculations
+            - engine: "shapely" (reference, union of all shadow polygons clipped to the field) or "analytic" (exact union area of the shadow lattice, see lattice_shade.py)
+            - tilt_resolution: resolution (in degrees) to which the E/W tilt of tracking systems is rounded so the tilt dependent geometry can be cached, None: exact tilt (no caching for tracking systems)
+            
+            Returns:
+            - intersection_percent: shaded area of the field in percent of the total field area
+        '''
+
+        if engine != "shapely" and engine != "analytic":
+            print("Unknown shade engine: ", engine, " (available engines: shapely, analytic)")
+            exit()
+
+        x_corners, y_corners = self.project_shadow_corners(angle_in_plane_EW, angle_in_plane_NS, self._panel_geometry(PV_angle_EW, PV_angle_NS, tilt_resolution))
+
+        field_area = (field_width + 20) * (field_length + 20)
+
+        if engine == "analytic":
+            # exact union area of all shadows within the buffered field
+            intersection_area = lattice_shade.union_area(x_corners, y_corners, self.distance_EW, self.distance_NS, self.number_of_panels_EW, self.number_of_panels_NS, -10, -10 + (field_width + 20), -10, -10 + (field_length + 20))
+
+            # update for percentage shaded grid (shadows are rasterized directly into the grid, no shade polygon is built)
+            if grid != None:
+                grid.update_from_lattice(x_corners, y_corners, self.distance_EW, self.distance_NS, self.number_of_panels_EW, self.number_of_panels_NS)
+
+        else:
+            poly_field_complete, poly_shade = self.calculate_shade_polygon(x_corners, y_corners, field_width, field_length)
+
+            # update for percentage shaded grid
+            if grid != None:
+                grid.update(poly_shade)
+
+            # calculating the shaded area
+            intersection_area = poly_shade.area
+            field_area = poly_field_complete.area
+
+        # calculating the shaded area in percent
+        intersection_percent = (intersection_area / field_area) * 100 # in %
+
+        return intersection_percent
+
+    def update_shade_grid(self, angle_in_plane_EW, angle_in_plane_NS, PV_angle_EW, PV_angle_NS, field_width, field_length, grid: shade_grid.shade_grid, engine: str = "shapely", tilt_resolution: float = None):
+        ''' Updates the percentage shaded grid with the shade of the PV panels (same as calculate_ground_shade, without calculating the shaded area, e.g. if the shaded area is taken from a response surface).
+
+            Parameters: see calculate_ground_shade
+
+            Returns: -
+        '''
+
+        if engine != "shapely" and engine != "analytic":
+            print("Unknown shade engine: ", engine, " (available engines: shapely, analytic)")
+            exit()
+
+        x_corners, y_corners = self.project_shadow_corners(angle_in_plane_EW, angle_in_plane_NS, self._panel_geometry(PV_angle_EW, PV_angle_NS, tilt_resolution))
+
+        if engine == "analytic":
+            grid.update_from_lattice(x_corners, y_corners, self.distance_EW, self.distance_NS, self.number_of_panels_EW, self.number_of_panels_NS)
+        else:
+            grid.update(self.calculate_shade_polygon(x_corners, y_corners, field_width, field_length)[1])
+
+    def is_mirror_symmetric(self, PV_angle_EW, PV_angle_NS, field_width, x_coords):
+        ''' Checks if the shade of the system is mirror symmetric about the N/S axis through the middle of the field, i.e. the shade for a sun direction mirrored at the N/S plane is the mirrored shade (see noon_symmetry.py). This requires panel columns centred in the field, grid columns which are symmetric about the middle of the field and panels which are mirror symmetric (fixed systems) or turned to the mirrored tilt (tracking systems).
+
+            Parameters:
+            - PV_angle_EW, PV_angle_NS: tilts in degrees (the E/W tilt of tracking systems is calculated for every timestep)
+            - field_width: width of the field without buffer
+            - x_coords: coordinates of the grid columns (see shade_grid)
+
+            Returns: True/False
+        '''
+
+        if self.system_type not in ("standard", "vertical", "overhead", "tracking"):
+            return False
+
+        # tracking systems are turned to the mirrored tilt for the mirrored sun direction (tilt_schedule), all other systems keep their tilt
+        tilts = [(PV_angle_EW, - PV_angle_EW) for PV_angle_EW in (10, 35, 60)] if self.system_type == "tracking" else [(PV_angle_EW, PV_angle_EW)]
+
+        for PV_angle_EW, mirrored_PV_angle_EW in tilts:
+            PV_heights, x_PV, y_PV = self.calculate_panel_geometry(math.radians(PV_angle_EW), math.radians(PV_angle_NS))
+            mirrored_PV_heights, mirrored_x_PV, mirrored_y_PV = self.calculate_panel_geometry(math.radians(mirrored_PV_angle_EW), math.radians(PV_angle_NS))
+
+            # corners of the panel mirrored at its centre line (the W and E corners have the same distance to it for every tilt)
+            centre = (x_PV[0] + x_PV[1]) / 2
+            corners = sorted((round(height, 9), round(2*centre - x, 9), round(y, 9)) for height, x, y in zip(PV_heights, x_PV, y_PV))
+            mirrored_corners = sorted((round(height, 9), round(x, 9), round(y, 9)) for height, x, y in zip(mirrored_PV_heights, mirrored_x_PV, mirrored_y_PV))
+
+            if corners != mirrored_corners:
+                return False
+
+        # panel columns and grid columns are centred in the field
+        x_coords = np.asarray(x_coords, dtype=float)
+
+        return math.isclose(centre + (self.number_of_panels_EW - 1) * self.distance_EW / 2, field_width / 2, abs_tol=1e-9) and np.allclose(x_coords + x_coords[::-1], field_width, rtol=0, atol=1e-9)
+
+    def _panel_geometry(self, PV_angle_EW, PV_angle_NS, tilt_resolution):
+        '''Tilt dependent panel geometry for tilts in degrees: cached (only the projection depends on the sun position), tilts of tracking systems change every timestep and are only cached if they are rounded to tilt_resolution.'''
+
+        if self.system_type != "tracking" and self.system_type != "backtracking":
+            return cached_panel_geometry(self, PV_angle_EW, PV_angle_NS)
+
+        if tilt_resolution != None:
+            return cached_panel_geometry(self, round(PV_angle_EW / tilt_resolution) * tilt_resolution, PV_angle_NS)
+
+        return self.calculate_panel_geometry((PV_angle_EW / 180)*math.pi, (PV_angle_NS / 180)*math.pi)
+
+    def calculate_self_shade_array(self, angle_in_plane_EW, angle_in_plane_NS, azimuth_rad, PV_angle_EW, PV_angle_NS):
+        '''Calculates the total shaded area cast by PV panels onto other PV panels for many timesteps at once (same calculation as system.calculate_self_shade, with the case distinctions as masks over arrays).
+
+            Parameters:
+            - angle_in_plane_EW: angles between ground and incoming sun beams, projected on the east/west plane (array)
+            - angle_in_plane_NS: angles between ground and incoming sun beams, projected on the north/south plane (array)
+            - azimuth_rad: azimuths in radians (array)
+            - PV_angle_EW: tilt angles of the PV panels in the east/west plane in degrees (array with one tilt per timestep for tracking systems)
+            - PV_angle_NS: tilt angles of the PV panels in the north/south plane in degrees
+
+            Returns:
+            - shade_total_area: total shaded area on the panels for every timestep (array)
+        '''
+
+        angle_in_plane_EW = np.asarray(angle_in_plane_EW, dtype=float)
+        angle_in_plane_NS = np.asarray(angle_in_plane_NS, dtype=float)
+        azimuth_rad = np.asarray(azimuth_rad, dtype=float)
+        shape = np.broadcast_shapes(angle_in_plane_EW.shape, angle_in_plane_NS.shape, azimuth_rad.shape, np.shape(PV_angle_EW), np.shape(PV_angle_NS))
+
+        PV_angle_EW = np.asarray(PV_angle_EW, dtype=float)
+        PV_angle_NS = np.asarray(PV_angle_NS, dtype=float)
+        PV_angle_EW_rad = (PV_angle_EW / 180)*math.pi
+        PV_angle_NS_rad = (PV_angle_NS / 180)*math.pi
+
+        total_panel_area = self.number_of_panels_EW * self.number_of_panels_NS * self.PV_width * self.PV_length
+
+        # putting sun location in the N/E quadrant to simplify/unify later calculations (for the shade offset)
+        angle_off_center = np.select([azimuth_rad <= math.pi/2, azimuth_rad <= math.pi, azimuth_rad <= (3/2)*math.pi], [azimuth_rad, math.pi - azimuth_rad, azimuth_rad - math.pi], 2*math.pi - azimuth_rad)
+
+        with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+
+            # for tracking/vertical systems
+            if self.system_type == "tracking" or self.system_type == "vertical":
+
+                # angle above ground - making sun direction (from west or east) irrelevant
+                angle_in_plane_EW_mod = np.where(angle_in_plane_EW <= math.pi/2, angle_in_plane_EW, math.pi - angle_in_plane_EW)
+
+                # width of shade on neighbouring panel
+                if self.system_type == "tracking":
+                    shade_width = self.PV_width - np.sin(angle_in_plane_EW_mod) * self.distance_EW
+                else:
+                    shade_width = self.PV_width - np.tan(angle_in_plane_EW_mod) * self.distance_EW
+
+                # shade offset in N/S direction (distance between the top edge of the eluminated panel and the top edge of the panel behind it uses the tilt as in calculate_self_shade)
+                dist_panel_shade_edge = self.distance_EW - (self.PV_width - shade_width) * np.cos(PV_angle_EW)
+                shade_offset = np.tan(math.pi/2 - angle_off_center) * dist_panel_shade_edge
+
+                # length (N/S direction) of shade on neighbouring collumn of panels, number of fully shaded panels and shade on partially shaded panels
+                shaded_panel_length = (self.number_of_panels_NS - 1) * self.distance_NS + self.PV_length - shade_offset
+                shade_total_area = self._self_shade_on_panel_rows(shade_width, shade_offset, shaded_panel_length, self.PV_length, self.distance_NS, self.number_of_panels_NS, self.number_of_panels_EW)
+
+                # no self-shading if shade width or shade length are <= 0
+                shade_total_area = np.where((shade_width > 0) & (shaded_panel_length > 0), shade_total_area, 0)
+
+            elif self.system_type == "standard" or self.system_type == "overhead":
+
+                # standard systems are tilted in the N/S plane, overhead systems in the E/W plane
+                if self.system_type == "standard":
+                    angle_in_plane, PV_angle, PV_angle_rad = angle_in_plane_NS, PV_angle_NS, PV_angle_NS_rad
+                    PV_dimension, distance = self.PV_length, self.distance_NS
+                    PV_dimension_across, distance_across, number_of_panels, number_of_panels_across = self.PV_width, self.distance_EW, self.number_of_panels_NS, self.number_of_panels_EW
+                else:
+                    angle_in_plane, PV_angle, PV_angle_rad = angle_in_plane_EW, PV_angle_EW, PV_angle_EW_rad
+                    PV_dimension, distance = self.PV_width, self.distance_EW
+                    PV_dimension_across, distance_across, number_of_panels, number_of_panels_across = self.PV_length, self.distance_NS, self.number_of_panels_EW, self.number_of_panels_NS
+
+                # angle between horizontal line and sun beam, angle between sun beam and (shaded) panel
+                alpha = angle_in_plane
+                beta = math.pi - (angle_in_plane + np.abs(PV_angle_rad))
+
+                # unshaded part of the second panel and shade length
+                a = (distance / np.sin(beta)) * np.sin(alpha)
+                shade_length = PV_dimension - a
+
+                # shade offset (distance between the top edge of the eluminated panel and the top edge of the panel behind it uses the tilt as in calculate_self_shade)
+                dist_panel_shade_edge = distance - (PV_dimension - shade_length) * np.cos(PV_angle)
+                if self.system_type == "standard":
+                    shade_offset = np.tan(angle_off_center) * dist_panel_shade_edge
+                else:
+                    shade_offset = np.tan(math.pi/2 - angle_off_center) * dist_panel_shade_edge
+
+                # width of shade on neighbouring rows of panels, number of fully shaded panels and shade on partially shaded panels
+                shaded_panel_width = (number_of_panels_across - 1) * distance_across + PV_dimension_across - shade_offset
+                shade_total_area = self._self_shade_on_panel_rows(shade_length, shade_offset, shaded_panel_width, PV_dimension_across, distance_across, number_of_panels_across, number_of_panels)
+
+                # no self-shading if shade length is <= 0
+                shade_total_area = np.where(shade_length > 0, shade_total_area, 0)
+
+                # 0% self shading for sun directy overhead and larger angles, 100% self shading if the sun hits the back of the panels
+                sun_behind_panels = angle_in_plane > math.pi - np.radians(PV_angle)
+                shade_total_area = np.where((angle_in_plane >= math.pi/2) & ~sun_behind_panels, 0, shade_total_area)
+                shade_total_area = np.where(sun_behind_panels, total_panel_area, shade_total_area)
+
+            else:
+                shade_total_area = np.zeros(shape)
+
+        return np.broadcast_to(shade_total_area, shape).astype(float)
+
+    def _self_shade_on_panel_rows(self, shade_width, shade_offset, shaded_length, PV_dimension, distance, number_of_panels_along, number_of_rows):
+        '''Shaded area on the neighbouring panel rows for calculate_self_shade_array: shade of the given width on all panels covered by the shaded length (number_of_panels_along panels in the direction of the shaded length, number_of_rows rows of panels, all but the first are shaded).'''
+
+        # calculating number of fully shaded panels so spaces between panels can be excluded (here "fully shaded" means not affected by the shade offset)
+        nmb_fully_shaded_panels = np.select([shaded_length < PV_dimension, shaded_length <= distance], [0, 1 * (number_of_rows - 1)], (np.floor((shaded_length - PV_dimension) / distance) + 1) * (number_of_rows - 1))
+
+        # shade on fully shaded panels
+        shade_area_regular = shade_width * PV_dimension * nmb_fully_shaded_panels
+
+        # checking if the shade offset "ends" in an area between panels or on a panel, adjusting shade accordingly
+        shade_offset_end = np.mod(shade_offset, distance)
+        edge_panel_shade = np.where((shade_offset_end > PV_dimension) | (nmb_fully_shaded_panels == number_of_panels_along * (number_of_rows - 1)), 0, shade_width * (PV_dimension - shade_offset_end) * (number_of_rows - 1))
+
+        # total shaded area
+        return np.maximum(shade_area_regular + edge_panel_shade, 0)
+
 class system:
     def __init__(self, system_type:str, PV_base_height:float, PV_width:float, PV_length:float, distance_EW:float, distance_NS:float, number_of_panels_EW:int, number_of_panels_NS:int, PV_angle_NS:float = 0, PV_angle_EW:float = 0):
         ''' Instance Variables:
@@ -55,6 +526,12 @@ class system:
             Returns: self.system_type'''
             
         return self.system_type
+
+    @property
+    def geometry(self):
+        '''Immutable geometry of the system (without the panel tilts, see system_geometry), built from the current instance variables.'''
+
+        return system_geometry(self.system_type, self.PV_base_height, self.PV_width, self.PV_length, self.distance_EW, self.distance_NS, self.number_of_panels_EW, self.number_of_panels_NS)
         
     def tracking_repositioning(self, year, month, day, hour, minute, long, lat):
         '''Readjusts PV panel (tilt angle in E/W plane) depending on the position of the sun (which is calculated via date/time and location).
@@ -64,8 +541,16 @@ class system:
             Returns: - '''
             
         angle_in_plane_EW, angle_in_plane_NS = solarposition.calculate_solarposition(year, month, day, hour, minute, long, lat)
-        angle_in_plane_EW_degrees = (angle_in_plane_EW / math.pi) * 180
-        self.PV_angle_EW = 90 - angle_in_plane_EW_degrees
+        self.tracking_repositioning_from_angle(angle_in_plane_EW)
+
+    def tracking_repositioning_from_angle(self, angle_in_plane_EW):
+        '''Readjusts PV panel (tilt angle in E/W plane) directly from the angle of incoming sun beams in the E/W plane (e.g. taken from a precomputed solar table).
+        
+            Parameters: angle_in_plane_EW
+        
+            Returns: - '''
+
+        self.PV_angle_EW = float(self.tracking_tilt_schedule(angle_in_plane_EW))
 
     def backtracking_repositioning(self, year, month, day, hour, minute, long, lat):
         '''Readjusts PV panel (tilt angle in E/W plane) depending on the position of the sun (which is calculated via date/time and location).
@@ -75,28 +560,32 @@ class system:
             Returns: - '''
             
         angle_in_plane_EW, angle_in_plane_NS = solarposition.calculate_solarposition(year, month, day, hour, minute, long, lat)
+        self.backtracking_repositioning_from_angle(angle_in_plane_EW)
 
-        # regular tracking tilt
-        angle_in_plane_EW_degrees = (angle_in_plane_EW / math.pi) * 180
-        self.PV_angle_EW = 90 - angle_in_plane_EW_degrees
-
-        # calculate shade width in self-shading to check if self-shading occurs
-        angle_in_plane_EW_mod = angle_in_plane_EW if angle_in_plane_EW <= (math.pi/2) else math.pi - angle_in_plane_EW # angle above ground - making sun direction (from west or east) irrelevant
-        shade_width = self.PV_width - math.sin(angle_in_plane_EW_mod) * self.distance_EW
-
-        # adjust panel tilt in E/W plane so no self-shading occurs
-        if shade_width > 0 and angle_in_plane_EW > 0:
-            if angle_in_plane_EW < 90:
-                alpha = math.radians(angle_in_plane_EW_degrees)
-                beta = math.pi - math.asin((self.distance_EW * math.sin(alpha)) / self.PV_width)
-                gamma = math.pi - alpha - beta
-                self.PV_angle_EW = math.degrees(gamma)
-            else:
-                alpha = math.radians(180 - angle_in_plane_EW_degrees)
-                beta = math.pi - math.asin((self.distance_EW * math.sin(alpha)) / self.PV_width )
-                gamma = - (math.pi - alpha - beta)
-                self.PV_angle_EW = - math.degrees(gamma)
+    def backtracking_repositioning_from_angle(self, angle_in_plane_EW):
+        '''Readjusts PV panel (tilt angle in E/W plane) so no self-shading occurs, directly from the angle of incoming sun beams in the E/W plane (e.g. taken from a precomputed solar table).
+        
+            Parameters: angle_in_plane_EW
         
+            Returns: - '''
+
+        self.PV_angle_EW = float(self.backtracking_tilt_schedule(angle_in_plane_EW))
+
+    def tracking_tilt_schedule(self, angle_in_plane_EW):
+        '''See system_geometry.tracking_tilt_schedule.'''
+
+        return self.geometry.tracking_tilt_schedule(angle_in_plane_EW)
+
+    def backtracking_tilt_schedule(self, angle_in_plane_EW):
+        '''See system_geometry.backtracking_tilt_schedule.'''
+
+        return self.geometry.backtracking_tilt_schedule(angle_in_plane_EW)
+
+    def tilt_schedule(self, angle_in_plane_EW):
+        '''See system_geometry.tilt_schedule (systems which are not tracking keep self.PV_angle_EW).'''
+
+        return self.geometry.tilt_schedule(angle_in_plane_EW, self.PV_angle_EW)
+
     def calculate_self_shade(self, angle_in_plane_EW, angle_in_plane_NS, PV_angle_EW_rad, PV_angle_NS_rad, azimuth_rad, elevation_rad):
         '''Calculates the total shaded area cast by PV panels onto other PV panels. (Currently only for tracking, optimal and vertical systems, since overhead systems are horizonal (hence no self-shading) at the moment.)
         
@@ -339,8 +828,28 @@ class system:
         return shade_total_area
    
     
-    def calculate_shade(self, angle_in_plane_EW, angle_in_plane_NS, field_width, field_length, azimuth_rad, grid: shade_grid.shade_grid = None):
-        ''' Calculates the position and area of the shade created by PV panels.
+    def calculate_self_shade_array(self, angle_in_plane_EW, angle_in_plane_NS, azimuth_rad, PV_angle_EW=None, PV_angle_NS=None):
+        '''See system_geometry.calculate_self_shade_array (tilts default to self.PV_angle_EW and self.PV_angle_NS).'''
+
+        return self.geometry.calculate_self_shade_array(angle_in_plane_EW, angle_in_plane_NS, azimuth_rad, self.PV_angle_EW if PV_angle_EW is None else PV_angle_EW, self.PV_angle_NS if PV_angle_NS is None else PV_angle_NS)
+
+    def calculate_shadow_corners(self, angle_in_plane_EW, angle_in_plane_NS, PV_angle_EW_rad, PV_angle_NS_rad):
+        '''See system_geometry.calculate_shadow_corners.'''
+
+        return self.geometry.calculate_shadow_corners(angle_in_plane_EW, angle_in_plane_NS, PV_angle_EW_rad, PV_angle_NS_rad)
+
+    def calculate_shade_polygon(self, x_corners, y_corners, field_width, field_length):
+        '''See system_geometry.calculate_shade_polygon.'''
+
+        return self.geometry.calculate_shade_polygon(x_corners, y_corners, field_width, field_length)
+
+    def calculate_ground_shade(self, angle_in_plane_EW, angle_in_plane_NS, field_width, field_length, grid: shade_grid.shade_grid = None, engine: str = "shapely"):
+        '''See system_geometry.calculate_ground_shade (with the current tilts self.PV_angle_EW and self.PV_angle_NS).'''
+
+        return self.geometry.calculate_ground_shade(angle_in_plane_EW, angle_in_plane_NS, self.PV_angle_EW, self.PV_angle_NS, field_width, field_length, grid, engine)
+
+    def calculate_shade(self, angle_in_plane_EW, angle_in_plane_NS, field_width, field_length, azimuth_rad, elevation_rad, grid: shade_grid.shade_grid = None, engine: str = "shapely", memo=None):
+        ''' Calculates the position and area of the shade created by PV panels on the field and on other PV panels.
         
             Parameters: 
             - angle_in_plane_EW: angle between ground and an incoming sun beam, projected on the east/west plane
@@ -348,68 +857,23 @@ class system:
             - field_width: witdth of the field without buffer
             - field_length: length of the field without buffer
             - azimuth_rad: azimuth in radians
+            - elevation_rad: elevation in radians
             - grid: grid for percentage shaded calculations
+            - engine: "shapely" (reference, union of all shadow polygons clipped to the field) or "analytic" (exact union area of the shadow lattice, see lattice_shade.py)
+            - memo: shade_memo.shade_memo, results are calculated for the rounded angles and tilts and taken from the cache if possible, None: exact calculation
             
             Returns:
             - intersection_percent: shaded area of the field in percent of the total field area
             - self_shade_percentage_of_total_panel_area: shaded area on the panels in percent of the total panel area
         '''
-        
-        PV_angle_EW_rad = (self.PV_angle_EW / 180)*math.pi       # angle of the PV Panel (in east/west direction) (in rad)
-        PV_angle_NS_rad = (self.PV_angle_NS / 180)*math.pi       # angle of the PV Panel (in north/south direction) (in rad)
-
-        # edge height differences
-        height_diff_N = math.sin(PV_angle_NS_rad) * self.PV_length / 2
-        height_diff_S = - math.sin(PV_angle_NS_rad) * self.PV_length / 2
-        height_diff_E = - math.sin(PV_angle_EW_rad) * self.PV_width / 2
-        height_diff_W = math.sin(PV_angle_EW_rad) * self.PV_width / 2
 
-        # corner height differences
-        PV_height_NE = self.PV_base_height + height_diff_N + height_diff_E
-        PV_height_NW = self.PV_base_height + height_diff_N + height_diff_W
-        PV_height_SE = self.PV_base_height + height_diff_S + height_diff_E
-        PV_height_SW = self.PV_base_height + height_diff_S + height_diff_W
+        if memo != None:
+            return memo.calculate_shade(self.geometry, angle_in_plane_EW, angle_in_plane_NS, self.PV_angle_EW, self.PV_angle_NS, field_width, field_length, grid, engine)
 
-        # shadow position
-
-        # x coordinates of shaded area (for one panel)
-        if (self.system_type == "standard"):
-            x_PV_shadow_NE = self.PV_width / 2 + abs(math.cos(PV_angle_EW_rad)) * (self.PV_width / 2) - PV_height_NE / math.tan(angle_in_plane_EW)
-            x_PV_shadow_NW = self.PV_width / 2 - abs(math.cos(PV_angle_EW_rad)) * (self.PV_width / 2) - PV_height_NW / math.tan(angle_in_plane_EW)
-            x_PV_shadow_SE = self.PV_width / 2 + abs(math.cos(PV_angle_EW_rad)) * (self.PV_width / 2) - PV_height_SE / math.tan(angle_in_plane_EW)
-            x_PV_shadow_SW = self.PV_width / 2 - abs(math.cos(PV_angle_EW_rad)) * (self.PV_width / 2) - PV_height_SW / math.tan(angle_in_plane_EW)
+        intersection_percent = self.calculate_ground_shade(angle_in_plane_EW, angle_in_plane_NS, field_width, field_length, grid, engine)
 
-        else:
-            x_PV_shadow_NE = abs(math.cos(PV_angle_EW_rad)) * (self.PV_width / 2) - PV_height_NE / math.tan(angle_in_plane_EW)
-            x_PV_shadow_NW = - abs(math.cos(PV_angle_EW_rad)) * (self.PV_width / 2) - PV_height_NW / math.tan(angle_in_plane_EW)
-            x_PV_shadow_SE = abs(math.cos(PV_angle_EW_rad)) * (self.PV_width / 2) - PV_height_SE / math.tan(angle_in_plane_EW)
-            x_PV_shadow_SW = - abs(math.cos(PV_angle_EW_rad)) * (self.PV_width / 2) - PV_height_SW / math.tan(angle_in_plane_EW)
-
-        # y coordinates of shaded area (for one panel)
-        y_PV_shadow_NE = PV_height_NE / math.tan(angle_in_plane_NS) + abs(math.cos(PV_angle_NS_rad)) * self.PV_length
-        y_PV_shadow_NW = PV_height_NW / math.tan(angle_in_plane_NS) + abs(math.cos(PV_angle_NS_rad)) * self.PV_length
-        y_PV_shadow_SE = PV_height_SE / math.tan(angle_in_plane_NS)
-        y_PV_shadow_SW = PV_height_SW / math.tan(angle_in_plane_NS)
-
-        # entire field - individual shadows will be cut out of poly_field, poly_field_complete is later used fo calculate the shaded area
-        poly_field = make_valid(shapely_Polygon([(-10, -10), (-10 + (field_width + 20), -10), (-10 + (field_width + 20), -10 + (field_length + 20)), (-10, -10 + (field_length + 20))]))
-        poly_field_complete = make_valid(shapely_Polygon([(-10, -10), (-10 + (field_width + 20), -10), (-10 + (field_width + 20), -10 + (field_length + 20)), (-10, -10 + (field_length + 20))]))
-
-        # calculating individual shaddows and cutting them out of field polygon
-        for i in range(0, self.number_of_panels_NS):
-            for j in range(0, self.number_of_panels_EW):
-                # calculating individual shaddows
-                poly_new = shapely_Polygon([(x_PV_shadow_SW + j * self.distance_EW, y_PV_shadow_SW + i * self.distance_NS), (x_PV_shadow_SE + j * self.distance_EW, y_PV_shadow_SE + i * self.distance_NS), (x_PV_shadow_NE + j * self.distance_EW, y_PV_shadow_NE + i * self.distance_NS), (x_PV_shadow_NW + j * self.distance_EW, y_PV_shadow_NW + i * self.distance_NS)])
-                # cutting them out of field polygon
-                poly_field = make_valid(poly_field.difference(poly_new))
-
-        # update for percentage shaded grid
-        if grid != None:
-            grid.update(make_valid(poly_field_complete.difference(poly_field)))
-
-        # calculating the shaded area (total and in percent)
-        intersection_area = poly_field_complete.area - poly_field.area # inverting from unshaded area to shaded area
-        intersection_percent = (intersection_area / poly_field_complete.area) * 100 # in %
+        PV_angle_EW_rad = (self.PV_angle_EW / 180)*math.pi       # angle of the PV Panel (in east/west direction) (in rad)
+        PV_angle_NS_rad = (self.PV_angle_NS / 180)*math.pi       # angle of the PV Panel (in north/south direction) (in rad)
 
         self_shade_total = self.calculate_self_shade(angle_in_plane_EW, angle_in_plane_NS, PV_angle_EW_rad, PV_angle_NS_rad, azimuth_rad, elevation_rad)
         self_shade_percentage_of_total_panel_area = (self_shade_total/ (self.number_of_panels_EW * self.number_of_panels_NS * self.PV_width * self.PV_length))*100 # in %
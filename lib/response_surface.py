@@ -0,0 +1,153 @@
+import solarposition
+
+import functools
+import hashlib
+import math
+import os
+import zipfile
+import numpy as np
+
+# For a fixed system (geometry, tilts and field) the ground shade and the self-shade only depend on the sun direction, i.e. on angle_in_plane_EW and angle_in_plane_NS (both between 0 and pi, the azimuth quadrant follows from them).
+# Both percentages are calculated once on a regular grid over this angle space (response surface), timesteps are evaluated by bilinear interpolation. Tables are stored on disk, keyed by the system hash.
+# Stored tables do not change when the shading calculation changes, table_format_version is part of the file name and stored in every table. It has to be increased with every change of the shading or self-shading calculation (or of the table layout), tables of other versions are calculated again.
+
+table_format_version = 1
+
+def table_filename(directory: str, geometry, PV_angle_EW, PV_angle_NS, field_width, field_length, resolution: float, engine: str = "shapely", tilt_resolution: float = None):
+    '''File name of the response surface of a system: system hash (see system_geometry.stable_hash) and hash of the remaining settings and the table format version.
+
+        Parameters: directory, geometry (pv_system.system_geometry), PV_angle_EW, PV_angle_NS, field_width, field_length, resolution, engine, tilt_resolution (see calculate_response_surface)
+
+        Returns: filename'''
+
+    settings = repr(tuple(float(value) if value != None else None for value in (PV_angle_EW, PV_angle_NS, field_width, field_length, resolution, tilt_resolution)) + (engine, table_format_version))
+
+    return os.path.join(directory, "response_surface_" + geometry.stable_hash() + "_" + hashlib.sha256(settings.encode()).hexdigest()[:16] + ".npz")
+
+def calculate_response_surface(geometry, PV_angle_EW, PV_angle_NS, field_width, field_length, resolution: float = 1, engine: str = "shapely", tilt_resolution: float = None):
+    '''Calculates the ground shade and the self-shade on a regular grid of angles in the E/W and N/S plane (nodes in the middle of cells of resolution x resolution degrees, the angles 0 and pi are not included).
+
+        Parameters:
+        - geometry: pv_system.system_geometry
+        - PV_angle_EW, PV_angle_NS: tilts in degrees (for tracking systems the E/W tilt is calculated for every node)
+        - field_width, field_length: field dimensions without buffer
+        - resolution: distance of the nodes in degrees
+        - engine, tilt_resolution: see system_geometry.calculate_ground_shade
+
+        Returns:
+        - nodes: angles of the nodes (same for both planes)
+        - ground_shade: shaded area of the field in % (one row per angle in the E/W plane, one column per angle in the N/S plane)
+        - self_shade: self-shaded panel area in % of the total panel area (same shape as ground_shade)
+    '''
+
+    if resolution <= 0:
+        print("Resolution of the response surface must be larger than 0.")
+        exit()
+
+    number_of_nodes = max(2, round(180 / resolution))
+    nodes = (np.arange(number_of_nodes) + 0.5) * math.pi / number_of_nodes
+
+    angle_in_plane_EW, angle_in_plane_NS = np.meshgrid(nodes, nodes, indexing='ij')
+    azimuth_rad, elevation_rad = solarposition.calculate_sun_direction(angle_in_plane_EW, angle_in_plane_NS)
+    PV_angles_EW = geometry.tilt_schedule(angle_in_plane_EW, PV_angle_EW)
+
+    ground_shade = np.array([geometry.calculate_ground_shade(angle_EW, angle_NS, tilt_EW, PV_angle_NS, field_width, field_length, None, engine, tilt_resolution) for angle_EW, angle_NS, tilt_EW in zip(angle_in_plane_EW.ravel(), angle_in_plane_NS.ravel(), PV_angles_EW.ravel())]).reshape(angle_in_plane_EW.shape)
+
+    total_panel_area = geometry.number_of_panels_EW * geometry.number_of_panels_NS * geometry.PV_width * geometry.PV_length
+    self_shade = (geometry.calculate_self_shade_array(angle_in_plane_EW, angle_in_plane_NS, azimuth_rad, PV_angles_EW, PV_angle_NS) / total_panel_area) * 100
+
+    return nodes, ground_shade, self_shade
+
+def is_valid(filename: str):
+    '''Checks if a stored response surface exists and was calculated with the current table format version (see table_format_version).
+
+        Parameters: filename (see table_filename)
+
+        Returns: True/False'''
+
+    if not os.path.exists(filename):
+        return False
+
+    try:
+        with np.load(filename) as table:
+            return 'version' in table.files and int(table['version']) == table_format_version and all(name in table.files for name in ('nodes', 'ground_shade', 'self_shade'))
+    except (OSError, ValueError, zipfile.BadZipFile):
+        # damaged tables are calculated again
+        return False
+
+@functools.lru_cache(maxsize=16)
+def load_response_surface(directory: str, geometry, PV_angle_EW, PV_angle_NS, field_width, field_length, resolution: float = 1, engine: str = "shapely", tilt_resolution: float = None):
+    '''Loads the response surface of a system from the directory, it is calculated and saved if it does not exist yet or is not valid (see is_valid, tables are also cached in memory, read-only arrays).
+
+        Parameters: directory, see calculate_response_surface for the remaining parameters
+
+        Returns: nodes, ground_shade, self_shade (see calculate_response_surface)'''
+
+    filename = table_filename(directory, geometry, PV_angle_EW, PV_angle_NS, field_width, field_length, resolution, engine, tilt_resolution)
+
+    if is_valid(filename):
+        with np.load(filename) as table:
+            nodes, ground_shade, self_shade = table['nodes'], table['ground_shade'], table['self_shade']
+    else:
+        nodes, ground_shade, self_shade = calculate_response_surface(geometry, PV_angle_EW, PV_angle_NS, field_width, field_length, resolution, engine, tilt_resolution)
+
+        # table is written to a temporary file first, so parallel processes never read an incomplete table
+        os.makedirs(directory, exist_ok=True)
+        temporary_filename = filename[:-len(".npz")] + "." + str(os.getpid()) + ".tmp.npz"
+        np.savez(temporary_filename, nodes=nodes, ground_shade=ground_shade, self_shade=self_shade, version=table_format_version)
+        os.replace(temporary_filename, filename)
+
+    for array in (nodes, ground_shade, self_shade):
+        array.setflags(write=False)
+
+    return nodes, ground_shade, self_shade
+
+def interpolate(nodes, table, angle_in_plane_EW, angle_in_plane_NS):
+    '''Bilinear interpolation of a response surface for many sun directions at once (angles outside of the nodes are clamped to the outermost nodes).
+
+        Parameters: nodes, table (see calculate_response_surface), angle_in_plane_EW, angle_in_plane_NS (arrays)
+
+        Returns: interpolated values (array)'''
+
+    step = nodes[1] - nodes[0]
+
+    # position of the angles on the grid of nodes (index of the lower node and weight of the upper node)
+    position_EW = np.clip((np.asarray(angle_in_plane_EW, dtype=float) - nodes[0]) / step, 0, len(nodes) - 1)
+    position_NS = np.clip((np.asarray(angle_in_plane_NS, dtype=float) - nodes[0]) / step, 0, len(nodes) - 1)
+    index_EW = np.minimum(np.floor(position_EW).astype(int), len(nodes) - 2)
+    index_NS = np.minimum(np.floor(position_NS).astype(int), len(nodes) - 2)
+    weight_EW = position_EW - index_EW
+    weight_NS = position_NS - index_NS
+
+    return ((1 - weight_EW) * (1 - weight_NS) * table[index_EW, index_NS] + weight_EW * (1 - weight_NS) * table[index_EW + 1, index_NS]
+            + (1 - weight_EW) * weight_NS * table[index_EW, index_NS + 1] + weight_EW * weight_NS * table[index_EW + 1, index_NS + 1])
+
+def estimate_error(geometry, solar_table, PV_angles_EW, PV_angle_NS, timesteps, ground_shade, self_shade, field_width, field_length, engine: str = "shapely", tilt_resolution: float = None):
+    '''Estimates the error of the interpolated percentages by comparing them to the exact calculation for a sample of timesteps.
+
+        Parameters:
+        - geometry: pv_system.system_geometry
+        - solar_table: solar position for every timestep (see solarposition.calculate_solar_table)
+        - PV_angles_EW: E/W tilt for every timestep, PV_angle_NS: N/S tilt
+        - timesteps: sample of daylight timesteps which are calculated exactly
+        - ground_shade, self_shade: interpolated percentages for every timestep
+        - field_width, field_length, engine, tilt_resolution: see system_geometry.calculate_ground_shade
+
+        Returns:
+        - error: dictionary with the number of validated timesteps and the maximum and mean absolute error (in %-points) of the ground shade and of the self-shade
+    '''
+
+    timesteps = np.asarray(timesteps, dtype=int)
+
+    if len(timesteps) == 0:
+        return {'validated_timesteps': 0, 'max_ground_shade_error': 0.0, 'mean_ground_shade_error': 0.0, 'max_self_shade_error': 0.0, 'mean_self_shade_error': 0.0}
+
+    exact_ground_shade = np.array([geometry.calculate_ground_shade(solar_table['angle_in_plane_EW'][timestep], solar_table['angle_in_plane_NS'][timestep], PV_angles_EW[timestep], PV_angle_NS, field_width, field_length, None, engine, tilt_resolution) for timestep in timesteps])
+
+    total_panel_area = geometry.number_of_panels_EW * geometry.number_of_panels_NS * geometry.PV_width * geometry.PV_length
+    exact_self_shade = (geometry.calculate_self_shade_array(solar_table['angle_in_plane_EW'][timesteps], solar_table['angle_in_plane_NS'][timesteps], solar_table['azimuth_rad'][timesteps], PV_angles_EW[timesteps], PV_angle_NS) / total_panel_area) * 100
+
+    ground_shade_errors = np.abs(exact_ground_shade - np.asarray(ground_shade)[timesteps])
+    self_shade_errors = np.abs(exact_self_shade - np.asarray(self_shade)[timesteps])
+
+    return {'validated_timesteps': len(timesteps), 'max_ground_shade_error': float(np.max(ground_shade_errors)), 'mean_ground_shade_error': float(np.mean(ground_shade_errors)), 'max_self_shade_error': float(np.max(self_shade_errors)), 'mean_self_shade_error': float(np.mean(self_shade_errors))}
@@ -0,0 +1,212 @@
+import abc
+import csv
+import os
+import numpy as np
+
+# optional dependency for parquet/feather output, results are written as compressed npz files without it
+try:
+    import pyarrow
+    import pyarrow.feather
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+# small integer types for the latitude and date columns, all other columns (longitudes, which can be fractional with --longs, percentages and angles) are stored as float32
+integer_column_dtypes = {'lat': np.int8, 'month': np.int8, 'day': np.int8, 'hour': np.int8, 'minute': np.int8}
+
+class result_sink(abc.ABC):
+    def __init__(self, columns: list, flush_size: int = 100000):
+        '''Collects result lines in columnar buffers (one list per column) and writes them in large blocks. Subclasses define how a block is written.
+
+            Instance variables:
+            - columns: column names of the result table
+            - flush_size: number of buffered lines after which the buffer is written
+            - buffer: one list of values per column
+            - number_of_buffered_lines: number of lines currently in the buffer
+            '''
+        if flush_size < 1:
+            print("Flush size must be at least 1.")
+            exit()
+
+        self.columns = columns
+        self.flush_size = flush_size
+        self.buffer = [[] for column in columns]
+        self.number_of_buffered_lines = 0
+
+    def write(self, lines: list):
+        '''Adds result lines to the buffer, writes the buffer if it holds at least flush_size lines.
+            Parameters: lines (list of lines with one value per column)
+            Returns: True if the buffer was written, False otherwise
+            '''
+
+        for line in lines:
+            for column_buffer, value in zip(self.buffer, line):
+                column_buffer.append(value)
+        self.number_of_buffered_lines += len(lines)
+
+        if self.number_of_buffered_lines >= self.flush_size:
+            self.flush()
+            return True
+
+        return False
+
+    def flush(self):
+        '''Writes all buffered lines and empties the buffer.
+            Parameters: -
+            Returns: -
+            '''
+
+        if self.number_of_buffered_lines > 0:
+            self._write_block(self.buffer)
+
+        self.buffer = [[] for column in self.columns]
+        self.number_of_buffered_lines = 0
+
+    def close(self):
+        '''Writes the remaining buffered lines and closes the output.
+            Parameters: -
+            Returns: -
+            '''
+
+        self.flush()
+
+    @abc.abstractmethod
+    def position(self):
+        '''Position of the output after the last written block (used for checkpoints, see resume_position of the subclasses).
+            Parameters: -
+            Returns: position
+            '''
+
+    @abc.abstractmethod
+    def _write_block(self, buffer):
+        '''Writes one block of buffered lines (one list of values per column).
+            Parameters: buffer
+            Returns: -
+            '''
+
+class csv_sink(result_sink):
+    def __init__(self, filename: str, columns: list, flush_size: int = 100000, resume_position: int = None):
+        '''Writes result lines to a csv file, which is opened once and kept open until close().
+            A new file is created (header is written at initialization), unless resume_position (file size at a checkpoint, see position) is given: then the existing file is truncated to this size (removing lines written after the checkpoint) and continued.'''
+
+        super().__init__(columns, flush_size)
+
+        self.filename = filename
+
+        if resume_position == None:
+            self.f_object = open(filename, 'w', newline='')
+            self.writer_object = csv.writer(self.f_object)
+            self.writer_object.writerow(columns)
+        else:
+            if not os.path.isfile(filename):
+                print("Results file ", filename, " of the checkpoint does not exist, the run cannot be resumed (start a new run without --resume).")
+                exit()
+
+            self.f_object = open(filename, 'r+', newline='')
+            self.f_object.truncate(resume_position)
+            self.f_object.seek(resume_position)
+            self.writer_object = csv.writer(self.f_object)
+
+    def position(self):
+        self.f_object.flush()
+        return self.f_object.tell()
+
+    def _write_block(self, buffer):
+        self.writer_object.writerows(zip(*buffer))
+
+    def close(self):
+        super().close()
+        self.f_object.close()
+
+class partitioned_sink(result_sink):
+    def __init__(self, directory: str, columns: list, file_format: str = "parquet", flush_size: int = 100000, resume_position: dict = None):
+        '''Writes result lines as typed columns (small integers for lat/date, float32 for longitudes, percentages and angles) to binary files, partitioned by latitude: every flush adds one file per latitude to <directory>/lat=<lat>/, so consumers can read only the latitudes they need.
+            File formats: "parquet" or "feather" (need pyarrow), "npz" (compressed numpy archive, used as fallback if pyarrow is not available).
+            Files of previous runs are removed, unless resume_position (number of files per latitude at a checkpoint, see position) is given: then only files written after the checkpoint are removed.'''
+
+        super().__init__(columns, flush_size)
+
+        if file_format != "parquet" and file_format != "feather" and file_format != "npz":
+            print("Unknown output format: ", file_format, " (available formats: parquet, feather, npz)")
+            exit()
+
+        if file_format != "npz" and pyarrow == None:
+            print("pyarrow is not installed, results are written as npz files instead of ", file_format, " files.")
+            file_format = "npz"
+
+        self.directory = directory
+        self.file_format = file_format
+        self.dtypes = [integer_column_dtypes.get(column, np.float32) for column in columns]
+        self.number_of_parts = {}
+
+        if resume_position != None:
+            self.number_of_parts = {int(lat): number_of_parts for lat, number_of_parts in resume_position.items()}
+
+        # remove files which are not part of the results to be continued
+        if os.path.isdir(directory):
+            for partition_directory in os.listdir(directory):
+                if not partition_directory.startswith("lat="):
+                    continue
+                number_of_parts = self.number_of_parts.get(int(partition_directory[4:]), 0)
+                for part_filename in os.listdir(os.path.join(directory, partition_directory)):
+                    if part_filename.startswith("part-") and int(part_filename[5:10]) >= number_of_parts:
+                        os.remove(os.path.join(directory, partition_directory, part_filename))
+
+    def position(self):
+        return {str(int(lat)): number_of_parts for lat, number_of_parts in self.number_of_parts.items()}
+
+    def _write_block(self, buffer):
+        arrays = [np.asarray(column_buffer, dtype=dtype) for column_buffer, dtype in zip(buffer, self.dtypes)]
+        lat_column = arrays[self.columns.index('lat')]
+
+        for lat in np.unique(lat_column):
+            in_partition = lat_column == lat
+            partition = {column: array[in_partition] for column, array in zip(self.columns, arrays)}
+
+            partition_directory = os.path.join(self.directory, "lat=" + str(lat))
+            os.makedirs(partition_directory, exist_ok=True)
+
+            part = self.number_of_parts.get(lat, 0)
+            self.number_of_parts[lat] = part + 1
+            part_filename = os.path.join(partition_directory, "part-" + str(part).zfill(5) + "." + self.file_format)
+
+            if self.file_format == "npz":
+                np.savez_compressed(part_filename, **partition)
+            else:
+                table = pyarrow.table(partition)
+                if self.file_format == "parquet":
+                    pyarrow.parquet.write_table(table, part_filename)
+                else:
+                    pyarrow.feather.write_feather(table, part_filename)
+
+def create_sink(output_format: str, filename: str, columns: list, flush_size: int = 100000, resume_position=None):
+    '''Creates the result sink for the given output format.
+        Parameters: output_format ("csv", "parquet", "feather" or "npz"), filename (csv file name, for binary formats the directory name is the file name without ".csv"), columns, flush_size, resume_position (position of the sink at a checkpoint, None for a new run)
+        Returns: sink'''
+
+    if output_format == "csv":
+        return csv_sink(filename, columns, flush_size, resume_position)
+
+    return partitioned_sink(os.path.splitext(filename)[0], columns, output_format, flush_size, resume_position)
+
+def read_partition(directory: str, lat: int):
+    '''Reads all results of one latitude from a partitioned result directory.
+        Parameters: directory, lat
+        Returns: columns (dictionary of numpy arrays)'''
+
+    partition_directory = os.path.join(directory, "lat=" + str(lat))
+    parts = []
+
+    for part_filename in sorted(os.listdir(partition_directory)):
+        part_filename = os.path.join(partition_directory, part_filename)
+        if part_filename.endswith(".npz"):
+            with np.load(part_filename) as part:
+                parts.append({column: part[column] for column in part.files})
+        elif part_filename.endswith(".parquet"):
+            table = pyarrow.parquet.read_table(part_filename)
+            parts.append({column: table[column].to_numpy() for column in table.column_names})
+        elif part_filename.endswith(".feather"):
+            table = pyarrow.feather.read_table(part_filename)
+            parts.append({column: table[column].to_numpy() for column in table.column_names})
+
+    return {column: np.concatenate([part[column] for part in parts]) for column in parts[0]}
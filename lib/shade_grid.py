@@ -1,13 +1,21 @@
+import lattice_shade
+
+import numpy as np
+import shapely
 from shapely.geometry import Point as shapely_Point
 from shapely.geometry import Polygon as shapely_Polygon
 
 class shade_grid:
-    def __init__(self, field_width: float, field_length: float, spacing: float = 1):
-        '''Generates a grid with given spacing for the test field (determined by field width and length). 
-
-            Instance variables: 
-            - grid_dict: saves the grid points and associates them with a counter which is set to 0 at initialization
-            - timestep_count: counter for every time the grid is updated 
+    def __init__(self, field_width: float, field_length: float, spacing: float = 1, coordinates: tuple = None, incremental: bool = False):
+        '''Generates a grid with given spacing for the test field (determined by field width and length). The coordinates (x_coords, y_coords, grid_x, grid_y) can be given instead of generated, e.g. read-only views of shared memory in worker processes (see shared_buffers.py), only the counts belong to the grid.
+
+            Instance variables:
+            - x_coords, y_coords: coordinates of the grid columns (E/W) and rows (N/S)
+            - grid_x, grid_y: coordinates of all grid points (one row of the arrays per grid row)
+            - field_bounds: borders of the field including buffer (x_min, x_max, y_min, y_max)
+            - counts: counter for every grid point (same shape as grid_x/grid_y) which is set to 0 at initialization
+            - timestep_count: counter for every time the grid is updated
+            - incremental: if True, update only tests the grid points which lie in the part of the field where the shade changed since the previous update (see update)
             '''
         if (field_width < 0):
             print("Field width cannot be smaller than 0.")
@@ -17,67 +25,169 @@ class shade_grid:
             print("Field length cannot be smaller than 0.")
             exit()
 
-        # generate grid with 1m spacing for the testing field, set associated count to 0
-        self.grid_dict = {}
-
-        for i in range(-10, field_width + 10 + spacing, spacing):
-            for j in range(-10, field_length + 10 + spacing, spacing):
-                self.grid_dict[shapely_Point(i, j)] = 0
+        # generate grid with given spacing for the testing field (including 10m buffer), set associated count to 0
+        if coordinates == None:
+            self.x_coords = -10 + spacing * np.arange(int((field_width + 20) / spacing + 1e-9) + 1)
+            self.y_coords = -10 + spacing * np.arange(int((field_length + 20) / spacing + 1e-9) + 1)
+            self.grid_x, self.grid_y = np.meshgrid(self.x_coords, self.y_coords)
+        else:
+            self.x_coords, self.y_coords, self.grid_x, self.grid_y = coordinates
+        self.field_bounds = (-10, field_width + 10, -10, field_length + 10)
+        self.counts = np.zeros(self.grid_x.shape, dtype=np.int64)
+        self._grid_dict = None
+
+        # shade polygon and shaded grid points of the previous update (incremental updates)
+        self.incremental = incremental
+        self._previous_polygon = None
+        self._previous_footprint = None
 
         # initiate timestep count
         self.timestep_count = 0
 
+    @property
+    def grid_dict(self):
+        '''Grid points and associated counts as a dictionary (shapely Point: count), built from the count array on first access after an update (read-only view).'''
+
+        if self._grid_dict is None:
+            self._grid_dict = {shapely_Point(x, y): int(count) for x, y, count in zip(self.grid_x.T.ravel(), self.grid_y.T.ravel(), self.counts.T.ravel())}
+
+        return self._grid_dict
+
     def reset(self):
-        '''Resets grid_dict so counts for all points are 0, resets timestep_count to 0.
-            Parameters: - 
+        '''Resets the counts for all points to 0, resets timestep_count to 0.
+            Parameters: -
             Returns: -
             '''
-        
+
         # reset all counts to 0
-        for point in self.grid_dict:
-            self.grid_dict[point] = 0
+        self.counts.fill(0)
+        self._grid_dict = None
 
         # reset timestep count to 0
         self.timestep_count = 0
-        
+
 
     def update(self, shade_polygon: shapely_Polygon):
-        '''Updates grid_dict by checking if a given point is in the shaded area, and adding one to to associated count if it is. Increases timestep_count by 1.
+        '''Updates the counts by checking which points are in the shaded area, and adding one to the associated count if they are. Increases timestep_count by 1.
             Parameters: shade_polygon
-            Returns: - 
+            Returns: -
+            '''
+
+        # add to count if point is in shaded polygon (vectorized check against prepared polygon)
+        shapely.prepare(shade_polygon)
+
+        if self.incremental:
+            footprint = self._incremental_footprint(shade_polygon)
+            self._previous_polygon, self._previous_footprint = shade_polygon, footprint
+        else:
+            footprint = shapely.contains_xy(shade_polygon, self.grid_x, self.grid_y)
+
+        self.counts += footprint
+        self._grid_dict = None
+
+        # increase timestep count
+        self.timestep_count += 1
+
+    def _incremental_footprint(self, shade_polygon: shapely_Polygon):
+        '''Shaded grid points of the shade polygon, only the grid points within the bounding boxes of the symmetric difference to the previous shade polygon (the bands swept by the shadow edges) are tested, all other points keep the result of the previous update. See update.'''
+
+        if self._previous_polygon is None:
+            return shapely.contains_xy(shade_polygon, self.grid_x, self.grid_y)
+
+        # bounding boxes of all parts of the changed area (closed boxes, so points on the borders of both polygons are tested as well)
+        changed_area = shapely.symmetric_difference(shade_polygon, self._previous_polygon)
+        bounds = shapely.bounds(shapely.get_parts(changed_area))
+        bounds = bounds[~np.isnan(bounds).any(axis=1)]
+
+        start_columns = np.searchsorted(self.x_coords, bounds[:, 0] - 1e-9, side='left')
+        end_columns = np.searchsorted(self.x_coords, bounds[:, 2] + 1e-9, side='right')
+        start_rows = np.searchsorted(self.y_coords, bounds[:, 1] - 1e-9, side='left')
+        end_rows = np.searchsorted(self.y_coords, bounds[:, 3] + 1e-9, side='right')
+
+        # grid points to be tested (boxes of all parts), all other points are unchanged
+        changed = np.zeros(self.counts.shape, dtype=bool)
+        for start_column, end_column, start_row, end_row in zip(start_columns, end_columns, start_rows, end_rows):
+            changed[start_row:end_row, start_column:end_column] = True
+
+        footprint = self._previous_footprint.copy()
+        footprint[changed] = shapely.contains_xy(shade_polygon, self.grid_x[changed], self.grid_y[changed])
+
+        return footprint
+
+    def update_from_lattice(self, x_corners, y_corners, distance_EW, distance_NS, number_of_panels_EW, number_of_panels_NS):
+        '''Updates the counts by rasterizing the shadows of all panels directly into the grid (scanline): for every grid row the covered x-intervals are calculated analytically and counts are increased with slice operations. Overlapping shadows are counted once, points on the border of the shaded area (or of the field) are not counted (same as update). Increases timestep_count by 1.
+            Parameters: x_corners, y_corners (shadow corners of the first panel), distance_EW, distance_NS, number_of_panels_EW, number_of_panels_NS
+            Returns: -
             '''
-        
-        # add to count if point is in shaded polygon
-        for point in self.grid_dict:
-            if shade_polygon.contains(point):
-                self.grid_dict[point] += 1
+
+        x_min, x_max, y_min, y_max = self.field_bounds
+
+        # a point is inside the shaded area if it is covered when approaching its grid row from below and from above (this excludes points on the border of the shaded area)
+        covered_below = self._rasterize_rows(x_corners, y_corners, distance_EW, distance_NS, number_of_panels_EW, number_of_panels_NS, "below")
+        covered_above = self._rasterize_rows(x_corners, y_corners, distance_EW, distance_NS, number_of_panels_EW, number_of_panels_NS, "above")
+
+        # rows on the field border are never inside the (clipped) shaded area
+        inside_field = (self.y_coords > y_min) & (self.y_coords < y_max)
+        self.counts += covered_below & covered_above & inside_field[:, np.newaxis]
+        self._grid_dict = None
 
         # increase timestep count
         self.timestep_count += 1
 
+    def _rasterize_rows(self, x_corners, y_corners, distance_EW, distance_NS, number_of_panels_EW, number_of_panels_NS, side):
+        '''Marks the grid points strictly inside the covered x-intervals of every grid row (shadows on the lattice, clipped to the field). See update_from_lattice.'''
+
+        x_min, x_max, y_min, y_max = self.field_bounds
+
+        # covered x-intervals of all shadows for every grid row, merged so overlapping shadows count once
+        x_left, x_right = lattice_shade.lattice_intervals(x_corners, y_corners, distance_EW, distance_NS, number_of_panels_EW, number_of_panels_NS, self.y_coords, side)
+        rows, x_start, x_end = lattice_shade.merge_intervals(x_left, x_right)
+
+        # shaded area is clipped to the field
+        x_start, x_end = np.maximum(x_start, x_min), np.minimum(x_end, x_max)
+
+        # columns of the grid points strictly inside the intervals, marked via a difference array over every row
+        start_columns = np.searchsorted(self.x_coords, x_start, side='right')
+        end_columns = np.searchsorted(self.x_coords, x_end, side='left')
+        valid = start_columns < end_columns
+
+        covered = np.zeros((self.counts.shape[0], self.counts.shape[1] + 1), dtype=np.int64)
+        np.add.at(covered, (rows[valid], start_columns[valid]), 1)
+        np.add.at(covered, (rows[valid], end_columns[valid]), -1)
+
+        return np.cumsum(covered, axis=1)[:, :-1] > 0
+
+    def add_counts(self, counts, timestep_count: int):
+        '''Adds precomputed counts to the counts of the grid (e.g. footprints of sky patches weighted by the number of timesteps in each patch). Increases timestep_count by the given number of timesteps.
+            Parameters: counts (same shape as the grid), timestep_count
+            Returns: -
+            '''
+
+        self.counts += counts
+        self._grid_dict = None
+
+        self.timestep_count += timestep_count
+
     def evaluate(self, interval_count):
-        '''Calculated the percentage of points (in the grid_dict) in each percentage category. Percentage categories are determined from the intervall count.
+        '''Calculated the percentage of points in each percentage category. Percentage categories are determined from the intervall count.
             Parameters: interval_count
             Returns: percentage_steps, percentage_counts_dict
             '''
 
+        if self.timestep_count == 0:
+            raise ZeroDivisionError("Grid has not been updated, percentage of time shaded cannot be calculated.")
+
         # calculate percentage steps between intervalls
         percentage_steps = 1/interval_count
-
-        # generate empty dictionary for later summation of matching points
-        percentage_counts_dict = {}
-        for i in range(1, interval_count + 1):
-            percentage_counts_dict[percentage_steps * i] = 0
+        percentages = [percentage_steps * i for i in range(0, interval_count + 1)]
 
         # sort points into matching category depending on the percentage of time they are shaded
-        for point in self.grid_dict:
-            for percentage in percentage_counts_dict:
-                # ternary statement is to include points that are shaded 0% of the time in lowest bin
-                if (self.grid_dict[point]/self.timestep_count <= percentage and (self.grid_dict[point]/self.timestep_count > percentage - percentage_steps if percentage - percentage_steps != 0 else self.grid_dict[point]/self.timestep_count >= percentage - percentage_steps)):
-                    percentage_counts_dict[percentage] += 1
+        # categories include their upper bound (the lowest one also includes 0%), which is why the histogram is calculated for negated values
+        histogram, bin_edges = np.histogram(- self.counts / self.timestep_count, bins=[- percentage for percentage in percentages[::-1]])
 
-        # divide category counts by total number of points to get percentage of points in a given category 
-        for percentage in percentage_counts_dict:
-            percentage_counts_dict[percentage] /= len(self.grid_dict)
+        # divide category counts by total number of points to get percentage of points in a given category
+        percentage_counts_dict = {}
+        for percentage, count in zip(percentages[1:], histogram[::-1]):
+            percentage_counts_dict[percentage] = count / self.counts.size
 
-        return percentage_steps, percentage_counts_dict
\ No newline at end of file
+        return percentage_steps, percentage_counts_dict
@@ -0,0 +1,110 @@
+import shade_grid
+import solarposition
+
+import collections
+import math
+import threading
+import numpy as np
+
+class shade_memo:
+    def __init__(self, tolerance: float = 0.1, maxsize: int = 20000):
+        '''Memo cache for shading results keyed on quantized sun angles: the in-plane angles and the tilts are rounded to the tolerance and the shade is calculated once for the rounded values (so results do not depend on the order of the timesteps). Least recently used entries are removed if the cache holds more than maxsize entries.
+
+            Instance variables:
+            - tolerance: resolution (in degrees) to which the angles in the E/W and N/S plane and the tilts are rounded
+            - maxsize: maximum number of entries
+            - entries: cached results (key: system geometry, settings and rounded angles, value: ground shade, self-shade and shaded grid points)
+            - hits, misses: number of lookups which were found/not found in the cache
+            - lock: lock for the entries and counters (the memo can be shared by threads)
+            '''
+        if tolerance <= 0:
+            print("Tolerance of the shade memo must be larger than 0.")
+            exit()
+
+        if maxsize < 1:
+            print("Size of the shade memo must be at least 1.")
+            exit()
+
+        self.tolerance = tolerance
+        self.maxsize = maxsize
+        self.entries = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def quantize_angle(self, angle_in_plane_rad):
+        '''Rounds an angle in the E/W or N/S plane to the tolerance (angles of 0 and pi are excluded, the sun is always over the horizon).
+            Parameters: angle_in_plane_rad
+            Returns: index (used in the key), rounded angle in radians
+            '''
+
+        index = min(max(round(math.degrees(angle_in_plane_rad) / self.tolerance), 1), math.ceil(180 / self.tolerance) - 1)
+
+        return index, math.radians(index * self.tolerance)
+
+    def calculate_shade(self, geometry, angle_in_plane_EW, angle_in_plane_NS, PV_angle_EW, PV_angle_NS, field_width, field_length, grid: shade_grid.shade_grid = None, engine: str = "shapely", tilt_resolution: float = None):
+        '''Ground shade and self-shade for the rounded sun angles and tilts, taken from the cache if possible. If a grid is given, the shaded grid points are added to it (same as calculate_ground_shade).
+            Parameters: see system_geometry.calculate_ground_shade
+            Returns: intersection_percent, self_shade_percentage_of_total_panel_area
+            '''
+
+        index_EW, angle_EW = self.quantize_angle(angle_in_plane_EW)
+        index_NS, angle_NS = self.quantize_angle(angle_in_plane_NS)
+        tilt_EW = round(PV_angle_EW / self.tolerance)
+        tilt_NS = round(PV_angle_NS / self.tolerance)
+
+        key = (geometry, index_EW, index_NS, tilt_EW, tilt_NS, field_width, field_length, grid.counts.shape if grid != None else None, engine, tilt_resolution)
+
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry != None:
+                self.hits += 1
+                self.entries.move_to_end(key)
+            else:
+                self.misses += 1
+
+        # calculated outside of the lock, threads only wait for the dictionary operations
+        if entry == None:
+            # shade for the rounded angles, shaded grid points are rasterized into an empty grid and stored as packed bits
+            footprint_grid = shade_grid.shade_grid(field_width, field_length, grid.x_coords[1] - grid.x_coords[0]) if grid != None else None
+            intersection_percent = geometry.calculate_ground_shade(angle_EW, angle_NS, tilt_EW * self.tolerance, tilt_NS * self.tolerance, field_width, field_length, footprint_grid, engine, tilt_resolution)
+            footprint = np.packbits(footprint_grid.counts > 0) if grid != None else None
+
+            azimuth_rad, elevation_rad = solarposition.calculate_sun_direction(angle_EW, angle_NS)
+            self_shade_total = float(geometry.calculate_self_shade_array(angle_EW, angle_NS, azimuth_rad, tilt_EW * self.tolerance, tilt_NS * self.tolerance))
+            self_shade_percentage_of_total_panel_area = (self_shade_total / (geometry.number_of_panels_EW * geometry.number_of_panels_NS * geometry.PV_width * geometry.PV_length)) * 100
+
+            entry = (intersection_percent, self_shade_percentage_of_total_panel_area, footprint)
+
+            with self.lock:
+                self.entries[key] = entry
+
+                if len(self.entries) > self.maxsize:
+                    self.entries.popitem(last=False)
+
+        if grid != None:
+            grid.add_counts(np.unpackbits(entry[2], count=grid.counts.size).reshape(grid.counts.shape), 1)
+
+        return entry[0], entry[1]
+
+    def info(self):
+        '''Counters of the cache (for tuning tolerance and maxsize).
+            Parameters: -
+            Returns: dictionary with hits, misses, hit_rate, size and maxsize
+            '''
+
+        lookups = self.hits + self.misses
+
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / lookups if lookups > 0 else 0.0, 'size': len(self.entries), 'maxsize': self.maxsize}
+
+    def clear(self):
+        '''Removes all entries and resets the counters.
+            Parameters: -
+            Returns: -
+            '''
+
+        with self.lock:
+            self.entries.clear()
+            self.hits = 0
+            self.misses = 0
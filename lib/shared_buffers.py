@@ -0,0 +1,62 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+
+# Arrays which are the same for all work units (solar tables of all latitudes, grid coordinates) are published once by the parent process as shared memory.
+# Workers attach to the segments by name and use them as read-only numpy views, so memory per worker does not grow with the number of processes.
+
+# segments attached in this process (name: (segment, array)), kept open for the lifetime of the process
+attached_segments = {}
+
+def publish(arrays: dict):
+    '''Copies arrays into shared memory segments.
+
+        Parameters: arrays (dictionary key: numpy array, keys must be picklable)
+
+        Returns:
+        - handles: dictionary key: (segment name, shape, dtype), passed to the workers (see attach)
+        - segments: shared memory segments, released by the publishing process after the workers are finished (see release)'''
+
+    handles = {}
+    segments = []
+
+    for key, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        segments.append(segment)
+
+        np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)[...] = array
+        handles[key] = (segment.name, array.shape, array.dtype.str)
+
+    return handles, segments
+
+def attach(handles: dict):
+    '''Attaches to published shared memory segments (every segment only once per process).
+
+        Parameters: handles (see publish)
+
+        Returns: arrays (dictionary key: read-only numpy view of the shared memory)'''
+
+    arrays = {}
+
+    for key, (name, shape, dtype) in handles.items():
+        if name not in attached_segments:
+            segment = shared_memory.SharedMemory(name=name)
+            array = np.ndarray(shape, dtype=np.dtype(dtype), buffer=segment.buf)
+            array.setflags(write=False)
+            attached_segments[name] = (segment, array)
+
+        arrays[key] = attached_segments[name][1]
+
+    return arrays
+
+def release(segments: list):
+    '''Closes and removes shared memory segments (see publish).
+
+        Parameters: segments
+
+        Returns: -'''
+
+    for segment in segments:
+        segment.close()
+        segment.unlink()
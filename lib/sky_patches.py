@@ -0,0 +1,108 @@
+import solarposition
+import shade_grid
+
+import math
+import numpy as np
+
+# Ground shade and the shaded grid points only depend on the sun direction (and the tilt of the panels, which follows the sun direction for tracking systems).
+# Daylight timesteps are binned into sky patches (azimuth x elevation), the shade is calculated once per occupied patch (for the mean sun direction of its timesteps) and used for all timesteps in the patch.
+
+def assign_sky_patches(azimuth_rad, elevation_rad, daylight, patch_size: float):
+    '''Bins all daylight timesteps into sky patches of patch_size x patch_size degrees (azimuth x elevation).
+
+        Parameters:
+        - azimuth_rad, elevation_rad: sun direction for every timestep (arrays)
+        - daylight: mask of the timesteps with the sun over the horizon
+        - patch_size: size of the sky patches in degrees
+
+        Returns:
+        - patch_index: sky patch of every timestep (-1 for night timesteps)
+        - patch_azimuth_rad, patch_elevation_rad: mean sun direction of the timesteps in every patch
+        - occupancy: number of timesteps in every patch
+    '''
+
+    if patch_size <= 0:
+        print("Sky patch size must be larger than 0.")
+        exit()
+
+    azimuth_rad = np.asarray(azimuth_rad, dtype=float)
+    elevation_rad = np.asarray(elevation_rad, dtype=float)
+    daylight = np.asarray(daylight, dtype=bool).ravel()
+
+    # patch number from azimuth and elevation bin
+    number_of_azimuth_bins = math.ceil(360 / patch_size)
+    azimuth_bin = np.floor(np.degrees(azimuth_rad[daylight]) / patch_size).astype(int)
+    elevation_bin = np.floor(np.degrees(elevation_rad[daylight]) / patch_size).astype(int)
+
+    # only occupied patches are numbered
+    patch_keys, inverse, occupancy = np.unique(elevation_bin * number_of_azimuth_bins + azimuth_bin, return_inverse=True, return_counts=True)
+
+    patch_index = np.full(daylight.shape, -1)
+    patch_index[daylight] = inverse
+
+    # mean sun direction of every patch (azimuth bins do not wrap around north, so the mean azimuth is within the patch)
+    patch_azimuth_rad = np.bincount(inverse, weights=azimuth_rad[daylight], minlength=len(patch_keys)) / occupancy
+    patch_elevation_rad = np.bincount(inverse, weights=elevation_rad[daylight], minlength=len(patch_keys)) / occupancy
+
+    return patch_index, patch_azimuth_rad, patch_elevation_rad, occupancy
+
+def evaluate_sky_patches(geometry, patch_azimuth_rad, patch_elevation_rad, PV_angle_EW, PV_angle_NS, field_width, field_length, grid_spacing=1, shade_engine="shapely", tilt_resolution=None):
+    '''Calculates the ground shade and the shaded grid points once for the sun direction of every sky patch.
+
+        Parameters:
+        - geometry: pv_system.system_geometry
+        - patch_azimuth_rad, patch_elevation_rad: sun direction of every patch
+        - PV_angle_EW, PV_angle_NS: tilts in degrees (for tracking systems the E/W tilt is calculated for the sun direction of every patch)
+        - field_width, field_length, grid_spacing, shade_engine, tilt_resolution: see system_geometry.calculate_ground_shade
+
+        Returns:
+        - patch_ground_shade: shaded area of the field (in %) for every patch
+        - patch_footprints: shaded grid points for every patch (boolean array, one grid per patch)
+    '''
+
+    angle_in_plane_EW, angle_in_plane_NS = solarposition.calculate_angles_in_plane(patch_azimuth_rad, patch_elevation_rad)
+    PV_angles_EW = geometry.tilt_schedule(angle_in_plane_EW, PV_angle_EW)
+
+    grid = shade_grid.shade_grid(field_width, field_length, grid_spacing)
+
+    patch_ground_shade = np.zeros(len(angle_in_plane_EW))
+    patch_footprints = np.zeros((len(angle_in_plane_EW),) + grid.counts.shape, dtype=bool)
+
+    for patch in range(len(angle_in_plane_EW)):
+        grid.reset()
+        patch_ground_shade[patch] = geometry.calculate_ground_shade(angle_in_plane_EW[patch], angle_in_plane_NS[patch], PV_angles_EW[patch], PV_angle_NS, field_width, field_length, grid, shade_engine, tilt_resolution)
+        patch_footprints[patch] = grid.counts > 0
+
+    return patch_ground_shade, patch_footprints
+
+def estimate_error(geometry, solar_table, PV_angles_EW, PV_angle_NS, timesteps, patch_index, patch_ground_shade, patch_footprints, field_width, field_length, grid_spacing=1, shade_engine="shapely", tilt_resolution=None):
+    '''Estimates the error of the sky patch calculation by comparing it to the calculation for the exact sun direction for a sample of timesteps.
+
+        Parameters:
+        - geometry: pv_system.system_geometry
+        - solar_table: solar position for every timestep (see solarposition.calculate_solar_table)
+        - PV_angles_EW: E/W tilt for every timestep, PV_angle_NS: N/S tilt
+        - timesteps: sample of daylight timesteps which are calculated exactly
+        - patch_index, patch_ground_shade, patch_footprints: sky patches (see assign_sky_patches and evaluate_sky_patches)
+        - field_width, field_length, grid_spacing, shade_engine, tilt_resolution: see system_geometry.calculate_ground_shade
+
+        Returns:
+        - error: dictionary with the number of validated timesteps, the maximum and mean absolute error of the ground shade (in %-points, the maximum is used as error bound) and the mean share of grid points which are classified differently
+    '''
+
+    grid = shade_grid.shade_grid(field_width, field_length, grid_spacing)
+
+    ground_shade_errors = []
+    footprint_errors = []
+
+    for timestep in timesteps:
+        grid.reset()
+        ground_shade = geometry.calculate_ground_shade(solar_table['angle_in_plane_EW'][timestep], solar_table['angle_in_plane_NS'][timestep], PV_angles_EW[timestep], PV_angle_NS, field_width, field_length, grid, shade_engine, tilt_resolution)
+
+        ground_shade_errors.append(abs(ground_shade - patch_ground_shade[patch_index[timestep]]))
+        footprint_errors.append(np.mean((grid.counts > 0) != patch_footprints[patch_index[timestep]]))
+
+    if len(ground_shade_errors) == 0:
+        return {'validated_timesteps': 0, 'max_ground_shade_error': 0.0, 'mean_ground_shade_error': 0.0, 'mean_footprint_error': 0.0}
+
+    return {'validated_timesteps': len(ground_shade_errors), 'max_ground_shade_error': float(np.max(ground_shade_errors)), 'mean_ground_shade_error': float(np.mean(ground_shade_errors)), 'mean_footprint_error': float(np.mean(footprint_errors))}
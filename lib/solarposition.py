@@ -3,6 +3,9 @@ import pandas as pd
 import math
 import numpy as np
 
+# options of the (vectorized) pvlib solar position calculation (pvlib defaults, also used to check cached solar tables, see ephemeris_cache.py)
+solar_position_options = {'method': 'nrel_numpy', 'altitude': None, 'pressure': None, 'temperature': 12}
+
 def find_nearest(array, value):
     '''Finds nearest value in array to given value.
     
@@ -93,3 +96,104 @@ def correct_solarposition(year, month, day, hour, minute, long, lat):
     proximate_azimuth = find_nearest(azimuth_array, azimuth_converted)
     
     return proximate_azimuth, apparent_elevation
+
+
+def generate_timesteps(year, freq='15min'):
+    '''Generates all timesteps of a given year with the given frequency (timezone naive, i.e. interpreted as UTC by pvlib).
+
+       Parameters: year, freq
+
+       Returns: times (pandas DatetimeIndex)'''
+
+    return pd.date_range(start=pd.Timestamp(year=year, month=1, day=1), end=pd.Timestamp(year=year + 1, month=1, day=1), freq=freq, inclusive='left')
+
+def calculate_solar_table(lat, long, times):
+    '''Calculates the solar position for all given timesteps with a single (vectorized) pvlib call. Results match calculate_azimuth_and_elevation_rad, calculate_solarposition and correct_solarposition for every single timestep.
+
+       Parameters: lat, long, times (pandas DatetimeIndex)
+
+       Returns: solar_table (dictionary of numpy arrays, one entry per timestep)
+       - azimuth_rad: azimuth in radians
+       - elevation_rad: apparent elevation in radians
+       - angle_in_plane_EW: angle between ground and an incoming sun beam, projected on the east/west plane (-1 if the sun is under the horizon)
+       - angle_in_plane_NS: angle between ground and an incoming sun beam, projected on the north/south plane (-1 if the sun is under the horizon)
+       - proximate_azimuth: nearest azimuth available in horizon data (in degrees)
+       - apparent_elevation: apparent elevation in degrees'''
+
+    # calculate solar position for all timesteps at once
+    solar_position = solarposition.get_solarposition(times, lat, long, **solar_position_options)
+    apparent_elevation = solar_position['apparent_elevation'].to_numpy(dtype=float)
+    azimuth = solar_position['azimuth'].to_numpy(dtype=float)
+
+    # converting elevation and azimuth to rad
+    apparent_elevation_rad = (apparent_elevation / 180) * math.pi
+    azimuth_rad = (azimuth / 180) * math.pi
+
+    angle_in_plane_EW, angle_in_plane_NS = calculate_angles_in_plane(azimuth_rad, apparent_elevation_rad)
+
+    # convert azimuth to azimuth used in horizon data (0° - 360° to -180° - 180°) and find nearest available azimuth
+    azimuth_array = np.linspace(-180, 180, num=49)
+    proximate_azimuth = azimuth_array[np.abs((azimuth - 180)[:, np.newaxis] - azimuth_array).argmin(axis=1)]
+
+    solar_table = {
+        'azimuth_rad': azimuth_rad,
+        'elevation_rad': apparent_elevation_rad,
+        'angle_in_plane_EW': angle_in_plane_EW,
+        'angle_in_plane_NS': angle_in_plane_NS,
+        'proximate_azimuth': proximate_azimuth,
+        'apparent_elevation': apparent_elevation,
+    }
+
+    return solar_table
+
+def calculate_angles_in_plane(azimuth_rad, elevation_rad):
+    '''Converts sun directions (azimuth and apparent elevation, arrays) to angles in the vertical planes in E/W and N/S direction (same as calculate_solarposition).
+
+       Parameters: azimuth_rad, elevation_rad
+
+       Returns: angle_in_plane_EW, angle_in_plane_NS (-1 if the sun is under the horizon)'''
+
+    azimuth_rad = np.asarray(azimuth_rad, dtype=float)
+    elevation_rad = np.asarray(elevation_rad, dtype=float)
+
+    height = np.sin(elevation_rad)
+    distance_NS = - np.cos(azimuth_rad) * np.cos(elevation_rad) #offset_distance
+    distance_EW = np.sin(azimuth_rad) * np.cos(elevation_rad) #offset_distance
+
+    # sun under horizon is marked with -1 (same as in calculate_solarposition)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        angle_in_plane_NS = np.where(height >= 0, math.pi/2 - np.arctan(distance_NS/height), -1)
+        angle_in_plane_EW = np.where(height >= 0, math.pi/2 - np.arctan(distance_EW/height), -1)
+
+    return angle_in_plane_EW, angle_in_plane_NS
+
+def calculate_sun_direction(angle_in_plane_EW, angle_in_plane_NS):
+    '''Converts angles in the vertical planes in E/W and N/S direction back to sun directions (inverse of calculate_angles_in_plane for the sun over the horizon).
+
+       Parameters: angle_in_plane_EW, angle_in_plane_NS (arrays, angles between 0 and pi)
+
+       Returns: azimuth_rad, elevation_rad'''
+
+    # horizontal offsets of the sun beam for a height of 1
+    with np.errstate(divide='ignore'):
+        distance_EW = 1 / np.tan(np.asarray(angle_in_plane_EW, dtype=float))
+        distance_NS = 1 / np.tan(np.asarray(angle_in_plane_NS, dtype=float))
+
+    azimuth_rad = np.mod(np.arctan2(distance_EW, - distance_NS), 2*math.pi)
+    elevation_rad = np.arctan2(1, np.hypot(distance_EW, distance_NS))
+
+    return azimuth_rad, elevation_rad
+
+def calculate_daylight_windows(apparent_elevation, timesteps_per_day):
+    '''Determines for every day which timesteps lie between sunrise and sunset (apparent elevation >= 0) from the vectorized elevation array, so night timesteps can be skipped before any geometry calculations. Days around the polar day/night may have more than one daylight window, which is why a mask (not just first and last timestep) is returned.
+
+       Parameters: apparent_elevation (one value per timestep for whole days), timesteps_per_day
+
+       Returns: daylight_windows (boolean array with one row per day and one column per timestep of the day)'''
+
+    apparent_elevation = np.asarray(apparent_elevation)
+
+    if apparent_elevation.size % timesteps_per_day != 0:
+        raise ValueError("Number of timesteps must be a multiple of the number of timesteps per day.")
+
+    return (apparent_elevation >= 0).reshape(-1, timesteps_per_day)
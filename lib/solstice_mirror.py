@@ -0,0 +1,136 @@
+import numpy as np
+import pvlib
+import threading
+
+# Days symmetric about a solstice have (nearly) the same declination, so their sun paths and shadows (nearly) coincide. Their solar noon differs in UTC by the difference of the equation of time.
+# Days between the June and the December solstice (falling declination) are mirrored to a day between the December and the June solstice (rising declination): results of the mirror day are reused for the timestep shifted by the difference of the equation of time (rounded to whole timesteps), if the sun direction of both timesteps differs by less than a tolerance.
+
+def declination_and_equation_of_time(number_of_days: int):
+    '''Approximate declination and equation of time for every day of a year (Spencer, 1971).
+
+        Parameters: number_of_days (365 or 366)
+
+        Returns: declination (in degrees), equation_of_time (in minutes)'''
+
+    day_of_year = np.arange(1, number_of_days + 1)
+
+    return np.degrees(pvlib.solarposition.declination_spencer71(day_of_year)), np.asarray(pvlib.solarposition.equation_of_time_spencer71(day_of_year))
+
+def mirror_days(number_of_days: int, minutes_per_timestep: int = 15):
+    '''Finds the mirror day of every day with falling declination: the day with rising declination with the smallest expected difference of the sun direction (difference of the declination and remainder of the time offset which cannot be shifted by whole timesteps).
+
+        Parameters: number_of_days, minutes_per_timestep
+
+        Returns: mirror day for every day of the year (0-based, days with rising declination are their own mirror day)'''
+
+    declination, equation_of_time = declination_and_equation_of_time(number_of_days)
+
+    # days are 0-based, the solstices are the days with the largest and smallest declination
+    days = np.arange(number_of_days)
+    rising_days = days[(days <= np.argmax(declination)) | (days >= np.argmin(declination))]
+    mirror = days.copy()
+
+    for day in np.setdiff1d(days, rising_days):
+        # the remainder of the time offset moves the sun by 0.25° per minute along its path (shorter for higher declination)
+        remainder = (equation_of_time[day] - equation_of_time[rising_days]) / minutes_per_timestep
+        remainder = np.abs(remainder - np.round(remainder)) * minutes_per_timestep * 0.25 * np.cos(np.radians(declination[day]))
+        mirror[day] = rising_days[np.argmin(np.hypot(declination[rising_days] - declination[day], remainder))]
+
+    return mirror
+
+def time_offset(day: int, mirror_day: int, number_of_days: int, minutes_per_timestep: int = 15):
+    '''Number of timesteps by which the sun path of a day is shifted relative to its mirror day (rounded to whole timesteps).
+
+        Parameters: day, mirror_day (0-based), number_of_days, minutes_per_timestep
+
+        Returns: offset (timestep t of the day corresponds to timestep t + offset of the mirror day)'''
+
+    equation_of_time = declination_and_equation_of_time(number_of_days)[1]
+
+    return round((equation_of_time[day] - equation_of_time[mirror_day]) / minutes_per_timestep)
+
+class mirror_records:
+    def __init__(self, records: dict = None):
+        '''Results of the mirror days (see day_evaluation.mirror_shade), created by run_sweep and shared by all work units of the sweep: every mirror day is calculated once, threads which need a mirror day that is being calculated wait for it. In a process pool, workers receive the records they need as a copy (pickled without the lock) and return the records they calculated (see new_records).
+
+            Instance variables:
+            - records: dictionary (key: lat, long, PV_angle_NS, day of the year (0-based): record, see day_evaluation.reference_recorder)
+            - new_keys: keys of the records calculated since the records were created (or unpickled in a worker process)
+            '''
+
+        self.records = dict(records) if records != None else {}
+        self.new_keys = []
+        self._lock = threading.Lock()
+        self._pending = {}
+
+    def __getstate__(self):
+        return {'records': self.records}
+
+    def __setstate__(self, state):
+        self.__init__(state['records'])
+
+    def get(self, key, calculate):
+        '''Record of a mirror day, calculated with calculate() if it is missing (only by the first thread which needs it).
+            Parameters: key, calculate (function without parameters which returns the record)
+            Returns: record'''
+
+        with self._lock:
+            if key in self.records:
+                return self.records[key]
+
+            calculating = self._pending.get(key)
+            if calculating == None:
+                calculating = self._pending[key] = threading.Event()
+                owner = True
+            else:
+                owner = False
+
+        # the record is calculated by another thread (if it fails, the next thread calculates it)
+        if not owner:
+            calculating.wait()
+            return self.get(key, calculate)
+
+        try:
+            record = calculate()
+            with self._lock:
+                self.records[key] = record
+                self.new_keys.append(key)
+        finally:
+            with self._lock:
+                del self._pending[key]
+            calculating.set()
+
+        return record
+
+    def subset(self, keys):
+        '''Records of the given keys which are available (e.g. passed to a worker process).
+            Parameters: keys
+            Returns: mirror_records'''
+
+        with self._lock:
+            return mirror_records({key: self.records[key] for key in keys if key in self.records})
+
+    def new_records(self):
+        '''Records calculated since the records were created or unpickled.
+            Parameters: -
+            Returns: dictionary (key: record)'''
+
+        with self._lock:
+            return {key: self.records[key] for key in self.new_keys}
+
+    def update(self, records: dict):
+        '''Adds records (e.g. calculated by a worker process).
+            Parameters: records (dictionary, key: record)
+            Returns: -'''
+
+        with self._lock:
+            self.records.update(records)
+
+    def release(self, lat):
+        '''Removes all records of a latitude (after all of its work units are finished).
+            Parameters: lat
+            Returns: -'''
+
+        with self._lock:
+            for key in [key for key in self.records if key[0] == lat]:
+                del self.records[key]
@@ -0,0 +1,416 @@
+import solarposition
+import shade_grid
+import sky_patches
+import ephemeris_cache
+import response_surface
+import shade_memo
+import shared_buffers
+import day_sampling
+import day_evaluation
+import solstice_mirror
+
+import collections
+import concurrent.futures
+import functools
+import math
+import numpy as np
+
+timesteps_per_day = 24 * 4
+
+def generate_work_units(lats, year, days_per_unit):
+    '''Splits a latitude sweep over one year into work units of consecutive days.
+
+        Parameters: lats, year, days_per_unit
+
+        Returns: work_units (list of (lat, first_day, last_day) tuples, days are 0-based days of the year, last_day is excluded)'''
+
+    number_of_days = len(solarposition.generate_timesteps(year)) // timesteps_per_day
+
+    work_units = []
+    for lat in lats:
+        for first_day in range(0, number_of_days, days_per_unit):
+            work_units.append((lat, first_day, min(first_day + days_per_unit, number_of_days)))
+
+    return work_units
+
+def estimate_unit_cost(lat, first_day, last_day):
+    '''Estimates the cost of a work unit from the number of daylight timesteps (shade calculations), using the approximate declination of every day. Night timesteps are only written in bulk and add a small constant cost per day.
+
+        Parameters: lat, first_day, last_day
+
+        Returns: cost (in number of shade calculations)'''
+
+    days = np.arange(first_day, last_day)
+
+    # approximate declination and day length (hour angle of sunrise/sunset)
+    declination = math.radians(23.44) * np.sin(2 * math.pi * (284 + days + 1) / 365)
+    cos_hour_angle = np.clip(- math.tan(math.radians(lat)) * np.tan(declination), -1, 1)
+    daylight_timesteps = np.arccos(cos_hour_angle) / math.pi * timesteps_per_day
+
+    return float(np.sum(daylight_timesteps) + len(days))
+
+@functools.lru_cache(maxsize=4)
+def get_shade_memo(tolerance: float, maxsize: int):
+    '''Shade memo of the process, shared by all work units which run in the process (serial runs: all latitudes and days).
+
+        Parameters: tolerance, maxsize (see shade_memo.shade_memo)
+
+        Returns: memo'''
+
+    return shade_memo.shade_memo(tolerance, maxsize)
+
+def simulate_unit(geometry, lat, long, year, first_day, last_day, field_width, field_length, percentage_intervals, shade_engine="shapely", grid_spacing=1, PV_angle_NS=0, PV_angle_EW=0, tilt_resolution=None, sky_patch_size=None, validation_stride=50, response_surface_resolution=None, response_surface_directory="response_surfaces", memo_tolerance=None, memo_size=20000, ephemeris_directory=None, shared_buffer_handles=None, threads=1, drift_tolerance=0.25, day_stride=None, day_tolerance=None, mirror_tolerance=None, symmetry_tolerance=None, incremental_grid=False, mirror_records=None, reference=None, recorded=None):
+    '''Calculates ground and self-shading for all 15 minute timesteps and the percentage of time shaded for every day of a work unit.
+
+        Parameters:
+        - geometry: pv_system.system_geometry (immutable, the tilts are given separately)
+        - lat, long, year: location and year
+        - first_day, last_day: days of the year in this unit (0-based, last_day is excluded)
+        - field_width, field_length: field dimensions without buffer
+        - percentage_intervals: number of categories for the percentage of time shaded
+        - shade_engine: engine for calculate_shade ("shapely" or "analytic")
+        - grid_spacing: spacing of the percentage shaded grid
+        - PV_angle_NS: tilt in the N/S plane in degrees (for standard systems depending on the latitude)
+        - PV_angle_EW: tilt in the E/W plane in degrees (for tracking and backtracking systems the tilt is calculated for every timestep)
+        - tilt_resolution: resolution (in degrees) of the tracker tilts for caching the tilt dependent geometry, None: exact tilts (see calculate_ground_shade)
+        - sky_patch_size: size of the sky patches in degrees (see sky_patches.py), the ground shade and the shaded grid points are calculated once per sky patch instead of for every timestep, None: calculation for every timestep
+        - validation_stride: every validation_stride-th daylight timestep is calculated exactly to estimate the error of the sky patch/response surface calculation (printed for every unit), None: no error estimate
+        - response_surface_resolution: resolution of the response surface in degrees (see response_surface.py), ground shade and self-shade of the 15 minute results are interpolated from the table instead of calculated for every timestep, None: calculation for every timestep
+        - response_surface_directory: directory in which the response surfaces are stored
+        - memo_tolerance: tolerance (in degrees) of the shade memo (see shade_memo.py), ground shade and shaded grid points are calculated once for every rounded sun direction and reused for all timesteps of the process, None: calculation for every timestep
+        - memo_size: maximum number of entries of the shade memo
+        - ephemeris_directory: directory of the solar position cache (see ephemeris_cache.py), None: solar position is calculated for every unit
+        - shared_buffer_handles: solar tables and grid coordinates published as shared memory by run_sweep (see publish_shared_buffers), None: calculated in the unit
+        - threads: number of threads which calculate the days of the unit concurrently (sharing the solar table and the geometry), 1: days are calculated one after another
+        - drift_tolerance: maximum difference (in degrees) between the sun direction at long and at the reference longitude for which the results of the reference longitude are reused (see expand_longitudes)
+        - day_stride: only every day_stride-th day of the unit (and its last day) is calculated, the other days are interpolated (see day_sampling.py), None: every day is calculated
+        - day_tolerance: largest change of the ground shade (in %-points) between calculated days, days in between are calculated until the change is smaller (adaptive sampling), None: only every day_stride-th day
+        - mirror_tolerance: maximum difference (in degrees) between the sun direction of a day and of its mirror day on the other side of the solstice for which the results of the mirror day are reused (see solstice_mirror.py), None: every day is calculated
+        - symmetry_tolerance: maximum difference (in degrees) between the sun direction of an afternoon timestep mirrored at the N/S plane and of a morning timestep for which the mirrored results of the morning timestep are reused (only for systems which are mirror symmetric in the field, see noon_symmetry.py), None: every timestep is calculated
+        - incremental_grid: if True, the grids of the shapely engine only test the grid points where the shade changed since the previous timestep (see shade_grid.update), results are unchanged
+        - mirror_records: results of the mirror days shared by the work units of a sweep (see solstice_mirror.mirror_records, created by run_sweep), None: mirror days are calculated for this unit only
+        - reference, recorded: results of the reference longitude (see expand_longitudes: recorded is filled in the run at the reference longitude and passed as reference to the runs at the other longitudes)
+
+        Returns:
+        - lines_15min: result lines (lat, long, month, day, hour, minute, shaded area, self-shaded panel area, proximate azimuth, apparent elevation)
+        - lines_percent_of_time_shaded: result lines (lat, long, month, day, share of points in every percentage category)
+    '''
+
+    # system, location, settings and solar position of the unit (shared by all days)
+    context = day_evaluation.unit_context(geometry, lat, long, year, first_day, last_day, field_width, field_length, PV_angle_EW, PV_angle_NS, grid_spacing, shade_engine, tilt_resolution, incremental_grid, shared_buffer_handles, ephemeris_directory)
+    solar_table, PV_angles_EW = context.solar_table, context.PV_angles_EW
+
+    # sky patches: ground shade and shaded grid points are calculated once for every occupied sky patch
+    if sky_patch_size != None:
+        patch_index, patch_azimuth_rad, patch_elevation_rad, occupancy = sky_patches.assign_sky_patches(solar_table['azimuth_rad'], solar_table['elevation_rad'], context.daylight_windows, sky_patch_size)
+        patch_ground_shade, patch_footprints = sky_patches.evaluate_sky_patches(geometry, patch_azimuth_rad, patch_elevation_rad, PV_angle_EW, PV_angle_NS, field_width, field_length, grid_spacing, shade_engine, tilt_resolution)
+
+    # ground shade for every timestep if it is not calculated in the loop (None: exact calculation for every timestep)
+    ground_shade = None
+    if sky_patch_size != None:
+        ground_shade = patch_ground_shade[patch_index]
+
+    # response surface: ground shade and self-shade are interpolated for all timesteps at once (the shaded grid points still need the position of the shade)
+    if response_surface_resolution != None:
+        nodes, ground_shade_table, self_shade_table = response_surface.load_response_surface(response_surface_directory, geometry, PV_angle_EW, PV_angle_NS, field_width, field_length, response_surface_resolution, shade_engine, tilt_resolution)
+        ground_shade = response_surface.interpolate(nodes, ground_shade_table, solar_table['angle_in_plane_EW'], solar_table['angle_in_plane_NS'])
+
+    # strategies which provide the ground shade and the shaded grid points of every daylight timestep, in order of preference (see day_evaluation.py): the last strategy calculates all timesteps which cannot be reused
+    if sky_patch_size != None:
+        strategies = [day_evaluation.sky_patch_shade(ground_shade, patch_index, patch_footprints)]
+    elif ground_shade is not None:
+        strategies = [day_evaluation.interpolated_shade(ground_shade)]
+    else:
+        exact = day_evaluation.exact_shade(get_shade_memo(memo_tolerance, memo_size) if memo_tolerance != None else None)
+        strategies = [exact]
+
+        # solstice mirror: every day reuses ground shade and shaded grid points of its mirror day (days with rising declination are their own mirror day), so results do not depend on the order of the units
+        if mirror_tolerance != None and reference == None:
+            strategies.insert(0, day_evaluation.mirror_shade(context, mirror_tolerance, mirror_records if mirror_records != None else solstice_mirror.mirror_records(), exact))
+
+        # noon symmetry: afternoon timesteps reuse the mirrored ground shade and shaded grid points of the morning timestep with the mirrored sun direction
+        if symmetry_tolerance != None and geometry.is_mirror_symmetric(PV_angle_EW, PV_angle_NS, field_width, context.grid_coordinates[0]):
+            strategies.insert(0, day_evaluation.symmetry_shade(symmetry_tolerance))
+        elif symmetry_tolerance != None:
+            print("System at lat=", lat, " is not mirror symmetric about the N/S axis of the field, all timesteps of days ", first_day, "-", last_day, " are calculated.")
+
+        # at the reference longitude, ground shade and shaded grid points of every timestep are recorded for the other longitudes
+        if recorded != None and day_stride == None:
+            strategies.insert(0, day_evaluation.reference_recorder(context, recorded))
+
+    # timesteps which are reused from the reference longitude (only possible if its ground shade and shaded grid points were recorded)
+    if reference != None and 'footprints' in reference:
+        strategies.insert(0, day_evaluation.reference_shade(context, reference, drift_tolerance))
+
+    number_of_days = last_day - first_day
+
+    # days are calculated one after another or in a thread pool (results are collected in the order of the days)
+    if day_stride == None:
+        calculated_days = day_evaluation.evaluate_days(context, range(number_of_days), strategies, percentage_intervals, threads)
+        day_results = [calculated_days[day_of_unit] for day_of_unit in range(number_of_days)]
+    else:
+        # day sampling: every day_stride-th day is calculated (refined where the shade changes fast), the other days are interpolated
+        calculated_days = day_evaluation.evaluate_days(context, day_sampling.sample_days(number_of_days, day_stride), strategies, percentage_intervals, threads)
+
+        if day_tolerance != None:
+            additional_days = day_sampling.refine_days(calculated_days, day_tolerance)
+
+            while len(additional_days) > 0:
+                calculated_days.update(day_evaluation.evaluate_days(context, additional_days, strategies, percentage_intervals, threads))
+                additional_days = day_sampling.refine_days(calculated_days, day_tolerance)
+
+        sampled_days = sorted(calculated_days)
+        day_results = []
+        interpolated_days = {}
+
+        for day_before, day_after in zip(sampled_days[:-1], sampled_days[1:]):
+            day_results.append(calculated_days[day_before])
+
+            for day_of_unit in range(day_before + 1, day_after):
+                interpolated_days[day_of_unit] = day_evaluation.interpolate_day(context, day_of_unit, day_before, calculated_days[day_before], day_after, calculated_days[day_after], strategies, percentage_intervals)
+                day_results.append(interpolated_days[day_of_unit])
+
+        day_results.append(calculated_days[sampled_days[-1]])
+
+        # validation: a subset of the interpolated days is calculated exactly
+        if validation_stride != None:
+            validated_days = sorted(interpolated_days)[::validation_stride]
+            deviations = [day_sampling.day_deviation(interpolated_days[day_of_unit], exact_result) for day_of_unit, exact_result in day_evaluation.evaluate_days(context, validated_days, strategies, percentage_intervals, threads).items()]
+
+            print("Day sampling at lat=", lat, ", long=", long, ", days ", first_day, "-", last_day, ": ", len(sampled_days), " of ", number_of_days, " days calculated, maximum deviation of the ground shade = ", max([deviation[0] for deviation in deviations], default=0.0), " %-points, of the percentage of time shaded = ", max([deviation[1] for deviation in deviations], default=0.0), " (", len(validated_days), " interpolated days validated).")
+
+    lines_15min = []
+    lines_percent_of_time_shaded = []
+
+    # self-shading is calculated for all daylight timesteps of the unit in one call (line index and timestep of every daylight timestep)
+    daylight_line_indices = []
+    daylight_timesteps = []
+
+    for day_of_unit, (new_lines, daylight_steps, new_line) in enumerate(day_results):
+        for step in daylight_steps:
+            daylight_line_indices.append(len(lines_15min) + step)
+            daylight_timesteps.append(day_of_unit * timesteps_per_day + step)
+
+        lines_15min += new_lines
+
+        if new_line != None:
+            lines_percent_of_time_shaded.append(new_line)
+
+    # self-shading for all daylight timesteps (in % of the total panel area)
+    if response_surface_resolution != None:
+        self_shade_percentage_of_total_panel_area = response_surface.interpolate(nodes, self_shade_table, solar_table['angle_in_plane_EW'][daylight_timesteps], solar_table['angle_in_plane_NS'][daylight_timesteps])
+    else:
+        self_shade_total = geometry.calculate_self_shade_array(solar_table['angle_in_plane_EW'][daylight_timesteps], solar_table['angle_in_plane_NS'][daylight_timesteps], solar_table['azimuth_rad'][daylight_timesteps], PV_angles_EW[daylight_timesteps], PV_angle_NS)
+        self_shade_percentage_of_total_panel_area = (self_shade_total / (geometry.number_of_panels_EW * geometry.number_of_panels_NS * geometry.PV_width * geometry.PV_length)) * 100
+
+    for line_index, self_shade_percentage in zip(daylight_line_indices, self_shade_percentage_of_total_panel_area.tolist()):
+        lines_15min[line_index][7] = self_shade_percentage
+
+    for strategy in strategies:
+        strategy.report(context)
+
+    # error estimate of the response surface or sky patch calculation (comparison with the exact calculation for a sample of daylight timesteps)
+    if response_surface_resolution != None and validation_stride != None:
+        self_shade = np.zeros(len(solar_table['angle_in_plane_EW']))
+        self_shade[daylight_timesteps] = self_shade_percentage_of_total_panel_area
+        error = response_surface.estimate_error(geometry, solar_table, PV_angles_EW, PV_angle_NS, daylight_timesteps[::validation_stride], ground_shade, self_shade, field_width, field_length, shade_engine, tilt_resolution)
+        print("Response surface at lat=", lat, ", days ", first_day, "-", last_day, ": estimated error bound of the ground shade = ", error['max_ground_shade_error'], " %-points (mean error = ", error['mean_ground_shade_error'], " %-points), of the self-shade = ", error['max_self_shade_error'], " %-points (mean error = ", error['mean_self_shade_error'], " %-points), ", error['validated_timesteps'], " timesteps validated.")
+    elif sky_patch_size != None and validation_stride != None:
+        error = sky_patches.estimate_error(geometry, solar_table, PV_angles_EW, PV_angle_NS, daylight_timesteps[::validation_stride], patch_index, patch_ground_shade, patch_footprints, field_width, field_length, grid_spacing, shade_engine, tilt_resolution)
+        print("Sky patches at lat=", lat, ", days ", first_day, "-", last_day, ": ", len(occupancy), " patches for ", len(daylight_timesteps), " daylight timesteps, estimated error bound of the ground shade = ", error['max_ground_shade_error'], " %-points (mean error = ", error['mean_ground_shade_error'], " %-points, mean share of grid points classified differently = ", error['mean_footprint_error'], ", ", error['validated_timesteps'], " timesteps validated).")
+
+    return lines_15min, lines_percent_of_time_shaded
+
+def expand_longitudes(unit_parameters: dict, longs):
+    '''Calculates a work unit at several longitudes (see longitude_expansion.py): the unit is calculated at the longitude of unit_parameters (reference longitude) and its results are reused for timesteps at the other longitudes with (nearly) the same sun direction.
+
+        Parameters:
+        - unit_parameters: parameters of simulate_unit (long is the reference longitude, drift_tolerance the tolerance for reusing its results)
+        - longs: longitudes (the reference longitude is skipped if it is included)
+
+        Returns: lines_15min, lines_percent_of_time_shaded (see simulate_unit, for all longitudes one after another)'''
+
+    recorded = {}
+    lines_15min, lines_percent_of_time_shaded = simulate_unit(**unit_parameters, recorded=recorded)
+
+    for long in longs:
+        if long != unit_parameters['long']:
+            # shared memory only holds the solar tables of the reference longitude
+            new_lines_15min, new_lines_percent_of_time_shaded = simulate_unit(**dict(unit_parameters, long=long, shared_buffer_handles=None), reference=recorded)
+            lines_15min += new_lines_15min
+            lines_percent_of_time_shaded += new_lines_percent_of_time_shaded
+
+    return lines_15min, lines_percent_of_time_shaded
+
+def run_unit(work_unit, simulation_parameters: dict):
+    '''Calculates one work unit of run_sweep (at all longitudes if simulation_parameters contains longs, see expand_longitudes).
+
+        Parameters: work_unit (lat, first_day, last_day, PV_angle_NS), simulation_parameters (see run_sweep)
+
+        Returns: lines_15min, lines_percent_of_time_shaded (see simulate_unit)'''
+
+    lat, first_day, last_day, PV_angle_NS = work_unit
+    unit_parameters = dict(simulation_parameters, lat=lat, first_day=first_day, last_day=last_day, PV_angle_NS=PV_angle_NS)
+    longs = unit_parameters.pop('longs', None)
+
+    if longs != None:
+        return expand_longitudes(unit_parameters, longs)
+
+    return simulate_unit(**unit_parameters)
+
+def publish_shared_buffers(lats, long, year, field_width, field_length, grid_spacing=1, ephemeris_directory=None):
+    '''Publishes the solar tables (whole year) of all latitudes and the grid coordinates as shared memory for the worker processes of run_sweep (see shared_buffers.py).
+
+        Parameters: lats, long, year, field_width, field_length, grid_spacing, ephemeris_directory (solar tables are read from the cache if given)
+
+        Returns: handles (passed to simulate_unit as shared_buffer_handles), segments (released after the sweep)'''
+
+    arrays = {}
+
+    for lat in lats:
+        if ephemeris_directory != None:
+            solar_table = ephemeris_cache.load_solar_table(ephemeris_directory, lat, long, year)
+        else:
+            solar_table = solarposition.calculate_solar_table(lat, long, solarposition.generate_timesteps(year))
+
+        for column in ephemeris_cache.solar_table_columns:
+            arrays[('solar_table', lat, column)] = solar_table[column]
+
+    grid = shade_grid.shade_grid(field_width, field_length, grid_spacing)
+    for name in ('x_coords', 'y_coords', 'grid_x', 'grid_y'):
+        arrays[name] = getattr(grid, name)
+
+    return shared_buffers.publish(arrays)
+
+def run_sweep(work_units, simulation_parameters, write_results, processes=1, store_results=None, finished_results=None):
+    '''Runs all work units (serially or in a process pool) and hands the results to write_results in deterministic order (as given in work_units), so output files are identical to a serial run.
+        In a process pool, units are submitted in order of their expected cost (most expensive first) so the workload is balanced between processes. Solar tables and grid coordinates are calculated once and shared with the workers (see publish_shared_buffers).
+        With the solstice mirror, the results of the mirror days are kept in one mirror_records object for the sweep (see solstice_mirror.py), so every mirror day is calculated once; in a process pool, units with mirrored days are submitted after the units which calculate their mirror days (see mirror_dependencies).
+
+        Parameters:
+        - work_units: list of (lat, first_day, last_day, PV_angle_NS) tuples
+        - simulation_parameters: dictionary with the remaining parameters of simulate_unit and the further longitudes longs (see expand_longitudes): geometry, long, year, field_width, field_length, percentage_intervals, shade_engine, grid_spacing, PV_angle_EW, tilt_resolution, sky_patch_size, validation_stride, response_surface_resolution, response_surface_directory, memo_tolerance, memo_size, ephemeris_directory, threads, longs, drift_tolerance, day_stride, day_tolerance, mirror_tolerance, symmetry_tolerance, incremental_grid
+        - write_results: function called with (work_unit, lines_15min, lines_percent_of_time_shaded) for every unit
+        - processes: number of processes (1: serial run without process pool)
+        - store_results: function called with (work_unit, lines_15min, lines_percent_of_time_shaded) as soon as a unit is finished, also while the results of previous units are still missing (e.g. checkpoint.append_journal), default: None
+        - finished_results: results of units which were finished by an interrupted run (dictionary work_unit: (lines_15min, lines_percent_of_time_shaded), see checkpoint.read_journal), they are handed to write_results in order but not calculated again
+
+        Returns: -'''
+
+    # records of the mirror days are removed when all units of their latitude are finished
+    records = None
+    if simulation_parameters.get('mirror_tolerance') != None:
+        records = solstice_mirror.mirror_records()
+        simulation_parameters = dict(simulation_parameters, mirror_records=records)
+    if finished_results == None:
+        finished_results = {}
+    remaining_units = collections.Counter(work_unit[0] for work_unit in work_units if work_unit not in finished_results)
+
+    if processes == 1:
+        for work_unit in work_units:
+            if work_unit in finished_results:
+                write_results(work_unit, *finished_results[work_unit])
+                continue
+
+            lines_15min, lines_percent_of_time_shaded = run_unit(work_unit, simulation_parameters)
+            if store_results != None:
+                store_results(work_unit, lines_15min, lines_percent_of_time_shaded)
+            write_results(work_unit, lines_15min, lines_percent_of_time_shaded)
+
+            remaining_units[work_unit[0]] -= 1
+            if records != None and remaining_units[work_unit[0]] == 0:
+                records.release(work_unit[0])
+        return
+
+    # most expensive units first (long summer days at high latitudes), finished units are not submitted
+    submission_order = sorted((k for k in range(len(work_units)) if work_units[k] not in finished_results), key=lambda k: estimate_unit_cost(*work_units[k][:3]), reverse=True)
+
+    # solar tables and grid coordinates are published once, workers attach to them by name
+    handles, segments = publish_shared_buffers(sorted(set(work_unit[0] for work_unit in work_units)), simulation_parameters['long'], simulation_parameters['year'], simulation_parameters['field_width'], simulation_parameters['field_length'], simulation_parameters.get('grid_spacing', 1), simulation_parameters.get('ephemeris_directory'))
+
+    try:
+        run_pool(work_units, submission_order, dict(simulation_parameters, shared_buffer_handles=handles), write_results, processes, store_results, finished_results)
+    finally:
+        shared_buffers.release(segments)
+
+def mirror_dependencies(work_units, year):
+    '''Mirror days which every work unit needs from other work units (solstice mirror, see solstice_mirror.py) and the work units which calculate them.
+
+        Parameters: work_units (see run_sweep), year
+
+        Returns:
+        - needed_days: days of the year (0-based) which are mirror days of the unit and lie outside of it, for every unit (sets)
+        - dependencies: indices of the work units which contain these days, for every unit (sets)'''
+
+    mirror = solstice_mirror.mirror_days(len(solarposition.generate_timesteps(year)) // timesteps_per_day)
+
+    # work unit which contains every day of every latitude
+    containing_unit = {(lat, day): k for k, (lat, first_day, last_day, PV_angle_NS) in enumerate(work_units) for day in range(first_day, last_day)}
+
+    needed_days, dependencies = [], []
+    for lat, first_day, last_day, PV_angle_NS in work_units:
+        needed_days.append(set(mirror[first_day:last_day].tolist()) - set(range(first_day, last_day)))
+        dependencies.append({containing_unit[(lat, day)] for day in needed_days[-1] if (lat, day) in containing_unit})
+
+    return needed_days, dependencies
+
+def run_pool_unit(work_unit, simulation_parameters: dict):
+    '''Calculates one work unit in a worker process of run_pool.
+
+        Parameters: see run_unit
+
+        Returns: lines_15min, lines_percent_of_time_shaded, records of the mirror days calculated by the unit (dictionary, see solstice_mirror.mirror_records.new_records)'''
+
+    lines_15min, lines_percent_of_time_shaded = run_unit(work_unit, simulation_parameters)
+    records = simulation_parameters.get('mirror_records')
+
+    return lines_15min, lines_percent_of_time_shaded, records.new_records() if records != None else {}
+
+def run_pool(work_units, submission_order, simulation_parameters, write_results, processes, store_results, previous_results):
+    '''Runs the work units in a process pool (see run_sweep).'''
+
+    # with the solstice mirror, every unit receives the records of the mirror days it needs from other units (as a copy), calculated records are returned to the main process
+    records = simulation_parameters.get('mirror_records')
+    if records != None:
+        needed_days, dependencies = mirror_dependencies(work_units, simulation_parameters['year'])
+    else:
+        needed_days, dependencies = [set() for work_unit in work_units], [set() for work_unit in work_units]
+    remaining_units = collections.Counter(work_units[k][0] for k in submission_order)
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=processes) as executor:
+        pending = list(submission_order)
+        running = {}
+        finished_results = {k: previous_results[work_unit] for k, work_unit in enumerate(work_units) if work_unit in previous_results}
+        finished_units = set(finished_results)
+        next_unit = 0
+
+        while next_unit < len(work_units):
+            # units are submitted (in submission order) as soon as the units which calculate their mirror days are finished, the next unit is submitted anyway if no unit is running (cyclic dependencies)
+            ready = [k for k in pending if dependencies[k] <= finished_units]
+            if len(ready) == 0 and len(running) == 0:
+                ready = pending[:1]
+
+            for k in ready:
+                pending.remove(k)
+                lat, first_day, last_day, PV_angle_NS = work_units[k]
+                unit_parameters = simulation_parameters if records == None else dict(simulation_parameters, mirror_records=records.subset([(lat, simulation_parameters['long'], PV_angle_NS, day) for day in needed_days[k]]))
+                running[executor.submit(run_pool_unit, work_units[k], unit_parameters)] = k
+
+            for future in concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)[0] if len(running) > 0 else []:
+                k = running.pop(future)
+                lines_15min, lines_percent_of_time_shaded, new_records = future.result()
+                if store_results != None:
+                    store_results(work_units[k], lines_15min, lines_percent_of_time_shaded)
+                finished_results[k] = (lines_15min, lines_percent_of_time_shaded)
+                finished_units.add(k)
+
+                remaining_units[work_units[k][0]] -= 1
+                if records != None:
+                    records.update(new_records)
+                    if remaining_units[work_units[k][0]] == 0:
+                        records.release(work_units[k][0])
+
+            # results are written as soon as all previous units (in work_units order) are finished
+            while next_unit in finished_results:
+                write_results(work_units[next_unit], *finished_results.pop(next_unit))
+                next_unit += 1
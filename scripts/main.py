@@ -1,11 +1,11 @@
-import csv
-import datetime
-import math
+import argparse
 import pandas as pd
 
+import checkpoint
+import longitude_expansion
 import pv_system
-import solarposition
-import shade_grid
+import results
+import sweep
 
 # current system specifications (rows/collums of panels are approximated as one large panel where possible)
 
@@ -26,98 +26,135 @@ field_width = 80
 # field dimension in N/S direction (in m)
 field_length = 80
 
+# engine used for the ground shading calculation ("shapely": reference, "analytic": exact union area of the shadow lattice)
+shade_engine = "shapely"
+
 # import lat dependent tilts for standard system
 lat_depentent_tilts = pd.read_csv("tilt_by_lat.csv")
 
 # specifications for results file
-columns=['lat', 'long', 'month', 'day', 'hour', 'minute', 'shaded area (in %)', 'self-shaded panel area (in ' + '%' + ' of total panel area)', 'proximate azimuth of sun', 'apparent elevation of sun']
+columns_15min=['lat', 'long', 'month', 'day', 'hour', 'minute', 'shaded area (in %)', 'self-shaded panel area (in ' + '%' + ' of total panel area)', 'proximate azimuth of sun', 'apparent elevation of sun']
 filename = str(system.get_name()) + '_shade_percent_15min.csv'
-with open(filename, 'a') as f_object:
-    writer_object = csv.writer(f_object)
-    writer_object.writerow(columns)
-    f_object.close()
 
 # specifications for percentage of time shaded file - no horizons considered for this (just for comparing systems)
-columns=['lat', 'long', 'month', 'day']
+columns_percent_of_time_shaded=['lat', 'long', 'month', 'day']
 percentage_intervals = 5
 
 for i in range(1, percentage_intervals + 1):
     new_column = str(round((i/percentage_intervals - 1/percentage_intervals) * 100, 1)) + " - " + str(round((i/percentage_intervals) * 100, 1)) + " %"
-    columns.append(new_column)
+    columns_percent_of_time_shaded.append(new_column)
 
 filename_percent_of_time_shaded = str(system.get_name()) + '_percent_of_time_shaded.csv'
 
-with open(filename_percent_of_time_shaded, 'a') as f_object:
-    writer_object = csv.writer(f_object)
-    writer_object.writerow(columns)
-    f_object.close()
-
-for lat in range(34, 72):
-    # change panel tilt in optimal system depending on lat
-    if system.system_type == "standard":
-        system.PV_angle_NS = lat_depentent_tilts["tilt (europe)"].where(lat_depentent_tilts["lat"] == int(lat)).dropna().values[0]
-        
-    for year in range(2000, 2001):
-        for month in range(1, 13):
-            for day in range(1, 32):
-
-                try:
-                    datetime.datetime(year=year, month=month, day=day)
-                    grid = shade_grid.shade_grid(field_width, field_length)
-
-                    for hour in range(0,24):
-
-                        for minute in range(0,60,15):
-                            
-                            azimuth_rad, elevation_rad = solarposition.calculate_azimuth_and_elevation_rad(year, month, day, hour, minute, long, lat)
-                            
-                            if azimuth_rad < 0 or azimuth_rad > 2*math.pi:
-                                raise invalid_azimuth
-                            
-                            # position of pv panel needs to be readjusted with each time step for tracking systems
-                            if system.system_type == 'tracking':
-                                system.tracking_repositioning(year, month, day, hour, minute, long, lat)
-                            
-                            if system.system_type == 'backtracking':
-                                system.backtracking_repositioning(year, month, day, hour, minute, long, lat)
-                                
-                            angle_in_plane_EW, angle_in_plane_NS = solarposition.calculate_solarposition(year, month, day, hour, minute, long, lat)
-
-                            proximate_azimuth, apparent_elevation = solarposition.correct_solarposition(year, month, day, hour, minute, long, lat)
-                            
-                            # check if sun is over or under horizon in any case (< 0°), shade calculation is skipped in that case (shaded area and self-shade area are both set to 100%)
-                            if apparent_elevation >= 0:
-                                intersection_percent, self_shade_percentage_of_total_panel_area = system.calculate_shade(angle_in_plane_EW, angle_in_plane_NS, field_width, field_length, azimuth_rad, elevation_rad, grid)
-                            else:
-                                intersection_percent = 100
-                                self_shade_percentage_of_total_panel_area = 100
-
-                            # adding line with results to file
-                            new_line = [lat, long, round(month), round(day), round(hour), round(minute), intersection_percent, self_shade_percentage_of_total_panel_area, proximate_azimuth, apparent_elevation] #angle_in_plane_NS, angle_in_plane_EW]
-                            
-                            with open(filename, 'a') as f_object:
-                                writer_object = csv.writer(f_object)
-                                writer_object.writerow(new_line)
-                                f_object.close()
-
-                    percentage_steps, percentage_counts_dict = grid.evaluate(percentage_intervals)
-                    
-                    # adding line to percentage of time shaded file
-                    new_line = [lat, long, round(month), round(day)]
-                    
-                    for bin in percentage_counts_dict:
-                        new_line.append(percentage_counts_dict[bin])
-
-                    with open(filename_percent_of_time_shaded, 'a') as f_object:
-                                writer_object = csv.writer(f_object)
-                                writer_object.writerow(new_line)
-                                f_object.close()
-
-                    grid.reset()
-                        
-                except ValueError:
-                    print("Error at lat=", lat, ", year=", year, ", month=", month, "day=", day)
-                    pass
-                except Exception as invalid_azimuth:
-                    print("Invalid azimuth calculated at lat=", lat, ", year=", year, ", month=", month, "day=", day)
-                    pass
+# checkpoint manifest (completed days for every latitude and size of the results files), written whenever the results are written to the results files (see --flush-size)
+filename_manifest = str(system.get_name()) + '_checkpoint.json'
+# journal of the finished work units which are not written to the results files yet, appended after every finished unit (see checkpoint.append_journal)
+filename_journal = str(system.get_name()) + '_checkpoint_results.pkl'
+
+# grid for percentage of time shaded calculations (counts are reset for every day), with the analytic engine shadows are rasterized directly into the grid
+grid_spacing = 1
+
+# latitude sweep and year
+lats = range(34, 72)
+year = 2000
+
+# parallel runs: the sweep is split into work units of (lat, range of days), which are distributed over a process pool
+parser = argparse.ArgumentParser(description="Calculates ground- and self-shading of a PV system for a latitude sweep.")
+parser.add_argument("--processes", type=int, default=1, help="number of worker processes (default: 1, serial run)")
+parser.add_argument("--days-per-unit", type=int, default=31, help="number of days per work unit (default: 31)")
+parser.add_argument("--flush-size", type=int, default=100000, help="number of buffered result lines after which they are written to the results files (default: 100000)")
+parser.add_argument("--tilt-resolution", type=float, default=None, help="resolution (in degrees) to which tracker tilts are rounded so the tilt dependent panel geometry can be cached (default: exact tilts)")
+parser.add_argument("--sky-patch-size", type=float, default=None, help="size of the sky patches (azimuth x elevation, in degrees): ground shade and percentage of time shaded are calculated once per sky patch instead of for every timestep (default: calculation for every timestep)")
+parser.add_argument("--validation-stride", type=int, default=50, help="with sky patches, response surfaces or day sampling, every n-th daylight timestep (interpolated day) is calculated exactly to estimate the error (default: 50)")
+parser.add_argument("--response-surface-resolution", type=float, default=None, help="resolution (in degrees) of the response surface: ground shade and self-shade of the 15 minute results are interpolated from a table calculated once per system (default: calculation for every timestep)")
+parser.add_argument("--response-surface-directory", default="response_surfaces", help="directory in which response surfaces are stored and reused by later runs (default: response_surfaces)")
+parser.add_argument("--memo-tolerance", type=float, default=None, help="tolerance (in degrees) to which sun angles and tilts are rounded so ground shade and shaded grid points can be reused for similar sun positions (default: calculation for every timestep)")
+parser.add_argument("--memo-size", type=int, default=20000, help="maximum number of entries of the shade memo per process, least recently used entries are removed (default: 20000)")
+parser.add_argument("--ephemeris-directory", default=None, help="directory in which solar positions are cached (one memory-mapped file per latitude and year, shared by later runs, other systems and parallel workers), e.g. ephemeris (default: no cache)")
+parser.add_argument("--threads", type=int, default=1, help="number of threads per process which calculate the days of a work unit concurrently, sharing the solar table and the system geometry (for nodes without memory for a process pool, default: 1)")
+parser.add_argument("--longs", type=float, nargs="+", default=None, help="further longitudes (in degrees): every work unit is calculated at long and its results are reused at the other longitudes for timesteps with (nearly) the same sun direction, shifted by 4 minutes per degree (default: only long)")
+parser.add_argument("--drift-tolerance", type=float, default=0.25, help="maximum difference (in degrees) between the sun directions for which results are reused at another longitude (default: 0.25)")
+parser.add_argument("--day-stride", type=int, default=None, help="only every n-th day of a work unit (and its last day) is calculated, the days in between are interpolated; with validation, every n-th interpolated day (see --validation-stride) is calculated exactly to report the deviation (default: every day is calculated)")
+parser.add_argument("--day-tolerance", type=float, default=None, help="with --day-stride, days between calculated days are calculated as well until the ground shade of neighbouring calculated days differs by less than this tolerance (in %%-points), so days are sampled densest where the shade changes fastest (default: fixed stride)")
+parser.add_argument("--mirror-tolerance", type=float, default=None, help="days with falling declination (June to December solstice) reuse ground shade and shaded grid points of the day with the same declination on the other side of the solstice for timesteps whose sun directions differ by less than this tolerance (in degrees), shifted by the difference of the equation of time (default: every day is calculated)")
+parser.add_argument("--symmetry-tolerance", type=float, default=None, help="for systems which are mirror symmetric about the N/S axis of the field (standard, vertical and overhead systems without E/W tilt and tracking systems, with centred panel columns), afternoon timesteps reuse the mirrored ground shade and shaded grid points of the morning timestep whose sun direction differs by less than this tolerance (in degrees) from the mirrored sun direction (default: every timestep is calculated)")
+parser.add_argument("--incremental-grid", action="store_true", help="with the shapely engine, only grid points in the bands swept by the shadow edges since the previous timestep are tested for the percentage of time shaded, all other points keep their previous result (same results, faster for fine grids)")
+parser.add_argument("--resume", action="store_true", help="continue an interrupted run from its checkpoint: completed days are skipped, lines written after the checkpoint are removed from the results files and finished work units are taken from the journal, so only the units which were running when the run was interrupted are recalculated (at most --days-per-unit days per process)")
+parser.add_argument("--output-format", choices=["csv", "parquet", "feather", "npz"], default="csv", help="format of the results files (default: csv), binary formats are written as typed columns with one directory per latitude (parquet/feather need pyarrow, npz is used otherwise)")
+
+if __name__ == "__main__":
+    args = parser.parse_args()
+
+    # results can only be reused at longitudes which are shifted by (nearly) whole timesteps from the reference longitude
+    for other_long in args.longs if args.longs != None else []:
+        if longitude_expansion.offset_residual(other_long, long) > args.drift_tolerance:
+            print("Warning: long=", other_long, " is shifted by ", round(longitude_expansion.offset_residual(other_long, long), 3), "° from a whole number of timesteps (3.75° each) relative to long=", long, ", more than the drift tolerance of ", args.drift_tolerance, "°, so (nearly) all of its timesteps are calculated.")
+
+    # resuming is only possible for a run with the same settings
+    run_settings = {'system': system.get_name(), 'long': long, 'year': year, 'lats': list(lats), 'field_width': field_width, 'field_length': field_length, 'shade_engine': shade_engine, 'grid_spacing': grid_spacing, 'percentage_intervals': percentage_intervals, 'tilt_resolution': args.tilt_resolution, 'sky_patch_size': args.sky_patch_size, 'response_surface_resolution': args.response_surface_resolution, 'memo_tolerance': args.memo_tolerance, 'longs': args.longs, 'drift_tolerance': args.drift_tolerance, 'day_stride': args.day_stride, 'day_tolerance': args.day_tolerance, 'mirror_tolerance': args.mirror_tolerance, 'symmetry_tolerance': args.symmetry_tolerance, 'output_format': args.output_format}
+
+    manifest = None
+    if args.resume:
+        manifest = checkpoint.read_manifest(filename_manifest)
+        if manifest == None:
+            print("No checkpoint found, starting a new run.")
+        else:
+            checkpoint.check_run_settings(manifest, run_settings)
+
+    completed_days = manifest['completed_days'] if manifest != None else {}
+    positions = manifest['positions'] if manifest != None else {'15min': None, 'percent_of_time_shaded': None}
+
+    # units finished by the interrupted run which are not written to the results files yet (the journal of an earlier run is removed for a new run)
+    finished_results = checkpoint.read_journal(filename_journal, completed_days) if manifest != None else {}
+    checkpoint.write_journal(filename_journal, finished_results)
+
+    # results are buffered and written in large blocks
+    sink_15min = results.create_sink(args.output_format, filename, columns_15min, args.flush_size, positions['15min'])
+    sink_percent_of_time_shaded = results.create_sink(args.output_format, filename_percent_of_time_shaded, columns_percent_of_time_shaded, args.flush_size, positions['percent_of_time_shaded'])
+
+    def write_checkpoint():
+        # all lines of the completed days are written before the checkpoint is updated
+        sink_15min.flush()
+        sink_percent_of_time_shaded.flush()
+        checkpoint.write_manifest(filename_manifest, run_settings, completed_days, {'15min': sink_15min.position(), 'percent_of_time_shaded': sink_percent_of_time_shaded.position()})
+        # units written to the results files are removed from the journal
+        checkpoint.write_journal(filename_journal, checkpoint.read_journal(filename_journal, completed_days))
+
+    def store_results(work_unit, lines_15min, lines_percent_of_time_shaded):
+        # every finished unit is kept in the journal until it is written to the results files, independent of --flush-size and of the order in which units finish
+        checkpoint.append_journal(filename_journal, work_unit, lines_15min, lines_percent_of_time_shaded)
+
+    def write_results(work_unit, lines_15min, lines_percent_of_time_shaded):
+        flushed = sink_15min.write(lines_15min)
+        flushed = sink_percent_of_time_shaded.write(lines_percent_of_time_shaded) or flushed
+
+        lat, first_day, last_day, PV_angle_NS = work_unit
+        checkpoint.mark_completed(completed_days, lat, first_day, last_day)
+
+        # the manifest is only updated when a sink has written its buffer (the other sink is flushed as well), so lines are still written in blocks of --flush-size (the unit is kept in the journal until then)
+        if flushed:
+            write_checkpoint()
+
+    write_checkpoint()
+
+    # work units in lat/day order, results are written in this order (also for parallel runs)
+    work_units = []
+    for lat, first_day, last_day in sweep.generate_work_units(lats, year, args.days_per_unit):
+        # change panel tilt in optimal system depending on lat
+        if system.system_type == "standard":
+            PV_angle_NS = lat_depentent_tilts["tilt (europe)"].where(lat_depentent_tilts["lat"] == int(lat)).dropna().values[0]
+        else:
+            PV_angle_NS = system.PV_angle_NS
+        work_units.append((lat, first_day, last_day, PV_angle_NS))
+
+    # completed days of an interrupted run are skipped
+    work_units = checkpoint.remaining_work_units(work_units, completed_days)
+
+    simulation_parameters = {'geometry': system.geometry, 'PV_angle_EW': system.PV_angle_EW, 'long': long, 'year': year, 'field_width': field_width, 'field_length': field_length, 'percentage_intervals': percentage_intervals, 'shade_engine': shade_engine, 'grid_spacing': grid_spacing, 'tilt_resolution': args.tilt_resolution, 'sky_patch_size': args.sky_patch_size, 'validation_stride': args.validation_stride, 'response_surface_resolution': args.response_surface_resolution, 'response_surface_directory': args.response_surface_directory, 'memo_tolerance': args.memo_tolerance, 'memo_size': args.memo_size, 'ephemeris_directory': args.ephemeris_directory, 'threads': args.threads, 'longs': args.longs, 'drift_tolerance': args.drift_tolerance, 'day_stride': args.day_stride, 'day_tolerance': args.day_tolerance, 'mirror_tolerance': args.mirror_tolerance, 'symmetry_tolerance': args.symmetry_tolerance, 'incremental_grid': args.incremental_grid}
+
+    try:
+        sweep.run_sweep(work_units, simulation_parameters, write_results, args.processes, store_results, finished_results)
+        write_checkpoint()
+    finally:
+        sink_15min.close()
+        sink_percent_of_time_shaded.close()
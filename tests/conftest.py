@@ -0,0 +1,17 @@
+import pv_system
+
+import pytest
+
+# system and unit parameters shared by the tests of the sweep and its fast paths (tests change days and options with dict(unit_parameters, ...))
+
+@pytest.fixture()
+def geometry():
+    return pv_system.system_geometry("tracking", 1.4, 1.2, 80, 10, 80, 9, 1)
+
+@pytest.fixture()
+def unit_parameters(geometry: pv_system.system_geometry):
+    return {'geometry': geometry, 'lat': 50, 'long': 0, 'year': 2000, 'first_day': 100, 'last_day': 102, 'field_width': 80, 'field_length': 80, 'percentage_intervals': 5, 'shade_engine': "analytic"}
+
+@pytest.fixture()
+def simulation_parameters(geometry: pv_system.system_geometry):
+    return {'geometry': geometry, 'PV_angle_EW': 0, 'long': 0, 'year': 2000, 'field_width': 80, 'field_length': 80, 'percentage_intervals': 5, 'shade_engine': "analytic", 'grid_spacing': 1}
@@ -0,0 +1,96 @@
+import checkpoint
+import results
+
+import csv
+import os
+import pytest
+
+def test_mark_completed():
+    completed_days = {}
+    checkpoint.mark_completed(completed_days, 34, 31, 62)
+    checkpoint.mark_completed(completed_days, 34, 0, 31)
+    checkpoint.mark_completed(completed_days, 34, 93, 124)
+    checkpoint.mark_completed(completed_days, 35, 0, 1)
+
+    # adjacent ranges are merged
+    assert completed_days == {'34': [[0, 62], [93, 124]], '35': [[0, 1]]}
+
+def test_remaining_work_units():
+    work_units = [(34, 0, 31, None), (34, 31, 62, None), (34, 62, 93, None), (35, 0, 31, 30)]
+    completed_days = {'34': [[0, 40], [50, 60]]}
+
+    # completed units are skipped, partly completed units are split
+    assert checkpoint.remaining_work_units(work_units, completed_days) == [(34, 40, 50, None), (34, 60, 62, None), (34, 62, 93, None), (35, 0, 31, 30)]
+
+def test_manifest(tmp_path):
+    filename = str(tmp_path / "checkpoint.json")
+    assert checkpoint.read_manifest(filename) == None
+
+    checkpoint.write_manifest(filename, {'year': 2000}, {'34': [[0, 31]]}, {'15min': 120})
+    assert checkpoint.read_manifest(filename) == {'run_settings': {'year': 2000}, 'completed_days': {'34': [[0, 31]]}, 'positions': {'15min': 120}}
+
+def test_csv_sink_resume(tmp_path):
+    filename = tmp_path / "results.csv"
+    columns = ['lat', 'day']
+
+    sink = results.csv_sink(filename, columns)
+    sink.write([[34, 1]])
+    sink.flush()
+    position = sink.position()
+
+    # lines written after the checkpoint are removed when resuming
+    sink.write([[34, 2]])
+    sink.close()
+
+    sink = results.csv_sink(filename, columns, resume_position=position)
+    sink.write([[34, 3]])
+    sink.close()
+
+    with open(filename) as f_object:
+        assert list(csv.reader(f_object)) == [columns, ['34', '1'], ['34', '3']]
+
+def test_csv_sink_resume_without_results_file(tmp_path):
+    # a checkpoint without its results file cannot be resumed
+    with pytest.raises(SystemExit):
+        results.csv_sink(tmp_path / "results.csv", ['lat', 'day'], resume_position=20)
+
+def test_partitioned_sink_resume(tmp_path):
+    directory = str(tmp_path / "results")
+    columns = ['lat', 'day']
+
+    sink = results.partitioned_sink(directory, columns, "npz")
+    sink.write([[34, 1], [35, 1]])
+    sink.flush()
+    position = sink.position()
+
+    # files written after the checkpoint are removed when resuming
+    sink.write([[34, 2], [35, 2]])
+    sink.close()
+
+    sink = results.partitioned_sink(directory, columns, "npz", resume_position=position)
+    sink.write([[34, 3]])
+    sink.close()
+
+    assert list(results.read_partition(directory, 34)['day']) == [1, 3]
+    assert list(results.read_partition(directory, 35)['day']) == [1]
+
+def test_journal(tmp_path):
+    filename = str(tmp_path / "journal.pkl")
+    assert checkpoint.read_journal(filename, {}) == {}
+
+    # units are appended in the order in which they finish
+    checkpoint.append_journal(filename, (34, 31, 62, None), [[34, 31]], [])
+    checkpoint.append_journal(filename, (34, 0, 31, None), [[34, 0]], [[34, 0, 1.5]])
+    assert checkpoint.read_journal(filename, {}) == {(34, 31, 62, None): ([[34, 31]], []), (34, 0, 31, None): ([[34, 0]], [[34, 0, 1.5]])}
+
+    # units written to the results files are dropped, a record interrupted while being written is skipped
+    with open(filename, 'ab') as f_object:
+        f_object.write(b"\x80\x04\x95")
+    finished_results = checkpoint.read_journal(filename, {'34': [[0, 31]]})
+    assert finished_results == {(34, 31, 62, None): ([[34, 31]], [])}
+
+    checkpoint.write_journal(filename, finished_results)
+    assert checkpoint.read_journal(filename, {}) == finished_results
+
+    checkpoint.write_journal(filename, {})
+    assert not os.path.exists(filename)
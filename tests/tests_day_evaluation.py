@@ -0,0 +1,119 @@
+import day_evaluation
+import pv_system
+import sky_patches
+import solstice_mirror
+import sweep
+
+import math
+import numpy as np
+import pytest
+
+@pytest.fixture()
+def context(geometry: pv_system.system_geometry):
+    return day_evaluation.unit_context(geometry, 50, 0, 2000, 200, 202, 80, 80, shade_engine="analytic")
+
+class constant_shade(day_evaluation.shade_strategy):
+    '''Provides one timestep of every day with a fixed ground shade (test strategy).'''
+
+    def __init__(self, step):
+        self.step = step
+
+    def evaluate(self, context, state, day_of_unit, step, grid):
+        if step != self.step:
+            return None
+
+        grid.add_counts(np.ones(grid.counts.shape, dtype=bool), 1)
+        return 123.0
+
+def exact_day(context, day_of_unit=0):
+    grid = context.new_grid()
+    return day_evaluation.evaluate_steps(context, day_of_unit, [day_evaluation.exact_shade()], grid), grid
+
+def test_evaluate_day(context: day_evaluation.unit_context):
+    lines_15min, lines_percent_of_time_shaded = sweep.simulate_unit(context.geometry, 50, 0, 2000, 200, 202, 80, 80, 5, "analytic")
+
+    # the exact strategy gives the ground shade and percentage of time shaded of simulate_unit
+    for day_of_unit in range(2):
+        new_lines, daylight_steps, new_line = day_evaluation.evaluate_day(context, day_of_unit, [day_evaluation.exact_shade()], 5)
+        assert daylight_steps == list(np.flatnonzero(context.daylight_windows[day_of_unit]))
+        assert [line[6] for line in new_lines] == [line[6] for line in lines_15min[day_of_unit * 96:(day_of_unit + 1) * 96]]
+        assert new_line == lines_percent_of_time_shaded[day_of_unit]
+
+def test_strategy_order(context: day_evaluation.unit_context):
+    ground_shade, grid = exact_day(context)
+    step = sorted(ground_shade)[10]
+
+    # the first strategy which provides a timestep is used, all other timesteps are left to the next strategy
+    constant_grid = context.new_grid()
+    constant_ground_shade = day_evaluation.evaluate_steps(context, 0, [constant_shade(step), day_evaluation.exact_shade()], constant_grid)
+    assert constant_ground_shade == {**ground_shade, step: 123.0}
+    assert constant_grid.timestep_count == grid.timestep_count == len(ground_shade)
+    assert np.all(constant_grid.counts >= grid.counts) and np.any(constant_grid.counts > grid.counts)
+
+def test_reference_shade(context: day_evaluation.unit_context):
+    # recording at the reference longitude does not change the results
+    recorded = {}
+    ground_shade, grid = exact_day(context)
+    recorded_grid = context.new_grid()
+    assert day_evaluation.evaluate_steps(context, 0, [day_evaluation.reference_recorder(context, recorded), day_evaluation.exact_shade()], recorded_grid) == ground_shade
+    assert np.all(recorded_grid.counts == grid.counts)
+    assert sorted(recorded['ground_shade']) == sorted(ground_shade)
+
+    # one hour later at long=15 the sun is (nearly) at the same position
+    other_context = day_evaluation.unit_context(context.geometry, 50, 15, 2000, 200, 202, 80, 80, shade_engine="analytic")
+    strategy = day_evaluation.reference_shade(other_context, recorded, 0.25)
+    reused_steps = np.flatnonzero(strategy.reference_timesteps[:96] >= 0)
+    assert len(reused_steps) > 0.9 * np.sum(other_context.daylight_windows[0])
+
+    reused_grid = other_context.new_grid()
+    assert strategy.evaluate(other_context, None, 0, reused_steps[0], reused_grid) == recorded['ground_shade'][reused_steps[0] + 4]
+    assert reused_grid.timestep_count == 1 and np.all(np.packbits(reused_grid.counts > 0) == recorded['footprints'][reused_steps[0] + 4])
+
+def test_symmetry_shade(context: day_evaluation.unit_context):
+    ground_shade, grid = exact_day(context)
+
+    strategy = day_evaluation.symmetry_shade(2)
+    mirrored_grid = context.new_grid()
+    mirrored_ground_shade = day_evaluation.evaluate_steps(context, 0, [strategy, day_evaluation.exact_shade()], mirrored_grid)
+
+    # morning timesteps are calculated, afternoon timesteps are mirrored from the morning
+    afternoon = context.daylight_windows[0] & (context.day_table(0)['angle_in_plane_EW'] > math.pi/2)
+    assert strategy.counts[0][0] > 0.9 * np.sum(afternoon) and strategy.counts[0][1] == len(ground_shade)
+    assert all(mirrored_ground_shade[step] == ground_shade[step] for step in ground_shade if not afternoon[step])
+    assert np.mean([abs(mirrored_ground_shade[step] - ground_shade[step]) for step in ground_shade]) < 1
+    assert mirrored_grid.timestep_count == grid.timestep_count 
+    assert np.mean(np.abs(mirrored_grid.counts - grid.counts)) / grid.timestep_count < 0.01
+
+def test_mirror_shade(context: day_evaluation.unit_context):
+    ground_shade, grid = exact_day(context)
+
+    # day 200 (July) has falling declination, its mirror day lies before the June solstice and is calculated once
+    records = solstice_mirror.mirror_records()
+    exact = day_evaluation.exact_shade()
+    strategy = day_evaluation.mirror_shade(context, 2, records, exact)
+    mirror_day = strategy.mirror[200]
+    assert mirror_day < 172
+
+    mirrored_grid = context.new_grid()
+    mirrored_ground_shade = day_evaluation.evaluate_steps(context, 0, [strategy, exact], mirrored_grid)
+    assert list(records.records) == [(50, 0, 0, mirror_day)] and strategy.counts[0][2]
+    assert strategy.counts[0][0] > 0.5 * len(ground_shade)
+    assert np.mean([abs(mirrored_ground_shade[step] - ground_shade[step]) for step in ground_shade]) < 2
+    assert mirrored_grid.timestep_count == grid.timestep_count
+
+def test_array_strategies(context: day_evaluation.unit_context):
+    ground_shade, grid = exact_day(context)
+    step = sorted(ground_shade)[20]
+
+    # the ground shade is taken from the array, the shaded grid points are calculated (response surface) or taken from the sky patch
+    interpolated_grid = context.new_grid()
+    assert day_evaluation.interpolated_shade(np.full(len(context.times), 7.0)).evaluate(context, None, 0, step, interpolated_grid) == 7.0
+    exact_grid = context.new_grid()
+    day_evaluation.exact_shade().evaluate(context, None, 0, step, exact_grid)
+    assert np.all(interpolated_grid.counts == exact_grid.counts)
+
+    patch_index, patch_azimuth_rad, patch_elevation_rad, occupancy = sky_patches.assign_sky_patches(context.solar_table['azimuth_rad'], context.solar_table['elevation_rad'], context.daylight_windows, 3)
+    patch_ground_shade, patch_footprints = sky_patches.evaluate_sky_patches(context.geometry, patch_azimuth_rad, patch_elevation_rad, 0, 0, 80, 80, 1, "analytic")
+    patch_grid = context.new_grid()
+    assert day_evaluation.sky_patch_shade(patch_ground_shade[patch_index], patch_index, patch_footprints).evaluate(context, None, 0, step, patch_grid) == patch_ground_shade[patch_index[step]]
+    assert patch_grid.timestep_count == 1 and np.all(patch_grid.counts == patch_footprints[patch_index[step]])
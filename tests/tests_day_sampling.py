@@ -0,0 +1,49 @@
+import day_sampling
+import sweep
+
+import numpy as np
+import pytest
+
+@pytest.fixture()
+def parameters(unit_parameters: dict):
+    return dict(unit_parameters, first_day=100, last_day=108)
+
+def test_sample_days():
+    # every k-th day and the last day of the unit
+    assert day_sampling.sample_days(31, 7) == [0, 7, 14, 21, 28, 30]
+    assert day_sampling.sample_days(8, 1) == list(range(8))
+    assert day_sampling.sample_days(1, 5) == [0]
+
+def test_refine_days():
+    result = ([[0, 0, 0, 0, 0, 0, 10]] * 2, [0, 1], [0, 0, 0, 0, 1.0])
+    changed_result = ([[0, 0, 0, 0, 0, 0, 20]] * 2, [0, 1], [0, 0, 0, 0, 1.0])
+
+    # only intervals with a larger change than the tolerance are split (neighbouring days cannot be split)
+    assert day_sampling.refine_days({0: result, 4: result, 8: changed_result, 9: result}, 5) == [6]
+    assert day_sampling.refine_days({0: result, 4: ([], [], None)}, 5) == [2]
+
+def test_interpolate_lines():
+    result = ([[0, 0, 0, 0, 0, 0, 10], [0, 0, 0, 0, 0, 0, 100]], [0], [0, 0, 0, 0, 1.0, 0.0])
+    next_result = ([[0, 0, 0, 0, 0, 0, 20], [0, 0, 0, 0, 0, 0, 30]], [0, 1], [0, 0, 0, 0, 0.0, 1.0])
+    new_lines = [[0, 0, 0, 0, 0, 0, 100], [0, 0, 0, 0, 0, 0, 100]]
+
+    # step 1 has no daylight on the day before and has to be calculated
+    assert day_sampling.interpolate_lines(new_lines, [0, 1], result, next_result, 0.25) == [1]
+    assert new_lines[0][6] == pytest.approx(12.5)
+    assert day_sampling.interpolate_percentages([0, 0, 0, 0], result[2], next_result[2], 0.25) == pytest.approx([0, 0, 0, 0, 0.75, 0.25])
+
+def test_day_sampling(parameters: dict):
+    lines_15min, lines_percent_of_time_shaded = sweep.simulate_unit(**parameters)
+    sampled_lines_15min, sampled_lines_percent_of_time_shaded = sweep.simulate_unit(day_stride=3, **parameters)
+
+    # all days are written, calculated days are unchanged and interpolated days are close to the exact calculation
+    assert [line[:6] for line in sampled_lines_15min] == [line[:6] for line in lines_15min]
+    assert [line[7] for line in sampled_lines_15min] == [line[7] for line in lines_15min]
+    assert sampled_lines_15min[:96] == lines_15min[:96] and sampled_lines_15min[-96:] == lines_15min[-96:]
+    # the largest deviations occur close to sunrise and sunset (long shadows change fastest)
+    assert [line[6] for line in sampled_lines_15min] == pytest.approx([line[6] for line in lines_15min], abs=5)
+    assert [line[:4] for line in sampled_lines_percent_of_time_shaded] == [line[:4] for line in lines_percent_of_time_shaded]
+    assert np.array([line[4:] for line in sampled_lines_percent_of_time_shaded]) == pytest.approx(np.array([line[4:] for line in lines_percent_of_time_shaded]), abs=0.02)
+
+    # without tolerance every day is calculated
+    assert sweep.simulate_unit(day_stride=3, day_tolerance=0, **parameters) == (lines_15min, lines_percent_of_time_shaded)
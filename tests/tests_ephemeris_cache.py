@@ -0,0 +1,46 @@
+import ephemeris_cache
+import solarposition
+
+import json
+import numpy as np
+
+def test_load_solar_table(tmp_path, monkeypatch):
+    directory = str(tmp_path)
+    solar_table = ephemeris_cache.load_solar_table(directory, 50, 0, 2000, 170 * 96, 172 * 96)
+
+    # same values as the direct calculation, memory-mapped read-only arrays
+    expected_solar_table = solarposition.calculate_solar_table(50, 0, solarposition.generate_timesteps(2000)[170 * 96:172 * 96])
+    for column in ephemeris_cache.solar_table_columns:
+        assert np.array_equal(solar_table[column], expected_solar_table[column])
+        assert not solar_table[column].flags.writeable
+
+    # later runs read the stored table without calculating the solar position
+    def calculate_solar_table(lat, long, times):
+        raise AssertionError("solar position was calculated again")
+
+    monkeypatch.setattr(solarposition, "calculate_solar_table", calculate_solar_table)
+    assert np.array_equal(ephemeris_cache.load_solar_table(directory, 50, 0, 2000)['apparent_elevation'][170 * 96:172 * 96], expected_solar_table['apparent_elevation'])
+
+def test_invalid_solar_table(tmp_path):
+    directory = str(tmp_path)
+    filename = ephemeris_cache.cache_filename(directory, 50, 0, 2000)
+    ephemeris_cache.load_solar_table(directory, 50, 0, 2000)
+    assert ephemeris_cache.is_valid(directory, 50, 0, 2000)
+
+    # tables calculated with another pvlib version or other options are not valid
+    with open(filename + ".json") as f_object:
+        metadata = json.load(f_object)
+    metadata['pvlib_version'] = "0.0.1"
+    with open(filename + ".json", 'w') as f_object:
+        json.dump(metadata, f_object)
+
+    assert not ephemeris_cache.is_valid(directory, 50, 0, 2000)
+    ephemeris_cache.load_solar_table(directory, 50, 0, 2000)
+    assert ephemeris_cache.is_valid(directory, 50, 0, 2000)
+
+    # damaged tables are calculated again
+    with open(filename + ".npy", 'r+b') as f_object:
+        f_object.truncate(1000)
+
+    solar_table = ephemeris_cache.load_solar_table(directory, 50, 0, 2000)
+    assert len(solar_table['azimuth_rad']) == len(solarposition.generate_timesteps(2000))
@@ -0,0 +1,93 @@
+import pv_system
+import shade_grid
+
+import math
+import pickle
+import pytest
+
+def test_geometry_is_immutable(geometry: pv_system.system_geometry):
+    with pytest.raises(AttributeError):
+        geometry.PV_width = 2
+
+    with pytest.raises(AttributeError):
+        geometry.PV_angle_EW = 10
+
+    with pytest.raises(AttributeError):
+        del geometry.PV_width
+
+def test_geometry_hash_and_pickle(geometry: pv_system.system_geometry):
+    same_geometry = pv_system.system("tracking", 1.4, 1.2, 80, 10, 80, 9, 1, 0, 25).geometry
+    other_geometry = pv_system.system_geometry("tracking", 1.4, 1.2, 80, 10, 80, 9, 2)
+
+    # geometries are compared and hashed by their parameters (tilts are not part of the geometry)
+    assert geometry == same_geometry and hash(geometry) == hash(same_geometry)
+    assert geometry != other_geometry and geometry.stable_hash() != other_geometry.stable_hash()
+    assert {geometry: 1}[same_geometry] == 1
+
+    # stable hash does not depend on the process (hash of the parameter representation)
+    assert geometry.stable_hash() == same_geometry.stable_hash() and len(geometry.stable_hash()) == 16
+
+    unpickled_geometry = pickle.loads(pickle.dumps(geometry))
+    assert unpickled_geometry == geometry and unpickled_geometry.stable_hash() == geometry.stable_hash()
+
+def test_geometry_matches_system(geometry: pv_system.system_geometry):
+    sys = pv_system.system("tracking", 1.4, 1.2, 80, 10, 80, 9, 1, 0, 25)
+    angle_in_plane_EW, angle_in_plane_NS = math.radians(60), math.radians(70)
+
+    # shading calculations of the geometry with the tilt as argument match the system with the tilt as instance variable
+    assert geometry.calculate_ground_shade(angle_in_plane_EW, angle_in_plane_NS, 25, 0, 80, 80) == sys.calculate_shade(angle_in_plane_EW, angle_in_plane_NS, 80, 80, math.radians(100), math.radians(60))[0]
+    assert sys.PV_angle_EW == 25
+
+def test_panel_geometry_cache():
+    geometry = pv_system.system_geometry("standard", 1.5, 10, 2, 14, 10, 6, 9)
+    angle_in_plane_EW, angle_in_plane_NS = math.radians(50), math.radians(65)
+
+    pv_system.cached_panel_geometry.cache_clear()
+
+    # tilt dependent geometry is calculated once per tilt, only the projection depends on the sun position
+    intersection_percents = [geometry.calculate_ground_shade(angle_in_plane_EW + k * 0.1, angle_in_plane_NS, 0, 35, 80, 80) for k in range(3)]
+    assert pv_system.cached_panel_geometry.cache_info().misses == 1 and pv_system.cached_panel_geometry.cache_info().hits == 2
+
+    # cached geometry gives the same shadow corners as the direct calculation
+    assert geometry.project_shadow_corners(angle_in_plane_EW, angle_in_plane_NS, pv_system.cached_panel_geometry(geometry, 0, 35)) == geometry.calculate_shadow_corners(angle_in_plane_EW, angle_in_plane_NS, 0, math.radians(35))
+    assert intersection_percents[0] == pv_system.system("standard", 1.5, 10, 2, 14, 10, 6, 9, 35, 0).calculate_shade(angle_in_plane_EW, angle_in_plane_NS, 80, 80, math.radians(100), math.radians(60))[0]
+
+def test_panel_geometry_cache_tracking(geometry: pv_system.system_geometry):
+    angle_in_plane_EW, angle_in_plane_NS = math.radians(50), math.radians(65)
+
+    pv_system.cached_panel_geometry.cache_clear()
+
+    # tracker tilts are only cached if they are rounded to a resolution
+    geometry.calculate_ground_shade(angle_in_plane_EW, angle_in_plane_NS, 40.0001, 0, 80, 80)
+    assert pv_system.cached_panel_geometry.cache_info().currsize == 0
+
+    geometry.calculate_ground_shade(angle_in_plane_EW, angle_in_plane_NS, 40.0001, 0, 80, 80, tilt_resolution=0.01)
+    geometry.calculate_ground_shade(angle_in_plane_EW, angle_in_plane_NS, 39.9999, 0, 80, 80, tilt_resolution=0.01)
+    assert pv_system.cached_panel_geometry.cache_info().misses == 1 and pv_system.cached_panel_geometry.cache_info().hits == 1
+
+    # rounding the tilt only changes the shaded area slightly
+    assert geometry.calculate_ground_shade(angle_in_plane_EW, angle_in_plane_NS, 40.0001, 0, 80, 80, tilt_resolution=0.01) == pytest.approx(geometry.calculate_ground_shade(angle_in_plane_EW, angle_in_plane_NS, 40.0001, 0, 80, 80), rel=1e-4)
+
+def test_mirror_symmetry():
+    grid = shade_grid.shade_grid(80, 80, 1)
+
+    # panel columns centred in the field (standard panels start at x=0, all other panels are centred at x=0)
+    assert pv_system.system_geometry("tracking", 1.4, 1.2, 80, 10, 80, 9, 1).is_mirror_symmetric(0, 0, 80, grid.x_coords)
+    assert pv_system.system_geometry("vertical", 1.4, 1.2, 80, 10, 80, 9, 1).is_mirror_symmetric(90, 0, 80, grid.x_coords)
+    assert pv_system.system_geometry("standard", 1.5, 10, 2, 14, 10, 6, 9).is_mirror_symmetric(0, 35, 80, grid.x_coords)
+    assert not pv_system.system_geometry("standard", 1.5, 10, 2, 14, 10, 6, 9).is_mirror_symmetric(20, 35, 80, grid.x_coords)
+    assert not pv_system.system_geometry("standard", 1.5, 10, 2, 14, 10, 5, 9).is_mirror_symmetric(0, 35, 80, grid.x_coords)
+    assert not pv_system.system_geometry("backtracking", 1.4, 1.2, 80, 10, 80, 9, 1).is_mirror_symmetric(0, 0, 80, grid.x_coords)
+
+    # shade for the mirrored sun direction is the mirrored shade (tracking systems are turned to the mirrored tilt)
+    geometry = pv_system.system_geometry("tracking", 1.4, 1.2, 80, 10, 80, 9, 1)
+    mirrored_grid = shade_grid.shade_grid(80, 80, 1)
+
+    for engine in ("shapely", "analytic"):
+        grid.reset()
+        mirrored_grid.reset()
+        intersection_percent = geometry.calculate_ground_shade(math.radians(50), math.radians(65), 40, 0, 80, 80, grid, engine)
+        mirrored_intersection_percent = geometry.calculate_ground_shade(math.radians(130), math.radians(65), -40, 0, 80, 80, mirrored_grid, engine)
+
+        assert mirrored_intersection_percent == pytest.approx(intersection_percent)
+        assert (mirrored_grid.counts == grid.counts[:, ::-1]).all()
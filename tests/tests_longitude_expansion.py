@@ -0,0 +1,57 @@
+import longitude_expansion
+import solarposition
+import sweep
+
+import numpy as np
+import pytest
+
+@pytest.fixture()
+def parameters(unit_parameters: dict):
+    return dict(unit_parameters, first_day=170, last_day=172)
+
+def test_time_offset():
+    # 4 minutes per degree, the sun reaches the same position earlier in the east
+    assert longitude_expansion.time_offset(15, 0) == 4
+    assert longitude_expansion.time_offset(-7.5, 0) == -2
+    assert longitude_expansion.time_offset(1, 0) == 0
+
+def test_offset_residual():
+    # multiples of 3.75° are shifted exactly, all other longitudes by up to half a timestep (1.875°) less or more
+    assert longitude_expansion.offset_residual(15, 0) == 0
+    assert longitude_expansion.offset_residual(-7.5, 0) == 0
+    assert longitude_expansion.offset_residual(3, 0) == pytest.approx(0.75)
+    assert longitude_expansion.offset_residual(1, 0) == pytest.approx(1)
+
+def test_match_reference_timesteps():
+    times = solarposition.generate_timesteps(2000)[170 * 96:171 * 96]
+    reference_solar_table = solarposition.calculate_solar_table(50, 0, times)
+    solar_table = solarposition.calculate_solar_table(50, 15, times)
+    daylight = solar_table['apparent_elevation'] >= 0
+    reference_daylight = reference_solar_table['apparent_elevation'] >= 0
+
+    reference_timesteps, drift = longitude_expansion.match_reference_timesteps(solar_table, reference_solar_table, reference_daylight, 4, daylight, 0.25)
+
+    # one hour later at long=0 the sun is (nearly) at the same position, timesteps close to sunrise/sunset may lack a reference timestep
+    reused = reference_timesteps >= 0
+    assert np.sum(reused) > 0.9 * np.sum(daylight)
+    assert np.all(reference_timesteps[reused] == np.flatnonzero(reused) + 4)
+    assert np.all(drift[reused] <= 0.25) and np.all(reference_timesteps[~daylight] == -1)
+
+def test_longitude_expansion(parameters: dict):
+    lines_15min, lines_percent_of_time_shaded = sweep.simulate_unit(**parameters)
+    other_lines_15min, other_lines_percent_of_time_shaded = sweep.simulate_unit(**dict(parameters, long=15))
+
+    expanded_lines_15min, expanded_lines_percent_of_time_shaded = sweep.expand_longitudes(parameters, [0, 15])
+
+    # results of the reference longitude are unchanged, followed by the results of the other longitude
+    assert expanded_lines_15min[:len(lines_15min)] == lines_15min
+    assert expanded_lines_percent_of_time_shaded[:len(lines_percent_of_time_shaded)] == lines_percent_of_time_shaded
+
+    shifted_lines_15min = expanded_lines_15min[len(lines_15min):]
+    assert [line[:6] for line in shifted_lines_15min] == [line[:6] for line in other_lines_15min]
+    assert [line[6] for line in shifted_lines_15min] == pytest.approx([line[6] for line in other_lines_15min], abs=1)
+    assert [line[7] for line in shifted_lines_15min] == [line[7] for line in other_lines_15min]
+    assert np.array([line[4:] for line in expanded_lines_percent_of_time_shaded[len(lines_percent_of_time_shaded):]]) == pytest.approx(np.array([line[4:] for line in other_lines_percent_of_time_shaded]), abs=0.01)
+
+    # without tolerance every timestep is calculated
+    assert sweep.expand_longitudes(dict(parameters, drift_tolerance=0), [0, 15])[0][len(lines_15min):] == other_lines_15min
@@ -0,0 +1,45 @@
+import noon_symmetry
+import solarposition
+import sweep
+
+import math
+import numpy as np
+import pytest
+
+def test_match_mirrored_timesteps():
+    solar_table = solarposition.calculate_solar_table(50, 0, solarposition.generate_timesteps(2000)[100 * 96:101 * 96])
+    daylight = solar_table['apparent_elevation'] >= 0
+
+    mirrored_timesteps, drift = noon_symmetry.match_mirrored_timesteps(solar_table['azimuth_rad'], solar_table['elevation_rad'], solar_table['angle_in_plane_EW'], daylight, 2)
+
+    # only afternoon timesteps are mirrored, always from a morning timestep with (nearly) the mirrored sun direction
+    mirrored = mirrored_timesteps >= 0
+    afternoon = daylight & (solar_table['angle_in_plane_EW'] > math.pi/2)
+    assert np.sum(mirrored) > 0.9 * np.sum(afternoon) and np.all(afternoon[mirrored])
+    assert np.all(solar_table['angle_in_plane_EW'][mirrored_timesteps[mirrored]] <= math.pi/2)
+    assert np.all(drift[mirrored] <= 2)
+    assert solar_table['angle_in_plane_EW'][mirrored_timesteps[mirrored]] == pytest.approx(math.pi - solar_table['angle_in_plane_EW'][mirrored], abs=math.radians(3))
+
+def test_noon_symmetry(unit_parameters: dict):
+    lines_15min, lines_percent_of_time_shaded = sweep.simulate_unit(**unit_parameters)
+
+    # without tolerance every timestep is calculated, systems which are not symmetric in the field are calculated completely
+    assert sweep.simulate_unit(symmetry_tolerance=0, **unit_parameters) == (lines_15min, lines_percent_of_time_shaded)
+    assert sweep.simulate_unit(symmetry_tolerance=2, **dict(unit_parameters, field_width=81)) == sweep.simulate_unit(**dict(unit_parameters, field_width=81))
+
+    mirrored_lines_15min, mirrored_lines_percent_of_time_shaded = sweep.simulate_unit(symmetry_tolerance=2, **unit_parameters)
+
+    # afternoon ground shade is mirrored from the morning, self-shading is calculated for every timestep
+    assert [line[:6] + line[7:] for line in mirrored_lines_15min] == [line[:6] + line[7:] for line in lines_15min]
+    assert [line[6] for line in mirrored_lines_15min] != [line[6] for line in lines_15min]
+    assert np.mean([abs(line[6] - mirrored_line[6]) for line, mirrored_line in zip(lines_15min, mirrored_lines_15min) if line[9] >= 10]) < 2
+    assert np.array([line[4:] for line in mirrored_lines_percent_of_time_shaded]) == pytest.approx(np.array([line[4:] for line in lines_percent_of_time_shaded]), abs=0.02)
+
+def test_noon_symmetry_with_longitude_expansion(unit_parameters: dict):
+    expanded_lines_15min, expanded_lines_percent_of_time_shaded = sweep.expand_longitudes(dict(unit_parameters, drift_tolerance=1), [0, -120])
+    mirrored_lines_15min, mirrored_lines_percent_of_time_shaded = sweep.expand_longitudes(dict(unit_parameters, symmetry_tolerance=2, drift_tolerance=1), [0, -120])
+
+    # morning timesteps reused from the reference longitude are mirrored for the afternoon as well
+    assert len(mirrored_lines_15min) == len(expanded_lines_15min) and len(mirrored_lines_percent_of_time_shaded) == len(expanded_lines_percent_of_time_shaded)
+    assert np.mean([abs(line[6] - mirrored_line[6]) for line, mirrored_line in zip(expanded_lines_15min, mirrored_lines_15min) if line[9] >= 10]) < 2
+    assert np.array([line[4:] for line in mirrored_lines_percent_of_time_shaded]) == pytest.approx(np.array([line[4:] for line in expanded_lines_percent_of_time_shaded]), abs=0.02)
@@ -64,4 +64,22 @@ def test_backtracking_repositioning(sys_backtracking: pv_system.system, delta: f
                     pass_for_all = False
                     break
     
-    assert pass_for_all
\ No newline at end of file
+    assert pass_for_all
+
+def test_tilt_schedule(sys_tracking: pv_system.system, sys_backtracking: pv_system.system, delta: float):
+    # sun beams in the E/W plane at 30°, 60°, 90° (noon), 120° and 150° (measured from the ground in the east) and a night timestep (angle -1)
+    angle_in_plane_EW = [math.pi/6, math.pi/3, math.pi/2, 2*math.pi/3, 5*math.pi/6, -1]
+
+    # tracking panels face the sun: tilt = 90° - angle
+    assert list(sys_tracking.tilt_schedule(angle_in_plane_EW)) == pytest.approx([60, 30, 0, -30, -60, 147.2958], abs=delta)
+
+    # the panel rows are 10 m apart and 1.2 m wide, so they only shade each other with the sun less than 6.9° above the horizon: backtracking panels face the sun for all other angles
+    assert list(sys_backtracking.tilt_schedule(angle_in_plane_EW)) == pytest.approx([60, 30, 0, -30, -60, 147.2958], abs=delta)
+
+    # sun at 5° in the east and west (shade width 1.2 - sin(5°) * 10 = 0.33 m): tilt = asin(10 * sin(5°) / 1.2) - 5° towards the sun (negative in the west)
+    assert list(sys_backtracking.tilt_schedule([math.radians(5), math.radians(175)])) == pytest.approx([41.5769, -41.5769], abs=delta)
+    assert list(sys_tracking.tilt_schedule([math.radians(5), math.radians(175)])) == pytest.approx([85, -85], abs=delta)
+
+    # systems which are not tracking keep their tilt
+    sys_vertical = pv_system.system("vertical", 1.4, 1.2, 80, 10, 80, 9, 1, 0, 90)
+    assert list(sys_vertical.tilt_schedule(angle_in_plane_EW)) == [90] * len(angle_in_plane_EW)
@@ -0,0 +1,101 @@
+import pv_system
+import response_surface
+import shade_grid
+import solarposition
+import sweep
+
+import numpy as np
+import pytest
+
+def test_calculate_sun_direction():
+    azimuth_rad = np.radians([10, 100, 190, 280])
+    elevation_rad = np.radians([5, 30, 60, 85])
+
+    angle_in_plane_EW, angle_in_plane_NS = solarposition.calculate_angles_in_plane(azimuth_rad, elevation_rad)
+
+    calculated_azimuth_rad, calculated_elevation_rad = solarposition.calculate_sun_direction(angle_in_plane_EW, angle_in_plane_NS)
+    assert calculated_azimuth_rad == pytest.approx(azimuth_rad)
+    assert calculated_elevation_rad == pytest.approx(elevation_rad)
+
+def test_interpolate():
+    # linear functions are interpolated exactly, angles outside of the nodes are clamped
+    nodes = np.array([0.5, 1.5, 2.5])
+    table = nodes[:, np.newaxis] + 2 * nodes[np.newaxis, :]
+
+    assert response_surface.interpolate(nodes, table, np.array([0.5, 1.25, 2.0]), np.array([2.5, 0.75, 1.0])) == pytest.approx([5.5, 2.75, 4])
+    assert response_surface.interpolate(nodes, table, np.array([0, 3]), np.array([0, 3])) == pytest.approx([1.5, 7.5])
+
+def test_response_surface_nodes(geometry: pv_system.system_geometry):
+    nodes, ground_shade, self_shade = response_surface.calculate_response_surface(geometry, 0, 0, 80, 80, 10, "analytic")
+
+    # values at the nodes are the exact values for the sun direction of the node
+    angle_EW, angle_NS = nodes[4], nodes[11]
+    azimuth_rad, elevation_rad = solarposition.calculate_sun_direction(angle_EW, angle_NS)
+    PV_angle_EW = float(geometry.tilt_schedule(angle_EW))
+    total_panel_area = 80 * 1 * 1.4 * 1.2
+
+    assert ground_shade.shape == self_shade.shape == (18, 18)
+    assert ground_shade[4, 11] == pytest.approx(geometry.calculate_ground_shade(angle_EW, angle_NS, PV_angle_EW, 0, 80, 80, None, "analytic"))
+    assert self_shade[4, 11] == pytest.approx(float(geometry.calculate_self_shade_array(angle_EW, angle_NS, azimuth_rad, PV_angle_EW, 0)) / total_panel_area * 100)
+    assert response_surface.interpolate(nodes, ground_shade, angle_EW, angle_NS) == pytest.approx(ground_shade[4, 11])
+
+def test_load_response_surface(tmp_path, geometry: pv_system.system_geometry):
+    directory = str(tmp_path / "response_surfaces")
+    table = response_surface.load_response_surface(directory, geometry, 0, 0, 80, 80, 10, "analytic")
+
+    # the table is stored under the system hash and loaded from disk in later runs
+    filename = response_surface.table_filename(directory, geometry, 0, 0, 80, 80, 10, "analytic")
+    assert geometry.stable_hash() in filename
+    assert [path.name for path in (tmp_path / "response_surfaces").iterdir()] == [filename.split("/")[-1]]
+
+    response_surface.load_response_surface.cache_clear()
+    loaded_table = response_surface.load_response_surface(directory, geometry, 0, 0, 80, 80, 10, "analytic")
+    for array, loaded_array in zip(table, loaded_table):
+        assert np.array_equal(array, loaded_array)
+
+    # different settings are stored in a different table
+    assert response_surface.table_filename(directory, geometry, 0, 35, 80, 80, 10, "analytic") != filename
+    assert response_surface.table_filename(directory, geometry, 0, 0, 80, 80, 10, "shapely") != filename
+
+def test_response_surface_version(tmp_path, geometry: pv_system.system_geometry, monkeypatch):
+    directory = str(tmp_path)
+    filename = response_surface.table_filename(directory, geometry, 0, 0, 80, 80, 10, "analytic")
+    response_surface.load_response_surface.cache_clear()
+    nodes, ground_shade, self_shade = response_surface.load_response_surface(directory, geometry, 0, 0, 80, 80, 10, "analytic")
+    assert response_surface.is_valid(filename)
+
+    # tables of another format version (or damaged tables) are calculated again
+    np.savez(filename, nodes=nodes, ground_shade=ground_shade + 1, self_shade=self_shade, version=0)
+    assert not response_surface.is_valid(filename)
+    response_surface.load_response_surface.cache_clear()
+    assert np.array_equal(response_surface.load_response_surface(directory, geometry, 0, 0, 80, 80, 10, "analytic")[1], ground_shade)
+    assert response_surface.is_valid(filename)
+
+    with open(filename, 'wb') as f_object:
+        f_object.write(b"damaged")
+    assert not response_surface.is_valid(filename)
+
+    # a new format version is stored under a new file name
+    monkeypatch.setattr(response_surface, "table_format_version", response_surface.table_format_version + 1)
+    assert response_surface.table_filename(directory, geometry, 0, 0, 80, 80, 10, "analytic") != filename
+
+def test_update_shade_grid(geometry: pv_system.system_geometry):
+    for engine in ["shapely", "analytic"]:
+        grid = shade_grid.shade_grid(80, 80, 1)
+        geometry.calculate_ground_shade(1.2, 1.7, 10, 0, 80, 80, grid, engine)
+
+        grid_only = shade_grid.shade_grid(80, 80, 1)
+        geometry.update_shade_grid(1.2, 1.7, 10, 0, 80, 80, grid_only, engine)
+
+        assert np.array_equal(grid.counts, grid_only.counts) and grid_only.timestep_count == 1
+
+def test_response_surface_sweep(tmp_path, unit_parameters: dict):
+    parameters = dict(unit_parameters, first_day=170, last_day=172)
+
+    lines_15min, lines_percent_of_time_shaded = sweep.simulate_unit(**parameters)
+    table_lines_15min, table_lines_percent_of_time_shaded = sweep.simulate_unit(response_surface_resolution=5, response_surface_directory=str(tmp_path), validation_stride=None, **parameters)
+
+    # percentage of time shaded is still calculated exactly, interpolated percentages are close to the exact ones
+    assert table_lines_percent_of_time_shaded == lines_percent_of_time_shaded
+    for column in [6, 7]:
+        assert np.mean(np.abs(np.array([line[column] for line in table_lines_15min]) - np.array([line[column] for line in lines_15min]))) < 1
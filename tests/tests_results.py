@@ -0,0 +1,62 @@
+import results
+
+import csv
+import numpy as np
+import pytest
+
+def test_csv_sink_flush(tmp_path):
+    filename = tmp_path / "results.csv"
+    columns = ['lat', 'month', 'shaded area (in %)']
+
+    sink = results.csv_sink(filename, columns, flush_size=4)
+    sink.write([[34, 1, 0.5], [34, 1, 100]])
+    assert sink.write([[34, 2, 12.25]]) == False
+
+    # lines are buffered until flush_size is reached
+    sink.f_object.flush()
+    with open(filename) as f_object:
+        assert list(csv.reader(f_object)) == [columns]
+
+    assert sink.write([[34, 2, 7], [35, 1, 1.5]]) == True
+    assert sink.number_of_buffered_lines == 0
+
+    # remaining lines are written on close
+    sink.write([[35, 2, 3]])
+    sink.close()
+
+    with open(filename) as f_object:
+        assert list(csv.reader(f_object)) == [columns, ['34', '1', '0.5'], ['34', '1', '100'], ['34', '2', '12.25'], ['34', '2', '7'], ['35', '1', '1.5'], ['35', '2', '3']]
+
+@pytest.mark.parametrize("file_format", ["npz", "parquet", "feather"])
+def test_partitioned_sink(tmp_path, file_format):
+    if file_format != "npz" and results.pyarrow == None:
+        pytest.skip("pyarrow is not installed")
+
+    directory = tmp_path / "results"
+    columns = ['lat', 'long', 'month', 'day', 'hour', 'minute', 'shaded area (in %)']
+
+    sink = results.partitioned_sink(str(directory), columns, file_format, flush_size=3)
+    sink.write([[34, 0, 1, 1, 0, 0, 100], [34, 0, 1, 1, 12, 15, 12.5], [35, 0, 1, 1, 0, 0, 100]])
+    sink.write([[34, 7.5, 1, 2, 12, 30, 7.25]])
+    sink.close()
+
+    # one directory per latitude, one file per flush
+    assert sorted(path.name for path in directory.iterdir()) == ["lat=34", "lat=35"]
+    assert len(list((directory / "lat=34").iterdir())) == 2
+
+    lat_34 = results.read_partition(str(directory), 34)
+    assert list(lat_34) == columns
+    assert lat_34['lat'].dtype == np.int8
+    assert lat_34['long'].dtype == np.float32
+    # fractional longitudes (--longs) are kept
+    assert list(lat_34['long']) == [0, 0, 7.5]
+    assert lat_34['shaded area (in %)'].dtype == np.float32
+    assert list(lat_34['minute']) == [0, 15, 30]
+    assert list(lat_34['shaded area (in %)']) == [100, 12.5, 7.25]
+
+    assert list(results.read_partition(str(directory), 35)['hour']) == [0]
+
+def test_result_sink_is_abstract():
+    # subclasses have to define how blocks are written and how the position is reported
+    with pytest.raises(TypeError):
+        results.result_sink(['lat'])
@@ -1,5 +1,6 @@
 import shade_grid
 from shapely.geometry import Polygon as shapely_Polygon
+from shapely.ops import unary_union
 import random
 
 def test_init():
@@ -95,3 +96,84 @@ def test_evaluate_percentage_validity():
         percentage_sum += percentage_counts_dict[bin]
 
     assert percentage_sum > 1 - 1e-5 and percentage_sum < 1 + 1e-5 and percentage_steps == 0.2
+
+def test_init_spacing():
+    # check if the correct number of points is generated for a spacing smaller than 1m
+    field_width, field_length, spacing = 10, 6, 0.25
+    grid = shade_grid.shade_grid(field_width, field_length, spacing)
+    number_of_points = ((field_width + 20) / spacing + 1) * ((field_length + 20) / spacing + 1)
+    assert grid.counts.size == number_of_points and grid.grid_x.max() == field_width + 10 and grid.grid_y.max() == field_length + 10
+
+def test_update_matches_point_check():
+    field_width, field_length = 10, 10
+    polygon = shapely_Polygon([(-3.5, -7.2), (12.1, -2.3), (8.4, 16.6), (-6.2, 4.4)])
+
+    # generate field
+    grid = shade_grid.shade_grid(field_width, field_length)
+
+    # update field with polygon
+    grid.update(polygon)
+
+    # compare vectorized update with a check of every single point
+    all_pass = True
+    for point, count in grid.grid_dict.items():
+        if count != int(polygon.contains(point)):
+            print("Count of point ", point, " does not match point in polygon check.")
+            all_pass = False
+
+    assert all_pass
+
+def test_update_from_lattice():
+    all_pass = True
+    field_width, field_length = 10, 10
+
+    # shadow corners (SW, SE, NE, NW) and lattice: overlapping shadows in N/S and E/W direction, shadows crossing the field border, touching shadow rows
+    lattices = [([-1.3, 2.1, 3.4, 0.2], [-2.5, -1.9, 4.7, 4.1], 2.5, 3, 5, 6),
+                ([-0.6, 0.6, 0.6, -0.6], [0, 0, 5, 5], 3, 5, 4, 3),
+                ([-14.2, -11.7, -9.3, -11.8], [1.5, 1.5, 8.9, 8.9], 4, 2, 9, 7)]
+
+    for x_corners, y_corners, distance_EW, distance_NS, number_of_panels_EW, number_of_panels_NS in lattices:
+        # union of all shadows as polygon (reference)
+        shadows = [shapely_Polygon([(x + j * distance_EW, y + i * distance_NS) for x, y in zip(x_corners, y_corners)]) for i in range(number_of_panels_NS) for j in range(number_of_panels_EW)]
+        field = shapely_Polygon([(-10, -10), (field_width + 10, -10), (field_width + 10, field_length + 10), (-10, field_length + 10)])
+        polygon = unary_union(shadows).intersection(field)
+
+        for spacing in [1, 0.25]:
+            grid_polygon = shade_grid.shade_grid(field_width, field_length, spacing)
+            grid_polygon.update(polygon)
+
+            grid_lattice = shade_grid.shade_grid(field_width, field_length, spacing)
+            grid_lattice.update_from_lattice(x_corners, y_corners, distance_EW, distance_NS, number_of_panels_EW, number_of_panels_NS)
+
+            if not ((grid_polygon.counts == grid_lattice.counts).all() and grid_lattice.timestep_count == 1):
+                print("Rasterized shadows do not match polygon update for lattice ", x_corners, y_corners, " with spacing ", spacing)
+                all_pass = False
+
+    assert all_pass
+
+def test_update_incremental():
+    all_pass = True
+    field_width, field_length = 10, 10
+
+    # sliding shadows (also with corners on grid points and edges on grid rows/columns), shadows leaving the field and an empty shade
+    polygons = [unary_union([shapely_Polygon([(x + shift, -3), (x + shift + 1.5, -3), (x + shift + 2.5, 12), (x + shift + 1, 12)]) for x in range(-8, 18, 4)]) for shift in [0, 0.3, 0.5, 1, 2.75, 6]]
+    polygons += [shapely_Polygon([(-3.5, -7.2), (12.1, -2.3), (8.4, 16.6), (-6.2, 4.4)]), shapely_Polygon([(0, 0), (5, 0), (5, 5), (0, 5)]), shapely_Polygon(), shapely_Polygon([(1, 1), (3, 1), (3, 3), (1, 3)])]
+
+    for spacing in [1, 0.25]:
+        grid = shade_grid.shade_grid(field_width, field_length, spacing)
+        grid_incremental = shade_grid.shade_grid(field_width, field_length, spacing, incremental=True)
+
+        for polygon in polygons:
+            grid.update(polygon)
+            grid_incremental.update(polygon)
+
+            # only the changed area is tested, the counts are the same as for the complete update
+            if not ((grid.counts == grid_incremental.counts).all() and grid.timestep_count == grid_incremental.timestep_count):
+                print("Incremental update does not match complete update for polygon ", polygon, " with spacing ", spacing)
+                all_pass = False
+
+            # the previous shade is kept when the counts are reset
+            grid.reset()
+            grid_incremental.reset()
+
+    assert all_pass
@@ -0,0 +1,55 @@
+import pv_system
+import shade_grid
+import shade_memo
+
+import math
+import numpy as np
+import pytest
+
+def test_memo_hits_and_misses(geometry: pv_system.system_geometry):
+    memo = shade_memo.shade_memo(tolerance=0.5)
+
+    first = memo.calculate_shade(geometry, math.radians(40.1), math.radians(100.1), 50, 0, 80, 80)
+    second = memo.calculate_shade(geometry, math.radians(39.9), math.radians(99.9), 50.1, 0, 80, 80)
+    memo.calculate_shade(geometry, math.radians(41), math.radians(100), 49, 0, 80, 80)
+
+    # sun angles and tilts within the tolerance share an entry, the result is the result for the rounded values
+    assert first == second
+    assert first[0] == geometry.calculate_ground_shade(math.radians(40), math.radians(100), 50, 0, 80, 80)
+    assert memo.info() == {'hits': 1, 'misses': 2, 'hit_rate': 1/3, 'size': 2, 'maxsize': 20000}
+
+    memo.clear()
+    assert memo.info()['size'] == 0 and memo.info()['hits'] == 0
+
+def test_memo_lru_eviction(geometry: pv_system.system_geometry):
+    memo = shade_memo.shade_memo(tolerance=1, maxsize=2)
+
+    for angle_EW in [40, 50, 40, 60, 50]:
+        memo.calculate_shade(geometry, math.radians(angle_EW), math.radians(100), 90 - angle_EW, 0, 80, 80)
+
+    # 50 was the least recently used entry when 60 was added
+    assert memo.info()['hits'] == 1 and memo.info()['misses'] == 4 and memo.info()['size'] == 2
+
+def test_memo_grid(geometry: pv_system.system_geometry):
+    memo = shade_memo.shade_memo(tolerance=0.5)
+
+    grid = shade_grid.shade_grid(80, 80, 1)
+    geometry.calculate_ground_shade(math.radians(40), math.radians(100), 50, 0, 80, 80, grid, "analytic")
+
+    # shaded grid points are added for hits and misses
+    memo_grid = shade_grid.shade_grid(80, 80, 1)
+    memo.calculate_shade(geometry, math.radians(40), math.radians(100), 50, 0, 80, 80, memo_grid, "analytic")
+    memo.calculate_shade(geometry, math.radians(40.1), math.radians(100), 50, 0, 80, 80, memo_grid, "analytic")
+
+    assert memo.info()['hits'] == 1
+    assert np.array_equal(memo_grid.counts, 2 * grid.counts) and memo_grid.timestep_count == 2
+
+def test_system_calculate_shade_with_memo():
+    sys = pv_system.system("standard", 1.5, 10, 2, 14, 10, 6, 9, 35, 0)
+    memo = shade_memo.shade_memo(tolerance=0.1)
+
+    angle_in_plane_EW, angle_in_plane_NS = math.radians(70), math.radians(80)
+    azimuth_rad, elevation_rad = math.atan2(1 / math.tan(angle_in_plane_EW), - 1 / math.tan(angle_in_plane_NS)), math.atan2(1, math.hypot(1 / math.tan(angle_in_plane_EW), 1 / math.tan(angle_in_plane_NS)))
+
+    # same result as the exact calculation for angles on the rounding grid
+    assert sys.calculate_shade(angle_in_plane_EW, angle_in_plane_NS, 80, 80, azimuth_rad, elevation_rad, memo=memo) == pytest.approx(sys.calculate_shade(angle_in_plane_EW, angle_in_plane_NS, 80, 80, azimuth_rad, elevation_rad))
@@ -1545,3 +1545,64 @@ def test_sun_80_deg_N_sys_backtracking_ground_shading(sys_backtracking: pv_syste
         print("Test 78 failed. Shaded ground area does not match the theoretical value for backtracking system with the sun at 80° elevation in the north.\nGround shading area (in %) = ", intersection_percent, "\nExpected ground shading (in %) = ", expected_ground_shading * 100)
 
     assert (expected_ground_shading * 100 + delta > intersection_percent and expected_ground_shading * 100 - delta < intersection_percent)
+
+# -------------- shade engines --------------
+@pytest.mark.parametrize("system_parameters", [
+    ("tracking", 1.4, 1.2, 80, 10, 80, 9, 1, 0, 25),
+    ("vertical", 1.4, 1.2, 80, 10, 80, 9, 1, 0, 90),
+    ("standard", 1.5, 80, 2, 80, 10, 1, 9, 35, 0),
+    ("overhead", 1, 1, 80, 10, 80, 9, 1, 0, 10),
+    ("standard", 1.5, 10, 2, 14, 10, 6, 9, 35, 0),
+    ("tracking", 1.4, 1.2, 10, 10, 14, 9, 6, 0, -40),
+])
+def test_analytic_engine_ground_shading(system_parameters: tuple, field_width: int, field_length: int):
+    sys = pv_system.system(*system_parameters)
+
+    pass_for_all = True
+
+    # low sun (overlapping shadows, shadows leaving the field) to high sun, from all directions
+    for elevation in [5, 20, 45, 80]:
+        for azimuth in [20, 90, 135, 200, 270, 340]:
+            elevation_rad, azimuth_rad = math.radians(elevation), math.radians(azimuth)
+            angle_in_plane_EW, angle_in_plane_NS = calculate_angle_EW_and_NS(elevation_rad, azimuth_rad)
+
+            intersection_percent_shapely, self_shade_percentage_shapely = sys.calculate_shade(angle_in_plane_EW, angle_in_plane_NS, field_width, field_length, azimuth_rad, elevation_rad)
+            intersection_percent_analytic, self_shade_percentage_analytic = sys.calculate_shade(angle_in_plane_EW, angle_in_plane_NS, field_width, field_length, azimuth_rad, elevation_rad, engine="analytic")
+
+            # Test 79: Check if the analytic engine matches the shapely engine (reference)
+            if not (abs(intersection_percent_shapely - intersection_percent_analytic) < 1e-8 and self_shade_percentage_shapely == self_shade_percentage_analytic):
+                print("Test 79 failed for elevation ", elevation, " and azimuth ", azimuth, ".\nGround shading shapely engine (in %) = ", intersection_percent_shapely, "\nGround shading analytic engine (in %) = ", intersection_percent_analytic)
+                pass_for_all = False
+
+    assert pass_for_all
+
+@pytest.mark.parametrize("system_parameters", [
+    ("tracking", 1.4, 1.2, 80, 10, 80, 9, 1, 0),
+    ("tracking", 1.4, 1.2, 2, 1.5, 3, 9, 6, 0),
+    ("vertical", 1.4, 1.2, 80, 10, 80, 9, 1, 0, 90),
+    ("standard", 1.5, 80, 2, 80, 10, 1, 9, 35, 0),
+    ("standard", 1.5, 2, 2, 3, 5, 4, 9, 35, 0),
+    ("overhead", 1, 1, 80, 10, 80, 9, 1, 0, 10),
+    ("overhead", 3, 2, 2, 3, 3, 6, 7, 0, 10),
+])
+def test_self_shading_array(system_parameters: tuple):
+    sys = pv_system.system(*system_parameters)
+
+    # sun from all directions, trackers are repositioned for every sun position
+    angles_in_plane_EW, angles_in_plane_NS, azimuths_rad, PV_angles_EW, self_shade_totals = [], [], [], [], []
+    for elevation in [2, 5, 10, 20, 45, 80]:
+        for azimuth in range(0, 360, 15):
+            elevation_rad, azimuth_rad = math.radians(elevation), math.radians(azimuth)
+            angle_in_plane_EW, angle_in_plane_NS = calculate_angle_EW_and_NS(elevation_rad, azimuth_rad)
+
+            if sys.system_type == "tracking":
+                tracking_repositioning_for_testing(sys, angle_in_plane_EW)
+
+            angles_in_plane_EW.append(angle_in_plane_EW)
+            angles_in_plane_NS.append(angle_in_plane_NS)
+            azimuths_rad.append(azimuth_rad)
+            PV_angles_EW.append(sys.PV_angle_EW)
+            self_shade_totals.append(sys.calculate_self_shade(angle_in_plane_EW, angle_in_plane_NS, math.radians(sys.PV_angle_EW), math.radians(sys.PV_angle_NS), azimuth_rad, elevation_rad))
+
+    # Test 80: Check if the self-shading calculated for all sun positions at once matches the self-shading calculated for every sun position
+    assert sys.calculate_self_shade_array(angles_in_plane_EW, angles_in_plane_NS, azimuths_rad, PV_angles_EW) == pytest.approx(self_shade_totals, rel=1e-9, abs=1e-9)
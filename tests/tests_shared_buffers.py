@@ -0,0 +1,39 @@
+import shade_grid
+import shared_buffers
+import sweep
+
+import numpy as np
+
+def test_publish_and_attach():
+    arrays = {'coords': np.linspace(0, 1, 11), ('solar_table', 34, 'azimuth_rad'): np.arange(6, dtype=np.float32).reshape(2, 3)}
+    handles, segments = shared_buffers.publish(arrays)
+
+    try:
+        attached_arrays = shared_buffers.attach(handles)
+
+        # same values, read-only views of the shared memory (attached only once per process)
+        for key in arrays:
+            assert np.array_equal(attached_arrays[key], arrays[key]) and attached_arrays[key].dtype == arrays[key].dtype
+            assert not attached_arrays[key].flags.writeable
+        assert shared_buffers.attach(handles)['coords'] is attached_arrays['coords']
+    finally:
+        shared_buffers.release(segments)
+
+def test_shared_grid_coordinates():
+    handles, segments = sweep.publish_shared_buffers([45], 0, 2000, 80, 80, 1)
+
+    try:
+        buffers = shared_buffers.attach(handles)
+        grid = shade_grid.shade_grid(80, 80, 1)
+        shared_grid = shade_grid.shade_grid(80, 80, 1, tuple(buffers[name] for name in ('x_coords', 'y_coords', 'grid_x', 'grid_y')))
+
+        # counts belong to every grid, coordinates are shared
+        x_corners, y_corners = [0, 1.4, 2, 0.6], [0, 0, 9, 9]
+        grid.update_from_lattice(x_corners, y_corners, 10, 9, 8, 1)
+        shared_grid.update_from_lattice(x_corners, y_corners, 10, 9, 8, 1)
+        assert np.array_equal(grid.counts, shared_grid.counts) and shared_grid.counts.flags.writeable
+
+        # solar table of the whole year
+        assert len(buffers[('solar_table', 45, 'apparent_elevation')]) == 366 * 96
+    finally:
+        shared_buffers.release(segments)
@@ -0,0 +1,53 @@
+import pv_system
+import sky_patches
+import solarposition
+import sweep
+
+import numpy as np
+import pytest
+
+def test_assign_sky_patches():
+    azimuth_rad = np.radians([90.5, 91.5, 95.5, 180, 270])
+    elevation_rad = np.radians([10.2, 11.8, 10.5, 45, -5])
+    daylight = np.array([True, True, True, True, False])
+
+    patch_index, patch_azimuth_rad, patch_elevation_rad, occupancy = sky_patches.assign_sky_patches(azimuth_rad, elevation_rad, daylight, 2)
+
+    # the first two timesteps share a patch, the night timestep has no patch
+    assert patch_index[0] == patch_index[1] and len(set(patch_index[:4])) == 3 and patch_index[4] == -1
+    assert np.sum(occupancy) == np.sum(daylight)
+    assert np.degrees(patch_azimuth_rad[patch_index[0]]) == pytest.approx(91)
+    assert np.degrees(patch_elevation_rad[patch_index[0]]) == pytest.approx(11)
+
+def test_sky_patches_match_exact_calculation(unit_parameters: dict):
+    parameters = dict(unit_parameters, first_day=170, last_day=175)
+
+    lines_15min, lines_percent_of_time_shaded = sweep.simulate_unit(**parameters)
+    patch_lines_15min, patch_lines_percent_of_time_shaded = sweep.simulate_unit(sky_patch_size=1, validation_stride=None, **parameters)
+
+    # self-shading is still calculated for every timestep, ground shade and percentage of time shaded are close to the exact values
+    assert [line[7] for line in patch_lines_15min] == [line[7] for line in lines_15min]
+    assert np.mean(np.abs(np.array([line[6] for line in patch_lines_15min]) - np.array([line[6] for line in lines_15min]))) < 2
+    assert np.array([line[4:] for line in patch_lines_percent_of_time_shaded]) == pytest.approx(np.array([line[4:] for line in lines_percent_of_time_shaded]), abs=0.02)
+
+def test_estimate_error(geometry: pv_system.system_geometry):
+    solar_table = solarposition.calculate_solar_table(50, 0, solarposition.generate_timesteps(2000)[170 * 96:171 * 96])
+    daylight = solar_table['angle_in_plane_EW'] != -1
+    PV_angles_EW = geometry.tilt_schedule(solar_table['angle_in_plane_EW'])
+    timesteps = np.flatnonzero(daylight)
+
+    # patches with one timestep each have no error
+    patch_index = np.full(daylight.shape, -1)
+    patch_index[timesteps] = np.arange(len(timesteps))
+    patch_ground_shade, patch_footprints = sky_patches.evaluate_sky_patches(geometry, solar_table['azimuth_rad'][timesteps], solar_table['elevation_rad'][timesteps], 0, 0, 80, 80, 1, "analytic")
+
+    error = sky_patches.estimate_error(geometry, solar_table, PV_angles_EW, 0, timesteps[::10], patch_index, patch_ground_shade, patch_footprints, 80, 80, 1, "analytic")
+    assert error['validated_timesteps'] == len(timesteps[::10])
+    assert error['max_ground_shade_error'] == pytest.approx(0, abs=1e-9)
+    assert error['mean_footprint_error'] == 0
+
+    # a coarse patch size gives an error
+    patch_index, patch_azimuth_rad, patch_elevation_rad, occupancy = sky_patches.assign_sky_patches(solar_table['azimuth_rad'], solar_table['elevation_rad'], daylight, 20)
+    patch_ground_shade, patch_footprints = sky_patches.evaluate_sky_patches(geometry, patch_azimuth_rad, patch_elevation_rad, 0, 0, 80, 80, 1, "analytic")
+    error = sky_patches.estimate_error(geometry, solar_table, PV_angles_EW, 0, timesteps, patch_index, patch_ground_shade, patch_footprints, 80, 80, 1, "analytic")
+    assert error['max_ground_shade_error'] >= error['mean_ground_shade_error'] > 0
@@ -0,0 +1,54 @@
+import solarposition
+
+import pytest
+import math
+
+@pytest.fixture()
+def delta():
+    return 1e-9
+
+def test_solar_table_matches_single_timesteps(delta: float):
+    year, long, lat = 2000, 0, 45
+
+    times = solarposition.generate_timesteps(year)
+    solar_table = solarposition.calculate_solar_table(lat, long, times)
+
+    # one full year in 15 minute steps
+    assert len(times) == 366 * 24 * 4
+
+    pass_for_all = True
+
+    # compare table to single timestep calculations (night, sunrise, noon, afternoon, winter)
+    for month, day, hour, minute in [(7, 1, 0, 0), (7, 1, 4, 15), (7, 1, 12, 0), (7, 1, 17, 45), (12, 31, 23, 45)]:
+        timestep = times.get_loc(times[(times.month == month) & (times.day == day) & (times.hour == hour) & (times.minute == minute)][0])
+
+        azimuth_rad, elevation_rad = solarposition.calculate_azimuth_and_elevation_rad(year, month, day, hour, minute, long, lat)
+        angle_in_plane_EW, angle_in_plane_NS = solarposition.calculate_solarposition(year, month, day, hour, minute, long, lat)
+        proximate_azimuth, apparent_elevation = solarposition.correct_solarposition(year, month, day, hour, minute, long, lat)
+
+        expected = [azimuth_rad, elevation_rad, angle_in_plane_EW, angle_in_plane_NS, proximate_azimuth, apparent_elevation]
+        calculated = [solar_table[key][timestep] for key in ['azimuth_rad', 'elevation_rad', 'angle_in_plane_EW', 'angle_in_plane_NS', 'proximate_azimuth', 'apparent_elevation']]
+
+        for expected_value, calculated_value in zip(expected, calculated):
+            if not math.isclose(expected_value, calculated_value, abs_tol=delta):
+                print("Solar table value does not match single timestep calculation at ", month, day, hour, minute, "\nCalculated value: ", calculated_value, "\nExpected value: ", expected_value)
+                pass_for_all = False
+
+    assert pass_for_all
+
+def test_daylight_windows():
+    year, long = 2000, 0
+    timesteps_per_day = 24 * 4
+
+    times = solarposition.generate_timesteps(year)
+
+    # polar night at lat 71 (no daylight in late December), midnight sun in June
+    solar_table = solarposition.calculate_solar_table(71, long, times)
+    daylight_windows = solarposition.calculate_daylight_windows(solar_table['apparent_elevation'], timesteps_per_day)
+
+    assert daylight_windows.shape == (366, timesteps_per_day)
+    assert not daylight_windows[-10].any()
+    assert daylight_windows[172].all()
+
+    # mask matches the elevation check in the main loop
+    assert (daylight_windows.ravel() == (solar_table['apparent_elevation'] >= 0)).all()
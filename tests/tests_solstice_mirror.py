@@ -0,0 +1,70 @@
+import solstice_mirror
+import sweep
+
+import concurrent.futures
+import numpy as np
+import pickle
+import pytest
+import time
+
+@pytest.fixture()
+def parameters(unit_parameters: dict):
+    return dict(unit_parameters, first_day=230, last_day=232)
+
+def test_mirror_days():
+    mirror = solstice_mirror.mirror_days(366)
+    declination = solstice_mirror.declination_and_equation_of_time(366)[0]
+
+    # days with rising declination are their own mirror day, days with falling declination are mirrored to a day with (nearly) the same declination
+    assert mirror[100] == 100 and mirror[360] == 360
+    falling_days = np.flatnonzero(mirror != np.arange(366))
+    assert np.all((falling_days > 172) & (falling_days < 355))
+    assert np.all((mirror[falling_days] <= 172) | (mirror[falling_days] >= 355))
+    # a small difference of the declination is accepted for a smaller remainder of the time offset
+    assert np.max(np.abs(declination[falling_days] - declination[mirror[falling_days]])) < 2
+
+def test_time_offset():
+    # solar noon of the mirror day is shifted by the difference of the equation of time (about -5.5 minutes in August)
+    mirror = solstice_mirror.mirror_days(366)
+    assert solstice_mirror.time_offset(100, 100, 366) == 0
+    assert solstice_mirror.time_offset(300, mirror[300], 366) == round((solstice_mirror.declination_and_equation_of_time(366)[1][300] - solstice_mirror.declination_and_equation_of_time(366)[1][mirror[300]]) / 15)
+
+def test_mirror_records():
+    records = solstice_mirror.mirror_records()
+    calculations = []
+
+    def calculate():
+        calculations.append(1)
+        time.sleep(0.1)
+        return {'ground_shade': {}}
+
+    # every record is calculated once, also if several threads need it at the same time
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(lambda k: records.get((50, 0, 0, 100), calculate), range(4)))
+    assert len(calculations) == 1 and all(result is results[0] for result in results)
+
+    # copies (e.g. in worker processes) hold the given records, only records calculated in the copy are new
+    copied_records = pickle.loads(pickle.dumps(records.subset([(50, 0, 0, 100), (50, 0, 0, 101)])))
+    assert list(copied_records.records) == [(50, 0, 0, 100)] and copied_records.new_records() == {}
+    copied_records.get((50, 0, 0, 101), calculate)
+    assert list(copied_records.new_records()) == [(50, 0, 0, 101)] and len(calculations) == 2
+
+    records.update(copied_records.new_records())
+    records.update({(60, 0, 0, 100): {}})
+    records.release(50)
+    assert list(records.records) == [(60, 0, 0, 100)]
+
+def test_solstice_mirror(parameters: dict):
+    lines_15min, lines_percent_of_time_shaded = sweep.simulate_unit(**parameters)
+
+    # without tolerance every timestep is calculated, days with rising declination are unchanged
+    assert sweep.simulate_unit(mirror_tolerance=0, **parameters) == (lines_15min, lines_percent_of_time_shaded)
+    assert sweep.simulate_unit(mirror_tolerance=2, **dict(parameters, first_day=100, last_day=102)) == sweep.simulate_unit(**dict(parameters, first_day=100, last_day=102))
+
+    mirrored_lines_15min, mirrored_lines_percent_of_time_shaded = sweep.simulate_unit(mirror_tolerance=2, **parameters)
+
+    # ground shade of the mirror day is reused, self-shading is calculated for every timestep
+    assert [line[:6] + line[7:] for line in mirrored_lines_15min] == [line[:6] + line[7:] for line in lines_15min]
+    assert [line[6] for line in mirrored_lines_15min] != [line[6] for line in lines_15min]
+    assert np.mean([abs(line[6] - mirrored_line[6]) for line, mirrored_line in zip(lines_15min, mirrored_lines_15min) if line[9] >= 10]) < 2
+    assert np.array([line[4:] for line in mirrored_lines_percent_of_time_shaded]) == pytest.approx(np.array([line[4:] for line in lines_percent_of_time_shaded]), abs=0.02)
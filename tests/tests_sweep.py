@@ -0,0 +1,87 @@
+import solstice_mirror
+import sweep
+
+def test_generate_work_units():
+    work_units = sweep.generate_work_units(range(34, 36), 2000, 31)
+
+    # every day of the (leap) year is covered exactly once for every lat
+    for lat in range(34, 36):
+        days = [day for unit_lat, first_day, last_day in work_units if unit_lat == lat for day in range(first_day, last_day)]
+        assert days == list(range(366))
+
+def test_estimate_unit_cost():
+    # long summer days at high latitudes are more expensive than (nearly) empty winter days
+    assert sweep.estimate_unit_cost(70, 160, 190) > sweep.estimate_unit_cost(40, 160, 190) > sweep.estimate_unit_cost(40, 0, 30) > sweep.estimate_unit_cost(70, 0, 30)
+
+def test_parallel_sweep_matches_serial_sweep(simulation_parameters: dict):
+    work_units = [(45, 170, 172, 0), (70, 0, 2, 0), (70, 170, 172, 0)]
+
+    results = {}
+    for processes in [1, 2]:
+        results[processes] = []
+        sweep.run_sweep(work_units, simulation_parameters, lambda work_unit, lines_15min, lines_percent_of_time_shaded: results[processes].append((work_unit, lines_15min, lines_percent_of_time_shaded)), processes)
+
+    # results are handed over in the order of the work units, with identical values
+    assert [result[0] for result in results[2]] == work_units
+    assert results[1] == results[2]
+
+    # polar night: no percentage of time shaded, but all 15 minute lines
+    assert len(results[1][1][1]) == 2 * 96 and results[1][1][2] == []
+
+def test_threaded_days_match_serial_days(simulation_parameters: dict):
+    parameters = dict(simulation_parameters, lat=60, first_day=100, last_day=104)
+
+    # days are calculated concurrently, results are collected in the order of the days
+    for engine in ["analytic", "shapely"]:
+        parameters['shade_engine'] = engine
+        assert sweep.simulate_unit(threads=3, **parameters) == sweep.simulate_unit(**parameters)
+
+    # threads share the shade memo of the process
+    assert sweep.simulate_unit(threads=3, memo_tolerance=0.5, **parameters) == sweep.simulate_unit(memo_tolerance=0.5, **parameters)
+
+def test_incremental_grid_matches_complete_grid(simulation_parameters: dict):
+    parameters = dict(simulation_parameters, lat=60, first_day=100, last_day=102, shade_engine="shapely")
+
+    # only grid points in the area where the shade changed are tested, results are unchanged
+    assert sweep.simulate_unit(incremental_grid=True, **parameters) == sweep.simulate_unit(**parameters)
+
+def test_mirror_dependencies():
+    mirror = solstice_mirror.mirror_days(366)
+    work_units = [(lat, first_day, first_day + 31, 0) for lat in [45, 50] for first_day in range(0, 366, 31)]
+    needed_days, dependencies = sweep.mirror_dependencies(work_units, 2000)
+
+    # units with rising declination only need their own days, units with falling declination depend on the units of their mirror days (same lat)
+    assert needed_days[0] == set() and dependencies[0] == set()
+    assert needed_days[7] == set(mirror[217:248].tolist()) and dependencies[7] == {3, 4}
+    assert dependencies[19] == {15, 16}
+    assert all(dependencies[k] == set() for k, (lat, first_day, last_day, PV_angle_NS) in enumerate(work_units) if last_day <= 172)
+
+def test_parallel_mirrored_sweep_matches_serial_sweep(simulation_parameters: dict):
+    # the mirror days of the last unit lie in the first unit, which is submitted first in the pool
+    mirror = solstice_mirror.mirror_days(366)
+    work_units = [(50, int(min(mirror[230:232])), int(max(mirror[230:232])) + 1, 0), (50, 230, 232, 0)]
+    parameters = dict(simulation_parameters, mirror_tolerance=2)
+
+    results = {}
+    for processes in [1, 2]:
+        results[processes] = []
+        sweep.run_sweep(work_units, parameters, lambda work_unit, lines_15min, lines_percent_of_time_shaded: results[processes].append((work_unit, lines_15min, lines_percent_of_time_shaded)), processes)
+
+    assert results[1] == results[2]
+    assert sweep.mirror_dependencies(work_units, 2000)[1] == [set(), {0}]
+    assert results[1][1][1:] == sweep.simulate_unit(lat=50, first_day=230, last_day=232, **parameters)
+
+def test_finished_units_are_not_recalculated(simulation_parameters: dict):
+    work_units = [(45, 170, 172, 0), (70, 0, 2, 0), (70, 170, 172, 0)]
+
+    results = []
+    sweep.run_sweep(work_units, simulation_parameters, lambda work_unit, lines_15min, lines_percent_of_time_shaded: results.append((work_unit, lines_15min, lines_percent_of_time_shaded)))
+
+    # every calculated unit is stored as soon as it is finished, units finished by an interrupted run are written in order without calculating them
+    for processes in [1, 2]:
+        stored_results, written_results = [], []
+        finished_results = {results[1][0]: ("finished", "finished")}
+        sweep.run_sweep(work_units, simulation_parameters, lambda work_unit, lines_15min, lines_percent_of_time_shaded: written_results.append((work_unit, lines_15min, lines_percent_of_time_shaded)), processes, lambda work_unit, lines_15min, lines_percent_of_time_shaded: stored_results.append((work_unit, lines_15min, lines_percent_of_time_shaded)), finished_results)
+
+        assert sorted(stored_results) == [results[0], results[2]]
+        assert written_results == [results[0], (results[1][0], "finished", "finished"), results[2]]